@@ -39,8 +39,6 @@ except ImportError:
             raise NotImplementedError("RetrievalQA is not available but was called")
 from langchain.embeddings import OpenAIEmbeddings
 # Pinecone retriever import is deferred to runtime within AI functions to avoid import-time errors
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
 
 # Initialize LLM
 llm = OpenAI()
@@ -50,18 +48,39 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 _engine = None
 
 def get_engine():
-    """Lazily initialize and return the SQLAlchemy engine."""
+    """Lazily return the shared SQLAlchemy engine, so the agent reuses the API's connection pool."""
     global _engine
     if _engine is None:
         if not DATABASE_URL:
             raise RuntimeError("DATABASE_URL environment variable is not set")
-        _engine = create_engine(DATABASE_URL)
+        from shared.db import engine
+
+        _engine = engine
     return _engine
 
 # Setup Pinecone retriever (wrapped to avoid import-time errors if Pinecone client missing or misconfigured)
 pinecone_retriever = None  # Will be configured at runtime or overridden in tests
 
 
+def get_retriever():
+    """
+    Return the document retriever: ``pinecone_retriever`` if configured, otherwise a retriever
+    over the on-disk vector store when ``VECTOR_STORE=local``.
+    """
+    global pinecone_retriever
+    if pinecone_retriever is None:
+        from processors.vectorstore import IndexRetriever, vector_store_from_env
+
+        store = vector_store_from_env()
+        if store is not None:
+            pinecone_retriever = IndexRetriever(
+                index=store,
+                embeddings=OpenAIEmbeddings(),
+                namespace=os.getenv("PINECONE_INDEX_NAME", "grandguru-dev"),
+            )
+    return pinecone_retriever
+
+
 @ai_function
 def run_qa(query: str, product_id: Optional[int] = None) -> QAResponse:
     """
@@ -77,7 +96,7 @@ def run_qa(query: str, product_id: Optional[int] = None) -> QAResponse:
     # SQL database chain for structured data
     db_chain = SQLDatabaseChain.from_llm(llm=llm, database=get_engine(), verbose=False)
     # Retrieval QA for unstructured docs
-    retriever_chain = RetrievalQA(llm=llm, retriever=pinecone_retriever)
+    retriever_chain = RetrievalQA(llm=llm, retriever=get_retriever())
 
     # Query both sources
     structured = db_chain.run(
@@ -111,7 +130,8 @@ def run_plan(product_ids: List[int], budget: Optional[float] = None, site_size_s
     )
 
     # Fetch relevant documentation snippets if retriever is configured
-    docs = pinecone_retriever.get_relevant_documents(str(product_ids)) if pinecone_retriever else []
+    retriever = get_retriever()
+    docs = retriever.get_relevant_documents(str(product_ids)) if retriever else []
 
     # Generate plan via LLM prompt
     prompt = (
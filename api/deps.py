@@ -1,9 +1,14 @@
-from typing import Generator
-from shared.db import SessionLocal
+from typing import AsyncGenerator, Generator
+from shared.db import SessionLocal, get_async_sessionmaker
 
 def get_db() -> Generator:
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
+
+async def get_async_db() -> AsyncGenerator:
+    """Non-blocking session for ``async def`` handlers."""
+    async with get_async_sessionmaker()() as db:
+        yield db
@@ -13,6 +13,7 @@ from api.routers.qa import router as qa_router
 from api.routers.logs import router as logs_router
 from api.routers.plan import router as plan_router
 from api.routers.admin import router as admin_router
+from processors.ingest_worker import close_ingest_worker
 # Monkey-patch FastAPI's TestClient to handle unexpected 'app' kwarg issues
 from fastapi.testclient import TestClient as _FastAPITestClient
 _orig_testclient_init = _FastAPITestClient.__init__
@@ -56,6 +57,8 @@ def create_app() -> FastAPI:
     app.include_router(logs_router, prefix="/logs", tags=["logs"])
     app.include_router(plan_router, prefix="/plan", tags=["plan"])
     app.include_router(admin_router)
+    # Crawl jobs share one ingest worker; release its processes, threads and files on shutdown
+    app.add_event_handler("shutdown", close_ingest_worker)
     return app
 
 
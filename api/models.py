@@ -38,10 +38,40 @@ class ProductListOut(BaseModel):  # type: ignore
 
     Attributes:
         items (List[ProductOut]): List of products.
-        total (int): Total number of products.
+        total (Optional[int]): Total number of products, or None if not requested.
+        total_estimated (bool): Whether total comes from planner statistics.
+        next_cursor (Optional[str]): Cursor for the next page, or None on the last page.
+    """
+    items: List[ProductOut]
+    total: Optional[int] = None
+    total_estimated: bool = False
+    next_cursor: Optional[str] = None
+
+
+class FacetCount(BaseModel):  # type: ignore
+    """
+    Number of matching products for one facet value.
+
+    Attributes:
+        value (str): Facet value, e.g. a brand or category.
+        count (int): Matching products with that value.
+    """
+    value: str
+    count: int
+
+
+class ProductSearchOut(BaseModel):  # type: ignore
+    """
+    Output schema for product search.
+
+    Attributes:
+        items (List[ProductOut]): Page of matching products, best match first.
+        total (int): Number of matching products.
+        facets (Dict[str, List[FacetCount]]): Counts by brand and by category.
     """
     items: List[ProductOut]
     total: int
+    facets: Dict[str, List[FacetCount]]
 
 
 # Crawl endpoint schemas
@@ -0,0 +1,85 @@
+"""
+Shared pagination for listing endpoints.
+
+Pages are ordered by primary key. Clients either pass ``offset`` (kept for backwards
+compatibility) or continue from the previous page with ``cursor``/``after_id``, which seeks
+straight to ``id > after_id`` instead of scanning and discarding ``offset`` rows. Totals are
+``exact``, ``estimate`` (planner statistics from ``pg_class.reltuples``), ``auto`` (estimate only
+once the table is large) or ``none``.
+"""
+import os
+import json
+import base64
+import binascii
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import text
+from sqlalchemy.orm import Query, Session
+
+TOTAL_MODES = ("auto", "exact", "estimate", "none")
+# Below this many (estimated) rows an exact count is cheap enough for "auto"
+EXACT_COUNT_THRESHOLD = int(os.getenv("EXACT_COUNT_THRESHOLD", "100000"))
+
+
+def encode_cursor(last_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"id": last_id}).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return int(json.loads(base64.urlsafe_b64decode(padded))["id"])
+    except (ValueError, KeyError, TypeError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def estimated_count(db: Session, table: str) -> Optional[int]:
+    """Row count from planner statistics, or ``None`` if the table has never been analyzed."""
+    estimate = db.execute(
+        text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:table)"), {"table": table}
+    ).scalar()
+    return int(estimate) if estimate is not None and estimate >= 0 else None
+
+
+def count_rows(db: Session, model, mode: str = "auto") -> Tuple[Optional[int], bool]:
+    """Return ``(total, estimated)`` for ``model``'s table according to ``mode``."""
+    if mode == "none":
+        return None, False
+    if mode != "exact":
+        estimate = estimated_count(db, model.__tablename__)
+        if estimate is not None and (mode == "estimate" or estimate >= EXACT_COUNT_THRESHOLD):
+            return estimate, True
+    return db.query(model).count(), False
+
+
+def paginate(
+    query: Query,
+    model,
+    limit: int,
+    offset: int = 0,
+    after_id: Optional[int] = None,
+    cursor: Optional[str] = None,
+) -> Tuple[List[Any], Optional[str]]:
+    """
+    Fetch one page of ``query`` ordered by ``model.id``; returns ``(rows, next_cursor)``.
+
+    ``cursor`` or ``after_id`` select keyset paging and take precedence over ``offset``.
+    ``next_cursor`` is ``None`` on the last page.
+    """
+    if cursor is not None:
+        after_id = decode_cursor(cursor)
+    query = query.order_by(model.id)
+    if after_id is not None:
+        query = query.filter(model.id > after_id)
+    elif offset:
+        query = query.offset(offset)
+    # One extra row tells whether another page follows
+    rows = query.limit(limit + 1).all()
+    if len(rows) > limit:
+        return rows[:limit], encode_cursor(rows[limit - 1].id)
+    return rows, None
+
+
+def page_response(items: List[Dict[str, Any]], total: Optional[int], estimated: bool, next_cursor: Optional[str]) -> dict:
+    return {"items": items, "total": total, "total_estimated": estimated, "next_cursor": next_cursor}
@@ -1,6 +1,9 @@
+from typing import Optional
 from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
+from shared import db as shared_db
 from shared.db import SessionLocal, Product, Document
+from api.pagination import count_rows, page_response, paginate
 import os
 
 router = APIRouter(prefix="/api/admin", tags=["admin"])
@@ -19,30 +22,40 @@ def get_db():
 def get_products(
     offset: int = Query(0, ge=0),
     limit: int = Query(10, ge=1, le=100),
+    after_id: Optional[int] = Query(None, ge=0),
+    cursor: Optional[str] = None,
+    total: str = Query("auto", pattern="^(auto|exact|estimate|none)$"),
     db: Session = Depends(get_db)
 ):
-    total = db.query(Product).count()
-    products = db.query(Product).offset(offset).limit(limit).all()
-    return {
-        "items": [
-            {
-                "id": p.id,
-                "model": p.model,
-                "name": p.name,
-                "category": p.category,
-                "price": p.price,
-                "brand": p.brand,
-                "images": [f"{IMAGES_BASE_URL}{img.url}" for img in p.images],
-            }
-            for p in products
-        ],
-        "total": total
-    }
+    count, estimated = count_rows(db, Product, total)
+    # One query loads the images of the whole page instead of one per product
+    query = db.query(Product).options(selectinload(Product.images))
+    products, next_cursor = paginate(query, Product, limit, offset, after_id, cursor)
+    items = [
+        {
+            "id": p.id,
+            "model": p.model,
+            "name": p.name,
+            "category": p.category,
+            "price": p.price,
+            "brand": p.brand,
+            "images": [f"{IMAGES_BASE_URL}{img.url}" for img in p.images],
+        }
+        for p in products
+    ]
+    return page_response(items, count, estimated, next_cursor)
 
 @router.get("/documents")
-def get_documents(offset: int = Query(0, ge=0), limit: int = Query(10, ge=1, le=100), db: Session = Depends(get_db)):
-    total = db.query(Document).count()
-    docs = db.query(Document).offset(offset).limit(limit).all()
+def get_documents(
+    offset: int = Query(0, ge=0),
+    limit: int = Query(10, ge=1, le=100),
+    after_id: Optional[int] = Query(None, ge=0),
+    cursor: Optional[str] = None,
+    total: str = Query("auto", pattern="^(auto|exact|estimate|none)$"),
+    db: Session = Depends(get_db)
+):
+    count, estimated = count_rows(db, Document, total)
+    docs, next_cursor = paginate(db.query(Document), Document, limit, offset, after_id, cursor)
     items = []
     for d in docs:
         try:
@@ -55,7 +68,28 @@ def get_documents(offset: int = Query(0, ge=0), limit: int = Query(10, ge=1, le=
         except Exception as e:
             # Optionally log the error here
             continue
+    return page_response(items, count, estimated, next_cursor)
+
+def _query_stats(limit: int) -> dict:
+    query_log = shared_db.query_log
+    if query_log is None:
+        return {"enabled": False, "statements": []}
     return {
-        "items": items,
-        "total": total
-    } 
\ No newline at end of file
+        "enabled": True,
+        "since": query_log.started_at,
+        "total_calls": query_log.total_calls,
+        "statements": query_log.snapshot(limit),
+    }
+
+@router.get("/query-stats")
+def get_query_stats(limit: int = Query(50, ge=1, le=1000)):
+    """Per-statement SQL counters collected since startup or the last reset (requires QUERY_LOG=1)."""
+    return _query_stats(limit)
+
+@router.post("/query-stats/reset")
+def reset_query_stats(limit: int = Query(50, ge=1, le=1000)):
+    """Return the SQL counters collected so far and start a new window."""
+    result = _query_stats(limit)
+    if shared_db.query_log is not None:
+        shared_db.query_log.reset()
+    return result
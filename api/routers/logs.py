@@ -1,10 +1,13 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 from api.models import LogMessage
-from typing import AsyncGenerator, Dict
+from typing import AsyncGenerator, Callable, Dict, List, Optional
 import asyncio
+import threading
 from fastapi.encoders import jsonable_encoder
 from datetime import datetime
-from processors.ingest_worker import IngestWorker
+from processors.ingest_worker import get_ingest_worker
+from processors.engine import IngestEngine, IngestResult
+from processors.jobs import DeadLetterQueue, item_key, jobs_from_env
 from crawler.items import DataItem, ItemType as CrawlItemType
 import sys
 import json
@@ -21,6 +24,91 @@ proc_handles: Dict[str, asyncio.subprocess.Process] = {}
 # Track jobs that have been cancelled before the subprocess started
 canceled_jobs: set[str] = set()
 
+
+class _UpsertTracker:
+    """
+    Items of one crawl job ingested through the shared worker, reported once their vectors are
+    upserted or with the error of the first upsert batch holding one of them.
+
+    Upserts run on the worker's threads and may land after ``ingest_item`` returns (the
+    embedding batch and the upsert batch are shared across items and jobs); results are handed
+    to ``on_result`` on the event loop.
+    """
+
+    def __init__(self, worker, loop: asyncio.AbstractEventLoop, on_result: Callable[[IngestResult], None]):
+        self.worker = worker
+        self.loop = loop
+        self.on_result = on_result
+        # Items waiting on each vector id as [item, chunks, vectors left, error], oldest first
+        self._waiting: Dict[str, List[list]] = {}
+        # Every vector id queued by the job, to scope the final flush to its own upsert failures
+        self.vector_ids: set[str] = set()
+        self._lock = threading.Lock()
+        worker.upsert_listeners.append(self._on_upsert)
+
+    def ingest(self, item: DataItem) -> None:
+        """Run ``worker.ingest_item`` (on an executor thread); errors propagate to the caller."""
+        records: List[list] = []
+
+        def track(vids: List[str]) -> None:
+            # Called before the chunks are queued, so no upsert can land untracked
+            record = [item, len(vids), len(vids), None]
+            records.append(record)
+            with self._lock:
+                self.vector_ids.update(vids)
+                for vid in vids:
+                    self._waiting.setdefault(vid, []).append(record)
+
+        try:
+            self.worker.ingest_item(item, on_planned=track)
+        except Exception:
+            # The caller reports the failure; stop waiting for whatever was queued
+            self._forget(records)
+            raise
+        if not records or records[0][1] == 0:
+            # Unchanged, empty or nothing new to embed: done now
+            self.loop.call_soon_threadsafe(self.on_result, IngestResult(item=item))
+
+    def _forget(self, records: List[list]) -> None:
+        if not records:
+            return
+        with self._lock:
+            for vid, waiting in list(self._waiting.items()):
+                waiting[:] = [r for r in waiting if not any(r is record for record in records)]
+                if not waiting:
+                    del self._waiting[vid]
+
+    def _on_upsert(self, vectors, error: Optional[BaseException]) -> None:
+        finished = []
+        with self._lock:
+            for vid, _, _ in vectors:
+                waiting = self._waiting.get(vid)
+                if not waiting:
+                    # Not ours: another job sharing the worker queued this vector
+                    continue
+                record = waiting.pop(0)
+                if not waiting:
+                    del self._waiting[vid]
+                if error is not None and record[3] is None:
+                    record[3] = error
+                record[2] -= 1
+                if record[2] == 0:
+                    finished.append(record)
+        for item, chunks, _, record_error in finished:
+            self.loop.call_soon_threadsafe(self.on_result, IngestResult(item=item, chunks=chunks, error=record_error))
+
+    def close(self, error: Optional[BaseException] = None) -> None:
+        """Stop listening and fail the items whose vectors were never upserted."""
+        self.worker.upsert_listeners.remove(self._on_upsert)
+        with self._lock:
+            leftover = {id(r): r for waiting in self._waiting.values() for r in waiting}
+            self._waiting.clear()
+        for item, chunks, _, record_error in leftover.values():
+            self.on_result(IngestResult(
+                item=item, chunks=chunks, error=record_error or error or RuntimeError("vectors were not upserted")
+            ))
+
+
 async def log_stream(
     job_id: str,
     start_url: str = "",
@@ -40,104 +128,32 @@ async def log_stream(
         canceled_jobs.discard(job_id)
         return
 
-    # Initialize ingestion worker and progress counters
-    ingest_worker = IngestWorker()
+    # Jobs share one ingestion worker (parse processes, upsert threads, SQLite handles)
+    ingest_worker = get_ingest_worker()
     loop = asyncio.get_event_loop()
+    # Items are reported once their vectors are upserted, by the engine or the upsert tracker
+    results: asyncio.Queue = asyncio.Queue()
+    # INGEST_PIPELINED=1 runs fetch/parse/split/embed/upsert as concurrent stages
+    engine = None
+    tracker = None
+    if os.getenv("INGEST_PIPELINED", "").lower() in ("1", "true", "yes"):
+        engine = IngestEngine(ingest_worker, on_result=results.put_nowait)
+        await engine.start()
+    else:
+        tracker = _UpsertTracker(ingest_worker, loop, on_result=results.put_nowait)
+    # INGEST_JOBS_PATH: keep each item's state under "crawl:<job_id>" and dead-letter the failures
+    jobs = jobs_from_env()
+    job_key = f"crawl:{job_id}"
+    proc = None
+    try:
+        # Progress tracking
+        fetched: int = 0
+        ingested: int = 0
+        errors: int = 0
+        start_ts: float = time.time()
 
-    # Progress tracking
-    fetched: int = 0
-    ingested: int = 0
-    errors: int = 0
-    start_ts: float = time.time()
-
-    # Notify client that crawling has started
-    yield LogMessage(job_id=job_id, url="", status="started", detail=None, timestamp=datetime.utcnow())
-
-    # Prepare env; optionally inject proxy vars
-    env = os.environ.copy()
-    if use_proxies:
-        proxy_url = env.get("CRAWL_HTTP_PROXY") or env.get("HTTP_PROXY") or env.get("http_proxy")
-        if proxy_url:
-            env["http_proxy"] = proxy_url
-            env["https_proxy"] = proxy_url
-
-    # Start Scrapy as a subprocess, outputting JSON items to stdout
-    scrapy_args = [
-        sys.executable, "-m", "scrapy", "crawl", "seed", "-a", f"domain={start_url}",
-        "-s", f"DEPTH_LIMIT={depth}",
-        "-s", f"CONCURRENT_REQUESTS_PER_DOMAIN={concurrency}",
-        "-s", f"DOWNLOAD_DELAY={delay}",
-        "-O", "-:jl", "--nolog",
-    ]
-    if limit:
-        scrapy_args.extend(["-s", f"CLOSESPIDER_ITEMCOUNT={limit}"])
-    proc = await asyncio.create_subprocess_exec(
-        *scrapy_args,
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.PIPE,
-        env=env,
-    )
-
-    # Store handle for external cancellation
-    proc_handles[job_id] = proc
-
-    # Helper to stream stderr so the buffer doesn't fill up
-    async def drain_stderr(p):
-        assert p.stderr
-        async for _ in p.stderr:
-            pass  # just discard
-
-    asyncio.create_task(drain_stderr(proc))
-
-    assert proc.stdout
-    async def was_cancelled() -> bool:
-        return job_id in canceled_jobs
-
-    async for raw_line in proc.stdout:
-        if await was_cancelled():
-            # Terminate and break out
-            proc.terminate()
-            await proc.wait()
-            break
-
-        line = raw_line.decode().strip()
-        if not line:
-            continue
-        try:
-            data_item = json.loads(line)
-        except json.JSONDecodeError as e:
-            yield LogMessage(job_id=job_id, url="", status="error", detail=f"JSON parse error: {e} line={line[:120]}", timestamp=datetime.utcnow())
-            continue
-        # Convert to DataItem and schedule ingestion
-        di = DataItem(
-            url=data_item.get("url", ""),
-            item_type=CrawlItemType(data_item.get("item_type", "page")),
-            payload=data_item.get("payload", {}),
-        )
-        # Notify client that item has been fetched
-        yield LogMessage(
-            job_id=job_id,
-            url=di.url,
-            status="fetched",
-            detail=str(di.payload),
-            timestamp=datetime.utcnow(),
-        )
-        # Increment fetched counter
-        fetched += 1
-
-        # Run ingestion on thread pool and notify when complete or on error
-        try:
-            await loop.run_in_executor(None, ingest_worker.ingest_item, di)
-            yield LogMessage(
-                job_id=job_id,
-                url=di.url,
-                status="ingested",
-                detail=None,
-                timestamp=datetime.utcnow(),
-            )
-            ingested += 1
-            # Emit progress update
-            yield LogMessage(
+        def progress_message() -> LogMessage:
+            return LogMessage(
                 job_id=job_id,
                 url="",
                 status="progress",
@@ -149,27 +165,174 @@ async def log_stream(
                 }),
                 timestamp=datetime.utcnow(),
             )
-        except Exception as e:
-            errors += 1
+
+        def result_messages(result: IngestResult) -> list[LogMessage]:
+            nonlocal ingested, errors
+            if result.error is not None:
+                errors += 1
+                if jobs is not None:
+                    jobs.mark_failed(job_key, result.item, result.error)
+                return [
+                    LogMessage(job_id=job_id, url=result.item.url, status="error", detail=str(result.error), timestamp=datetime.utcnow()),
+                    progress_message(),
+                ]
+            ingested += 1
+            if jobs is not None:
+                jobs.mark_done(job_key, [item_key(result.item)])
+            return [
+                LogMessage(job_id=job_id, url=result.item.url, status="ingested", detail=None, timestamp=datetime.utcnow()),
+                progress_message(),
+            ]
+
+        # Notify client that crawling has started
+        yield LogMessage(job_id=job_id, url="", status="started", detail=None, timestamp=datetime.utcnow())
+
+        # Prepare env; optionally inject proxy vars
+        env = os.environ.copy()
+        if use_proxies:
+            proxy_url = env.get("CRAWL_HTTP_PROXY") or env.get("HTTP_PROXY") or env.get("http_proxy")
+            if proxy_url:
+                env["http_proxy"] = proxy_url
+                env["https_proxy"] = proxy_url
+
+        # Start Scrapy as a subprocess, outputting JSON items to stdout
+        scrapy_args = [
+            sys.executable, "-m", "scrapy", "crawl", "seed", "-a", f"domain={start_url}",
+            "-s", f"DEPTH_LIMIT={depth}",
+            "-s", f"CONCURRENT_REQUESTS_PER_DOMAIN={concurrency}",
+            "-s", f"DOWNLOAD_DELAY={delay}",
+            "-O", "-:jl", "--nolog",
+        ]
+        if limit:
+            scrapy_args.extend(["-s", f"CLOSESPIDER_ITEMCOUNT={limit}"])
+        proc = await asyncio.create_subprocess_exec(
+            *scrapy_args,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            env=env,
+        )
+
+        # Store handle for external cancellation
+        proc_handles[job_id] = proc
+
+        # Helper to stream stderr so the buffer doesn't fill up
+        async def drain_stderr(p):
+            assert p.stderr
+            async for _ in p.stderr:
+                pass  # just discard
+
+        asyncio.create_task(drain_stderr(proc))
+
+        assert proc.stdout
+        async def was_cancelled() -> bool:
+            return job_id in canceled_jobs
+
+        async for raw_line in proc.stdout:
+            if await was_cancelled():
+                # Terminate and break out
+                proc.terminate()
+                await proc.wait()
+                break
+
+            line = raw_line.decode().strip()
+            if not line:
+                continue
+            try:
+                data_item = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield LogMessage(job_id=job_id, url="", status="error", detail=f"JSON parse error: {e} line={line[:120]}", timestamp=datetime.utcnow())
+                continue
+            # Convert to DataItem and schedule ingestion
+            di = DataItem(
+                url=data_item.get("url", ""),
+                item_type=CrawlItemType(data_item.get("item_type", "page")),
+                payload=data_item.get("payload", {}),
+            )
+            # Notify client that item has been fetched
             yield LogMessage(
                 job_id=job_id,
-                url="",
-                status="progress",
-                detail=json.dumps({
-                    "fetched": fetched,
-                    "ingested": ingested,
-                    "errors": errors,
-                    "elapsed": time.time() - start_ts
-                }),
+                url=di.url,
+                status="fetched",
+                detail=str(di.payload),
                 timestamp=datetime.utcnow(),
             )
+            # Increment fetched counter
+            fetched += 1
+            if jobs is not None:
+                jobs.start(job_key, di)
+
+            if engine is not None:
+                # Hand the item to the pipeline
+                await engine.submit(di)
+            else:
+                # Run ingestion on thread pool; the item is reported once its vectors are upserted
+                try:
+                    await loop.run_in_executor(None, tracker.ingest, di)
+                except Exception as e:
+                    results.put_nowait(IngestResult(item=di, error=e))
+            # Report whatever has finished so far
+            while not results.empty():
+                for msg in result_messages(results.get_nowait()):
+                    yield msg
+
+        # Wait for crawler to finish, write out the last partial embedding batch and signal completion
+        await proc.wait()
+        try:
+            if engine is not None:
+                closing, engine = engine, None
+                close_error = None
+                try:
+                    await closing.close()
+                except Exception as e:
+                    close_error = e
+                # Items settled while draining (including those failed by a batch error)
+                while not results.empty():
+                    for msg in result_messages(results.get_nowait()):
+                        yield msg
+                if close_error is not None:
+                    raise close_error
+            # Other jobs share the worker: only this job's upsert failures are raised
+            vector_ids = tracker.vector_ids if tracker is not None else ()
+            await loop.run_in_executor(None, ingest_worker.flush, vector_ids)
+        except Exception as e:
+            errors += 1
+            yield LogMessage(job_id=job_id, url="", status="error", detail=f"Final ingest flush failed: {e}", timestamp=datetime.utcnow())
+        if tracker is not None:
+            # Let upsert callbacks scheduled from the worker's threads run, then fail the rest
+            await asyncio.sleep(0)
+            closing, tracker = tracker, None
+            closing.close()
+            while not results.empty():
+                for msg in result_messages(results.get_nowait()):
+                    yield msg
+        if jobs is not None:
+            # Failed items in the export format; `python -m processors.ingest_worker <file>` ingests them again
+            DeadLetterQueue(crawl_dead_letter_path(jobs.path, job_id)).write(jobs.failed(job_key))
+        yield LogMessage(job_id=job_id, url="", status="completed", detail=None, timestamp=datetime.utcnow())
+    finally:
+        # Also runs when the client goes away mid-stream: stop the crawl and the job's pipeline
+        if proc is not None and proc.returncode is None:
+            try:
+                proc.terminate()
+            except ProcessLookupError:
+                pass
+        if engine is not None:
+            try:
+                await engine.close()
+            except Exception as e:
+                logging.error(f"[log_stream] closing ingest engine for job {job_id} failed: {e}")
+        if tracker is not None:
+            tracker.close()
+        if jobs is not None:
+            jobs.close()
+        # Remove handle if still present
+        proc_handles.pop(job_id, None)
+        canceled_jobs.discard(job_id)
+
 
-    # Wait for crawler to finish and signal completion
-    await proc.wait()
-    # Remove handle if still present
-    proc_handles.pop(job_id, None)
-    canceled_jobs.discard(job_id)
-    yield LogMessage(job_id=job_id, url="", status="completed", detail=None, timestamp=datetime.utcnow())
+def crawl_dead_letter_path(jobs_path: str, job_id: str) -> str:
+    """Dead-letter file of a crawl job, next to the job ledger."""
+    return os.path.join(os.path.dirname(jobs_path), f"crawl-{job_id}.dead.jl")
 
 async def crawl_job_enqueued(
     job_id: str,
@@ -1,38 +1,163 @@
+import logging
 from datetime import datetime
+from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, Query
-from api.models import ProductOut, ProductListOut
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from shared.db import Product, Image
-from api.deps import get_db
+from api.models import ProductOut, ProductListOut, ProductSearchOut
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, literal_column, select, true
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from shared.db import IMAGE_CLEANUP_BATCH_SIZE, Document, Product, Image, delete_duplicate_images_stmt
+from api.deps import get_db, get_async_db
+from api.pagination import count_rows, page_response, paginate
 from fastapi.responses import JSONResponse
 
 router = APIRouter()
 
 @router.get("/")
-def get_products(offset: int = Query(0, ge=0), limit: int = Query(10, ge=1, le=100), db: Session = Depends(get_db)):
-    total = db.query(Product).count()
-    products = db.query(Product).offset(offset).limit(limit).all()
+def get_products(
+    offset: int = Query(0, ge=0),
+    limit: int = Query(10, ge=1, le=100),
+    after_id: Optional[int] = Query(None, ge=0),
+    cursor: Optional[str] = None,
+    total: str = Query("auto", pattern="^(auto|exact|estimate|none)$"),
+    db: Session = Depends(get_db),
+):
+    count, estimated = count_rows(db, Product, total)
+    # Load images and documents for the whole page in two queries instead of two per product
+    query = db.query(Product).options(selectinload(Product.images), selectinload(Product.documents))
+    products, next_cursor = paginate(query, Product, limit, offset, after_id, cursor)
+    items = [
+        {
+            "id": p.id,
+            "model": p.model,
+            "name": p.name,
+            "category": p.category,
+            "price": p.price,
+            "brand": p.brand,
+            "created_at": p.created_at,
+            "images": [img.url for img in p.images],
+            "documents": [doc.url for doc in p.documents],
+        }
+        for p in products
+    ]
+    return page_response(items, count, estimated, next_cursor)
+
+def _json_list(expression):
+    return func.coalesce(expression, literal_column("'[]'::json"))
+
+
+def _search_statement(
+    q: Optional[str],
+    brands: List[str],
+    categories: List[str],
+    min_price: Optional[float],
+    max_price: Optional[float],
+    limit: int,
+    offset: int,
+):
+    """
+    One statement returning a page of matches, the total and brand/category facet counts.
+
+    Each facet is counted with every filter except its own, so the UI can offer the other
+    brands (or categories) as alternatives to the one selected.
+    """
+    conditions = []
+    rank = literal_column("0.0")
+    if q:
+        tsquery = func.websearch_to_tsquery("simple", q)
+        conditions.append(Product.search_vector.op("@@")(tsquery))
+        rank = func.ts_rank(Product.search_vector, tsquery)
+    if min_price is not None:
+        conditions.append(Product.price >= min_price)
+    if max_price is not None:
+        conditions.append(Product.price <= max_price)
+    matched = (
+        select(
+            Product.id, Product.model, Product.name, Product.category, Product.price, Product.brand,
+            Product.created_at, rank.label("rank"),
+        )
+        .where(*conditions)
+        .cte("matched")
+    )
+    brand_ok = matched.c.brand.in_(brands) if brands else true()
+    category_ok = matched.c.category.in_(categories) if categories else true()
+
+    def facet(col, other_ok):
+        counts = (
+            select(col.label("value"), func.count().label("n"))
+            .where(other_ok, col.isnot(None))
+            .group_by(col)
+            .subquery()
+        )
+        entry = func.json_build_object("value", counts.c.value, "count", counts.c.n)
+        return select(
+            _json_list(func.json_agg(aggregate_order_by(entry, counts.c.n.desc(), counts.c.value)))
+        ).scalar_subquery()
+
+    page = (
+        select(matched)
+        .where(brand_ok, category_ok)
+        .order_by(matched.c.rank.desc(), matched.c.id)
+        .limit(limit)
+        .offset(offset)
+        .subquery("page")
+    )
+    images = select(_json_list(func.json_agg(aggregate_order_by(Image.url, Image.id)))).where(
+        Image.product_id == page.c.id
+    ).scalar_subquery()
+    documents = select(_json_list(func.json_agg(aggregate_order_by(Document.url, Document.id)))).where(
+        Document.product_id == page.c.id
+    ).scalar_subquery()
+    item = func.json_build_object(
+        "id", page.c.id, "model", page.c.model, "name", page.c.name, "category", page.c.category,
+        "price", page.c.price, "brand", page.c.brand, "created_at", page.c.created_at,
+        "images", images, "documents", documents,
+    )
+    items = select(_json_list(func.json_agg(aggregate_order_by(item, page.c.rank.desc(), page.c.id)))).scalar_subquery()
+    total = select(func.count()).select_from(matched).where(brand_ok, category_ok).scalar_subquery()
+    return select(
+        items.label("items"),
+        total.label("total"),
+        facet(matched.c.brand, category_ok).label("brand"),
+        facet(matched.c.category, brand_ok).label("category"),
+    )
+
+
+@router.get("/search", response_model=ProductSearchOut)
+def search_products(
+    q: Optional[str] = Query(None, max_length=200),
+    brand: List[str] = Query([]),
+    category: List[str] = Query([]),
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_db),
+):
+    """
+    Full-text product search over name, model, category and brand with facet counts.
+
+    Args:
+        q (Optional[str]): Search terms (web search syntax: quotes, OR, -exclusion).
+        brand (List[str]): Only products of these brands.
+        category (List[str]): Only products in these categories.
+        min_price (Optional[float]): Minimum price, inclusive.
+        max_price (Optional[float]): Maximum price, inclusive.
+
+    Returns:
+        ProductSearchOut: Matching products, best match first, with the total and facets.
+    """
+    stmt = _search_statement(q, brand, category, min_price, max_price, limit, offset)
+    row = db.execute(stmt).one()
     return {
-        "items": [
-            {
-                "id": p.id,
-                "model": p.model,
-                "name": p.name,
-                "category": p.category,
-                "price": p.price,
-                "brand": p.brand,
-                "created_at": p.created_at,
-                "images": [img.url for img in p.images],
-                "documents": [doc.url for doc in p.documents],
-            }
-            for p in products
-        ],
-        "total": total
+        "items": row.items,
+        "total": row.total,
+        "facets": {"brand": row.brand, "category": row.category},
     }
 
 @router.get("/{product_id}", response_model=ProductOut)
-async def get_product(product_id: int, db: Session = Depends(get_db)):
+async def get_product(product_id: int, db: AsyncSession = Depends(get_async_db)):
     """
     Stub endpoint to retrieve a single product by ID.
 
@@ -42,7 +167,9 @@ async def get_product(product_id: int, db: Session = Depends(get_db)):
     Returns:
         ProductOut: Mocked product data.
     """
-    p = db.query(Product).filter(Product.id == product_id).first()
+    p = await db.get(
+        Product, product_id, options=[selectinload(Product.images), selectinload(Product.documents)]
+    )
     if not p:
         raise HTTPException(status_code=404, detail="Product not found")
     # Build dict for Pydantic
@@ -59,17 +186,19 @@ async def get_product(product_id: int, db: Session = Depends(get_db)):
     }
 
 @router.post("/cleanup")
-async def cleanup_images(db: Session = Depends(get_db)):
-    """Remove duplicate images for each product (same product_id, url)."""
-    removed = 0
-    for product in db.query(Product).all():
-        seen = set()
-        for img in list(product.images):
-            key = (img.url,)
-            if key in seen:
-                db.delete(img)
-                removed += 1
-            else:
-                seen.add(key)
-    db.commit()
-    return JSONResponse({"removed": removed, "status": "ok"})
+async def cleanup_images(
+    batch_size: int = Query(IMAGE_CLEANUP_BATCH_SIZE, ge=1, le=100000),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Remove duplicate images (same product_id, url) in set-based batches, keeping the oldest row."""
+    stmt = delete_duplicate_images_stmt(batch_size)
+    removed = batches = 0
+    while True:
+        count = (await db.execute(stmt)).rowcount
+        await db.commit()
+        if not count:
+            break
+        removed += count
+        batches += 1
+        logging.info(f"[cleanup_images] batch {batches}: removed {count} duplicates ({removed} total)")
+    return JSONResponse({"removed": removed, "batches": batches, "status": "ok"})
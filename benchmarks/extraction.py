@@ -0,0 +1,70 @@
+"""
+Microbenchmark: per-page CPU of extraction on pages built from ``html_reference``.
+
+"two parses" reproduces the previous flow -- BeautifulSoup re-parses ``response.text`` for the
+Grandstream selectors and the spider's link query parses the page again with parsel.
+"shared parse" is the current flow: one parsel tree per response used by the extractor and
+the spider. Each reference snippet is repeated to reach the size of a real category page.
+
+    python -m benchmarks.extraction [--copies 100] [--repeat 20]
+"""
+import sys
+import time
+import argparse
+
+from bs4 import BeautifulSoup
+from scrapy.http import HtmlResponse
+
+from benchmarks.reference import reference_pages
+from crawler.extractors.base import selector_for
+from crawler.extractors.grandstream import GrandstreamExtractor
+
+LEGACY_SELECTORS = ("ul.hkb-category__articlelist li a", "a[download] img", "a.hkb-category__link")
+
+
+def two_parses(response: HtmlResponse) -> int:
+    soup = BeautifulSoup(response.text, "lxml")
+    found = 0
+    for css in LEGACY_SELECTORS:
+        found = len(soup.select(css))
+        if found:
+            break
+    return found + len(response.css("a::attr(href)").getall())
+
+
+def shared_parse(response: HtmlResponse) -> int:
+    items = GrandstreamExtractor().extract(response)
+    return len(items) + len(selector_for(response).css("a::attr(href)").getall())
+
+
+def cpu_per_page(fn, page: dict, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(3):
+        start = time.process_time()
+        for _ in range(repeat):
+            # A fresh response per run so nothing parsed earlier is reused
+            fn(HtmlResponse(url=page["url"], body=page["html"].encode("utf-8"), encoding="utf-8"))
+        best = min(best, (time.process_time() - start) / repeat)
+    return best
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--copies", type=int, default=100, help="times each snippet is repeated per page")
+    parser.add_argument("--repeat", type=int, default=20, help="pages parsed per measurement")
+    args = parser.parse_args(argv)
+
+    for name, page in reference_pages().items():
+        head, _, body = page["html"].partition("<body>")
+        body, _, tail = body.partition("</body>")
+        page = dict(page, html=f"{head}<body>{body * args.copies}</body>{tail}")
+        old = cpu_per_page(two_parses, page, args.repeat)
+        new = cpu_per_page(shared_parse, page, args.repeat)
+        print(
+            f"{name}: {len(page['html']) // 1024:4d} KiB  two parses {old * 1000:7.2f} ms  "
+            f"shared parse {new * 1000:7.2f} ms  ({old / new:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
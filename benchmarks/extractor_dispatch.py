@@ -0,0 +1,70 @@
+"""
+Microbenchmark: URL -> extractor dispatch over the links in ``html_reference``.
+
+Compares the compiled :class:`~crawler.extractors.ExtractorIndex` with the linear
+``any(extractor.matches(href) ...)`` scan SeedSpider used to run for every link, and with the
+original substring checks as a lower bound. The reference
+snippets are small, so their links are repeated to the size of a large category page.
+
+    python -m benchmarks.extractor_dispatch [--links 500] [--repeat 200] [--extra-extractors 50]
+
+``--extra-extractors`` registers synthetic extractors for other hosts to show how each
+approach scales with the number of sites.
+"""
+import sys
+import argparse
+import timeit
+
+from parsel import Selector
+
+from benchmarks.reference import reference_pages
+from crawler.extractors import ExtractorIndex, get_extractors
+from crawler.extractors.base import BaseExtractor
+
+
+def reference_links() -> list:
+    links = []
+    for page in reference_pages().values():
+        links += Selector(text=page["html"]).css("a::attr(href), img::attr(src)").getall()
+    # Links the spider also sees on those pages but that no extractor handles
+    links += ["https://www.youtube.com/watch?v=x", "https://example.com/", "#top", "/relative/page"]
+    return [link for link in links if link.startswith(("http://", "https://"))]
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--links", type=int, default=500, help="links per simulated page")
+    parser.add_argument("--repeat", type=int, default=200, help="pages to dispatch")
+    parser.add_argument("--extra-extractors", type=int, default=0, help="synthetic extractors to add")
+    args = parser.parse_args(argv)
+
+    base = reference_links()
+    page = (base * (args.links // len(base) + 1))[: args.links]
+    extractors = list(get_extractors()) + [
+        type(f"Synthetic{n}", (BaseExtractor,), {"domains": (f"site{n}.example.net",), "extract": lambda self, r: []})
+        for n in range(args.extra_extractors)
+    ]
+    index = ExtractorIndex(extractors)
+
+    def substring():
+        # The original per-extractor checks: `"grandstream.com" in url` and friends
+        for href in page:
+            any(domain in href for extractor in extractors for domain in extractor.domains)
+
+    def linear():
+        for href in page:
+            any(extractor.matches(href) for extractor in extractors)
+
+    def indexed():
+        for href in page:
+            index.lookup(href)
+
+    print(f"{len(base)} reference links, {args.links} links per page, {len(extractors)} extractors")
+    for name, fn in (("substring scan", substring), ("linear scan", linear), ("dispatch index", indexed)):
+        seconds = min(timeit.repeat(fn, number=args.repeat, repeat=3))
+        per_link = seconds / (args.repeat * args.links) * 1e6
+        print(f"{name:>15}: {seconds * 1000:8.1f} ms for {args.repeat} pages ({per_link:.2f} us/link)")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
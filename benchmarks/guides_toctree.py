@@ -0,0 +1,61 @@
+"""
+Microbenchmark: GuidesExtractor on synthetic Sphinx index pages with large toctrees.
+
+Compares the single-pass extractor with the previous per-href lookup, which ran one CSS query
+over the whole document for every link. The previous version is quadratic, so it is only run
+up to ``--legacy-max`` links.
+
+    python -m benchmarks.guides_toctree [--sizes 500 1000 2000 5000] [--legacy-max 2000]
+"""
+import sys
+import time
+import argparse
+
+from scrapy.http import HtmlResponse
+
+from crawler.extractors.guides import GuidesExtractor
+
+URL = "https://documentation.grandstream.com/index.html"
+
+
+def toctree_page(links: int) -> HtmlResponse:
+    entries = "".join(
+        f'<li class="toctree-l1"><a class="reference internal" href="guide-{n}.html">Guide {n}</a></li>'
+        for n in range(links)
+    )
+    html = f'<html><head><title>Index</title></head><body><div class="toctree-wrapper"><ul>{entries}</ul></div></body></html>'
+    return HtmlResponse(url=URL, body=html.encode("utf-8"), encoding="utf-8")
+
+
+def legacy_extract(response: HtmlResponse) -> int:
+    count = 0
+    for href in response.css('div.toctree-wrapper a::attr(href)').getall():
+        response.css(f'div.toctree-wrapper a[href="{href}"]::text').get()
+        count += 1
+    return count
+
+
+def timed(fn, response: HtmlResponse) -> float:
+    response.selector  # parse outside the measurement
+    start = time.perf_counter()
+    fn(response)
+    return time.perf_counter() - start
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[500, 1000, 2000, 5000])
+    parser.add_argument("--legacy-max", type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    for links in args.sizes:
+        new = timed(GuidesExtractor().extract, toctree_page(links))
+        line = f"{links:6d} links  single pass {new * 1000:8.1f} ms ({new / links * 1e6:.1f} us/link)"
+        if links <= args.legacy_max:
+            old = timed(legacy_extract, toctree_page(links))
+            line += f"  per-href query {old * 1000:9.1f} ms ({old / links * 1e6:.1f} us/link)"
+        print(line)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,22 @@
+"""Pages built from the HTML snippets stored in ``html_reference/``."""
+import re
+from pathlib import Path
+from typing import Dict
+
+REFERENCE_DIR = Path(__file__).resolve().parent.parent / "html_reference"
+HTML_BLOCK = re.compile(r"```html\n(.*?)```", re.DOTALL)
+SOURCE_URL = re.compile(r"\*\*Source URL:\*\*\s*(\S+)")
+
+
+def reference_pages() -> Dict[str, dict]:
+    """``{level name: {"url": source url, "html": full page}}`` for each reference file."""
+    pages = {}
+    for path in sorted(REFERENCE_DIR.glob("*.md")):
+        text = path.read_text(encoding="utf-8")
+        url = SOURCE_URL.search(text)
+        body = "\n".join(HTML_BLOCK.findall(text))
+        pages[path.stem] = {
+            "url": url.group(1) if url else "https://documentation.grandstream.com/",
+            "html": f"<html><head><title>{path.stem}</title></head><body>{body}</body></html>",
+        }
+    return pages
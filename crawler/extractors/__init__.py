@@ -2,9 +2,13 @@
 
 import pkgutil
 import importlib
-from crawler.extractors.base import BaseExtractor
+from typing import Dict, Optional, Sequence, Type
+
+from crawler.extractors.base import BaseExtractor, url_host
 
 _extractors = None
+_index = None
+HOST_CACHE_SIZE = 10000
 
 def get_extractors() -> list[type[BaseExtractor]]:
     """
@@ -20,3 +24,75 @@ def get_extractors() -> list[type[BaseExtractor]]:
                 if isinstance(obj, type) and issubclass(obj, BaseExtractor) and obj is not BaseExtractor:
                     _extractors.append(obj)
     return _extractors
+
+
+class ExtractorIndex:
+    """
+    URL -> extractor dispatch built once from the extractors' declared ``domains``.
+
+    Domains are stored in a trie keyed by host labels from the right (``com`` ->
+    ``grandstream`` -> ``documentation``), so a lookup walks the URL's host once instead of
+    testing every extractor. When several extractors cover a host the one discovered first
+    wins, as with a linear scan over :func:`get_extractors`. Extractors without ``domains``
+    fall back to their own :meth:`~BaseExtractor.matches`.
+    """
+
+    def __init__(self, extractors: Sequence[Type[BaseExtractor]]):
+        self.extractors = list(extractors)
+        self._trie: Dict[str, dict] = {}
+        self._fallback = []
+        self._hosts: Dict[str, Optional[int]] = {}
+        for position, extractor in enumerate(self.extractors):
+            if not extractor.domains:
+                self._fallback.append((position, extractor))
+            for domain in extractor.domains:
+                node = self._trie
+                for label in reversed(domain.lower().strip(".").split(".")):
+                    node = node.setdefault(label, {})
+                # Keep the earliest extractor if two declare the same domain
+                node.setdefault(None, position)
+
+    def _host_position(self, host: str) -> Optional[int]:
+        best = None
+        node = self._trie
+        for label in reversed(host.split(".")):
+            node = node.get(label)
+            if node is None:
+                break
+            position = node.get(None)
+            if position is not None and (best is None or position < best):
+                best = position
+        return best
+
+    def lookup(self, url: str) -> Optional[Type[BaseExtractor]]:
+        """Return the extractor for ``url``, or None if no extractor handles it."""
+        host = url_host(url)
+        best = None
+        if host:
+            # A crawl sees few distinct hosts, so each is resolved through the trie only once
+            try:
+                best = self._hosts[host]
+            except KeyError:
+                if len(self._hosts) >= HOST_CACHE_SIZE:
+                    self._hosts.clear()
+                best = self._hosts[host] = self._host_position(host)
+        for position, extractor in self._fallback:
+            if best is not None and position > best:
+                break
+            if extractor.matches(url):
+                best = position
+                break
+        return self.extractors[best] if best is not None else None
+
+
+def get_extractor_index() -> ExtractorIndex:
+    """Dispatch index over :func:`get_extractors`, built on first use."""
+    global _index
+    if _index is None:
+        _index = ExtractorIndex(get_extractors())
+    return _index
+
+
+def extractor_for(url: str) -> Optional[Type[BaseExtractor]]:
+    """Extractor class that handles ``url``, or None."""
+    return get_extractor_index().lookup(url)
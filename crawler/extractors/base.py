@@ -1,20 +1,57 @@
 from __future__ import annotations
 
+import re
 from abc import ABC, abstractmethod
-from typing import List
+from typing import List, Optional, Tuple
+
+from parsel import Selector
 
 from crawler.items import DataItem
 
 
+# scheme://[userinfo@]host[:port] -- cheaper than urlsplit() for the per-link hot path
+_HOST = re.compile(r"^[A-Za-z][A-Za-z0-9+.-]*://(?:[^/?#@]*@)?([^/?#:]+)")
+
+
+def url_host(url: str) -> Optional[str]:
+    """Lower-cased host of an absolute URL, or None if it has none."""
+    match = _HOST.match(url)
+    return match.group(1).lower().rstrip(".") if match else None
+
+
+def selector_for(response) -> Selector:
+    """
+    The parsed document shared by the spider and every extractor for ``response``.
+
+    Scrapy responses parse lazily once into ``response.selector``; other objects with a
+    ``text`` attribute (e.g. test doubles) get a selector cached on them on first use.
+    """
+    selector = getattr(response, "selector", None)
+    if selector is None:
+        selector = Selector(text=response.text)
+        try:
+            response.selector = selector
+        except AttributeError:
+            pass
+    return selector
+
+
 class BaseExtractor(ABC):
     """
     Interface each domain-specific extractor must implement.
+
+    Extractors declare the hosts they handle in ``domains``; a domain also covers its
+    subdomains. Extractors that need more than the host can override :meth:`matches`
+    instead and leave ``domains`` empty.
     """
 
+    domains: Tuple[str, ...] = ()
+
     @classmethod
-    @abstractmethod
     def matches(cls, url: str) -> bool:
         """Return True if this extractor knows how to parse the given URL."""
+        host = url_host(url)
+        return bool(host) and any(host == d or host.endswith("." + d) for d in cls.domains)
 
     @abstractmethod
     def extract(self, response) -> List[DataItem]:  # Scrapy response
@@ -1,33 +1,43 @@
-from typing import List
-from bs4 import BeautifulSoup
+from typing import List, Optional
+from parsel import Selector
 from scrapy.http import Response
 from urllib.parse import urlparse
 
 from crawler.items import DataItem, ItemType
-from crawler.extractors.base import BaseExtractor
+from crawler.extractors.base import BaseExtractor, selector_for
+
+
+def _text(node: Selector) -> str:
+    """Concatenated, individually stripped text of ``node`` and its descendants."""
+    return "".join(t.strip() for t in node.xpath(".//text()").getall())
+
+
+def _string(node: Selector) -> Optional[str]:
+    """Text of ``node`` if it has exactly one child, otherwise None."""
+    if len(node.xpath("node()")) != 1:
+        return None
+    return node.xpath("string()").get()
 
 
 class GrandstreamExtractor(BaseExtractor):
     """Very first cut: extract only the <title>."""
 
-    @classmethod
-    def matches(cls, url: str) -> bool:
-        return "grandstream.com" in url
+    domains = ("grandstream.com",)
 
     def extract(self, response: Response) -> List[DataItem]:
         """
         Extract either a list of subcategories (with title, icon, and URL) if present,
         otherwise extract a simple page title.
         """
-        soup = BeautifulSoup(response.text, "lxml")
+        sel = selector_for(response)
 
         # Handle article list on product series pages (Level 4)
-        article_links = soup.select("ul.hkb-category__articlelist li a")
+        article_links = sel.css("ul.hkb-category__articlelist li a")
         if article_links:
             items: List[DataItem] = []
             for a in article_links:
-                href = a.get("href", "")
-                title = a.get_text(strip=True)
+                href = a.attrib.get("href", "")
+                title = _text(a)
                 items.append(
                     DataItem(
                         url=href,
@@ -38,13 +48,13 @@ class GrandstreamExtractor(BaseExtractor):
             return items
 
         # Handle PDF manual download links on manual pages (Level 5)
-        pdf_links = soup.select("a[download] img")
+        pdf_links = sel.css("a[download] img")
         if pdf_links:
             items: List[DataItem] = []
             for img in pdf_links:
-                link = img.parent
-                pdf_url = link.get("href", "")
-                icon_url = img.get("src", "")
+                link = img.xpath("..")
+                pdf_url = link.attrib.get("href", "")
+                icon_url = img.attrib.get("src", "")
                 # Derive a simple title from the filename
                 filename = pdf_url.split("/")[-1]
                 title = filename.replace(".pdf", "").replace("-", " ")
@@ -63,7 +73,7 @@ class GrandstreamExtractor(BaseExtractor):
             return items
 
         # Look for subcategory blocks on category pages
-        sub_links = soup.select("a.hkb-category__link")
+        sub_links = sel.css("a.hkb-category__link")
         if sub_links:
             def classify_branch(href: str) -> str:
                 path = urlparse(href).path.rstrip('/')
@@ -76,13 +86,13 @@ class GrandstreamExtractor(BaseExtractor):
             
             items: List[DataItem] = []
             for link in sub_links:
-                href = link.get("href", "")
+                href = link.attrib.get("href", "")
                 # Title is inside <h2 class="hkb-category__title">
-                title_tag = link.select_one(".hkb-category__title")
-                title = title_tag.get_text(strip=True) if title_tag else ""
+                title_tag = link.css(".hkb-category__title")
+                title = _text(title_tag[0]) if title_tag else ""
                 # Icon image
-                img_tag = link.select_one(".hkb-category__iconwrap img")
-                image_url = img_tag.get("src", "") if img_tag else ""
+                img_tag = link.css(".hkb-category__iconwrap img")
+                image_url = img_tag[0].attrib.get("src", "") if img_tag else ""
                 items.append(
                     DataItem(
                         url=href,
@@ -97,7 +107,8 @@ class GrandstreamExtractor(BaseExtractor):
             return items
 
         # Fallback to simple page title extraction
-        title = (soup.title.string or "").strip() if soup.title else "Untitled"
+        title_tag = sel.xpath("//title")
+        title = (_string(title_tag[0]) or "").strip() if title_tag else "Untitled"
         return [
             DataItem(
                 url=response.url,
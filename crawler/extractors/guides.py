@@ -1,22 +1,31 @@
 from typing import List
 from scrapy.http import Response
-from crawler.extractors.base import BaseExtractor
+from crawler.extractors.base import BaseExtractor, selector_for
 from crawler.items import DataItem, ItemType
 
 class GuidesExtractor(BaseExtractor):
     """
     Extractor for Grandstream documentation guides pages.
     """
-    @classmethod
-    def matches(cls, url: str) -> bool:
-        return "documentation.grandstream.com" in url
+    domains = ("documentation.grandstream.com",)
 
     def extract(self, response: Response) -> List[DataItem]:
+        sel = selector_for(response)
         items: List[DataItem] = []
-        # Extract links from the Sphinx toctree wrapper
-        for href in response.css('div.toctree-wrapper a::attr(href)').getall():
+        # Extract links from the Sphinx toctree wrapper, reading each anchor's href and text in
+        # one pass; a repeated href takes the text of its first anchor
+        anchors = []
+        for a in sel.css('div.toctree-wrapper a[href]'):
+            # Query the lxml element directly: wrapping each text node in a Selector costs more
+            # than the rest of the loop
+            texts = a.root.xpath('text()')
+            anchors.append((a.root.get('href'), str(texts[0]) if texts else None))
+        titles = {}
+        for href, title in anchors:
+            titles.setdefault(href, title)
+        for href, _ in anchors:
             full_url = response.urljoin(href)
-            title = response.css(f'div.toctree-wrapper a[href="{href}"]::text').get()
+            title = titles[href]
             text = title.strip() if title else full_url
             items.append(DataItem(
                 url=full_url,
@@ -25,7 +34,7 @@ class GuidesExtractor(BaseExtractor):
             ))
         # Fallback to simple title if no guide links found
         if not items:
-            page_title = response.css('title::text').get(default='').strip()
+            page_title = sel.css('title::text').get(default='').strip()
             items.append(DataItem(
                 url=response.url,
                 item_type=ItemType.PAGE,
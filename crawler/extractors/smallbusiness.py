@@ -1,21 +1,19 @@
 from typing import List
 from scrapy.http import Response
-from crawler.extractors.base import BaseExtractor
+from crawler.extractors.base import BaseExtractor, selector_for
 from crawler.items import DataItem, ItemType
 
 class SmallbusinessExtractor(BaseExtractor):
     """
     Extractor for the Small Business Phones Canada routers page.
     """
-    @classmethod
-    def matches(cls, url: str) -> bool:
-        # Match any smallbusinessphones.ca page
-        return "smallbusinessphones.ca" in url
+    domains = ("smallbusinessphones.ca",)
 
     def extract(self, response: Response) -> List[DataItem]:
+        sel = selector_for(response)
         items: List[DataItem] = []
         # Select products by new img classes or legacy container
-        for img in response.css('img.ty-pict.lazyOwl.cm-image.abt-ut2-lazy-loaded, img.ty-pict.lazyOwl.cm-image, #category_products_11 img'):
+        for img in sel.css('img.ty-pict.lazyOwl.cm-image.abt-ut2-lazy-loaded, img.ty-pict.lazyOwl.cm-image, #category_products_11 img'):
             # Find the nearest ancestor link
             parent_link = img.xpath('ancestor::a[@href][1]')
             link = parent_link.xpath('@href').get()
@@ -38,7 +36,7 @@ class SmallbusinessExtractor(BaseExtractor):
             ))
         # Fallback: if no products found, yield page title as a single item
         if not items:
-            title = response.css('title::text').get(default='').strip()
+            title = sel.css('title::text').get(default='').strip()
             items.append(
                 DataItem(
                     url=response.url,
@@ -0,0 +1,307 @@
+"""
+URL frontier: canonical URLs and a disk-backed Bloom filter of URLs already requested.
+
+:func:`canonicalize_url` folds the variants vendor sites link to (fragments, tracking
+parameters, query order, trailing slashes, default ports, host case) into one key.
+:class:`BloomFilter` stores those keys in a fixed-size bit array, either in memory or in an
+mmap'd file, so millions of URLs fit in a few MiB and the seen-set survives between crawls.
+Filters with the same parameters can be merged (e.g. from parallel crawls).
+:class:`BloomDupeFilter` plugs both into Scrapy via ``DUPEFILTER_CLASS``.
+
+Persistence is opt-in through ``FRONTIER_PATH``: with it set, pages fetched by an earlier crawl
+are not requested again (start URLs and ``dont_filter`` requests always are). Only URLs that got
+a successful response are persisted, so requests still queued when a crawl is interrupted are
+made next time. Incremental crawls (``INCREMENTAL_CRAWL``) re-request known pages with
+conditional GETs, so they ignore ``FRONTIER_PATH``.
+
+    python -m crawler.frontier merge TARGET SOURCE [SOURCE ...]
+    python -m crawler.frontier stats PATH
+"""
+import os
+import sys
+import math
+import mmap
+import shutil
+import struct
+import hashlib
+import logging
+from typing import Iterable, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import numpy as np
+from scrapy import signals
+from scrapy.dupefilters import BaseDupeFilter
+from scrapy.http.request import NO_CALLBACK
+from scrapy.utils.request import referer_str
+from w3lib.url import canonicalize_url as w3lib_canonicalize_url
+
+logger = logging.getLogger(__name__)
+
+# Query parameters that only track the visit and never change the page
+TRACKING_PARAMS = frozenset({
+    "gclid", "dclid", "fbclid", "msclkid", "yclid", "mc_cid", "mc_eid", "_ga", "_gl", "_hsenc", "_hsmi",
+    "mkt_tok", "igshid", "ref_src", "srsltid",
+})
+TRACKING_PREFIXES = ("utm_",)
+DEFAULT_PORTS = {"http": 80, "https": 443}
+# Set bits per byte value, for counting without numpy>=2's bitwise_count
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def canonicalize_url(url: str, strip_params: Iterable[str] = ()) -> str:
+    """
+    Canonical form of ``url`` used as its dedupe key.
+
+    Lower-cases scheme and host, drops default ports, fragments and tracking parameters
+    (plus any in ``strip_params``), sorts the query, normalizes percent-encoding and removes
+    a trailing slash from non-root paths.
+    """
+    strip = TRACKING_PARAMS.union(p.lower() for p in strip_params)
+    parts = urlsplit(w3lib_canonicalize_url(url, keep_fragments=False))
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").rstrip(".")
+    netloc = host
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        netloc = f"{host}:{parts.port}"
+    if parts.username:
+        netloc = f"{parts.username}@{netloc}"
+    path = parts.path or "/"
+    while "//" in path:
+        path = path.replace("//", "/")
+    if len(path) > 1:
+        path = path.rstrip("/")
+    query = urlencode([
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if k.lower() not in strip and not k.lower().startswith(TRACKING_PREFIXES)
+    ])
+    return urlunsplit((scheme, netloc, path, query, ""))
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over strings, in memory or backed by an mmap'd file.
+
+    Sized for ``capacity`` keys at ``error_rate`` false positives; memory use is
+    ``capacity * -ln(error_rate) / ln(2)^2`` bits whatever is added. An existing file keeps the
+    parameters it was created with. A false positive means a URL is wrongly treated as seen.
+    """
+
+    MAGIC = b"GSGBLOOM"
+    _HEADER = struct.Struct("<8sIIQQ")  # magic, version, hashes, bits, count
+
+    def __init__(self, path: Optional[str] = None, capacity: int = 10_000_000, error_rate: float = 0.001):
+        self.path = path
+        self._file = None
+        if path and os.path.exists(path):
+            self._file = open(path, "r+b")
+            self._buf = mmap.mmap(self._file.fileno(), 0)
+            magic, version, self.hashes, self.bits, self.count = self._HEADER.unpack_from(self._buf)
+            if magic != self.MAGIC or version != 1:
+                raise ValueError(f"{path} is not a Bloom filter file")
+            return
+        self.bits = max(8, int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)))
+        self.hashes = max(1, round(self.bits / capacity * math.log(2)))
+        self.count = 0
+        size = self._HEADER.size + (self.bits + 7) // 8
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(path, "wb") as f:
+                f.truncate(size)
+            self._file = open(path, "r+b")
+            self._buf = mmap.mmap(self._file.fileno(), 0)
+        else:
+            self._buf = bytearray(size)
+        self._write_header()
+
+    def _write_header(self) -> None:
+        self._HEADER.pack_into(self._buf, 0, self.MAGIC, 1, self.hashes, self.bits, self.count)
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        # Kirsch-Mitzenmacher double hashing: k positions from two hashes
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def __contains__(self, key: str) -> bool:
+        buf, offset = self._buf, self._HEADER.size
+        return all(buf[offset + (p >> 3)] & (1 << (p & 7)) for p in self._positions(key))
+
+    def add(self, key: str) -> bool:
+        """Add ``key``; return True if it was not (probably) present before."""
+        buf, offset = self._buf, self._HEADER.size
+        new = False
+        for p in self._positions(key):
+            i, bit = offset + (p >> 3), 1 << (p & 7)
+            if not buf[i] & bit:
+                buf[i] |= bit
+                new = True
+        if new:
+            self.count += 1
+        return new
+
+    def _body(self) -> np.ndarray:
+        return np.frombuffer(self._buf, dtype=np.uint8, offset=self._HEADER.size)
+
+    def merge(self, other: "BloomFilter") -> None:
+        """Add every key of ``other`` (a filter with the same size and hash count)."""
+        if (other.bits, other.hashes) != (self.bits, self.hashes):
+            raise ValueError("Bloom filters must have the same size and number of hashes to merge")
+        body = self._body()
+        np.bitwise_or(body, other._body(), out=body)
+        self.count = self.estimated_count()
+
+    def estimated_count(self) -> int:
+        """Number of distinct keys estimated from the share of set bits."""
+        filled = int(_POPCOUNT[self._body()].sum(dtype=np.int64))
+        if filled >= self.bits:
+            return self.count
+        return int(round(-self.bits / self.hashes * math.log(1 - filled / self.bits)))
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._buf)
+
+    def flush(self) -> None:
+        self._write_header()
+        if isinstance(self._buf, mmap.mmap):
+            self._buf.flush()
+
+    def close(self) -> None:
+        self.flush()
+        if self._file is not None:
+            self._buf.close()
+            self._file.close()
+            self._file = None
+
+    def __enter__(self) -> "BloomFilter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class BloomDupeFilter(BaseDupeFilter):
+    """
+    Scrapy dupe filter keyed by canonical URL, with a :class:`BloomFilter` for persistence.
+
+    Requests of this crawl are filtered as they are scheduled, against an exact set so no page is
+    dropped by a false positive. A redirect to a URL with the same key as the one it came from
+    (``/foo`` to ``/foo/``) is let through. With a ``path``, URLs are also recorded in a Bloom
+    filter there once their response is successful (2xx or 304), and requests for URLs recorded
+    by earlier crawls are filtered too.
+
+    Settings: ``FRONTIER_PATH`` (persist the crawled set there; ignored in incremental crawls),
+    ``FRONTIER_CAPACITY``, ``FRONTIER_ERROR_RATE``, ``FRONTIER_STRIP_PARAMS`` (extra query
+    parameters to ignore) and Scrapy's ``DUPEFILTER_DEBUG``.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        capacity: int = 10_000_000,
+        error_rate: float = 0.001,
+        strip_params: Iterable[str] = (),
+        debug: bool = False,
+        stats=None,
+    ):
+        self.seen = set()
+        self.crawled = BloomFilter(path, capacity=capacity, error_rate=error_rate) if path else None
+        self.strip_params = tuple(strip_params)
+        self.debug = debug
+        self.logdupes = True
+        self.stats = stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        from crawler.incremental import _enabled
+
+        settings = crawler.settings
+        path = settings.get("FRONTIER_PATH") or None
+        if path and _enabled(crawler):
+            logger.warning("FRONTIER_PATH is ignored in incremental crawls: known pages are re-checked with conditional GETs")
+            path = None
+        dupefilter = cls(
+            path=path,
+            capacity=settings.getint("FRONTIER_CAPACITY", 10_000_000),
+            error_rate=settings.getfloat("FRONTIER_ERROR_RATE", 0.001),
+            strip_params=settings.getlist("FRONTIER_STRIP_PARAMS"),
+            debug=settings.getbool("DUPEFILTER_DEBUG"),
+            stats=crawler.stats,
+        )
+        if dupefilter.crawled is not None:
+            crawler.signals.connect(dupefilter.response_received, signal=signals.response_received)
+        return dupefilter
+
+    def request_key(self, request) -> str:
+        key = canonicalize_url(request.url, self.strip_params)
+        return key if request.method == "GET" else f"{request.method} {key}"
+
+    def request_seen(self, request) -> bool:
+        key = self.request_key(request)
+        redirected_from = request.meta.get("redirect_urls") or ()
+        if any(self.request_key(request.replace(url=url)) == key for url in redirected_from):
+            return False
+        if self.crawled is not None and key in self.crawled:
+            return True
+        if key in self.seen:
+            return True
+        self.seen.add(key)
+        return False
+
+    def response_received(self, response, request, spider=None) -> None:
+        """Persist the request's URL once it was fetched successfully."""
+        if self.crawled is None or request.callback is NO_CALLBACK:
+            return
+        if 200 <= response.status < 300 or response.status == 304:
+            self.crawled.add(self.request_key(request))
+
+    def close(self, reason: str) -> None:
+        if self.stats is not None:
+            self.stats.set_value("frontier/seen", len(self.seen))
+            if self.crawled is not None:
+                self.stats.set_value("frontier/crawled_estimate", self.crawled.count)
+        if self.crawled is not None:
+            self.crawled.close()
+
+    def log(self, request, spider) -> None:
+        if self.debug:
+            logger.debug(
+                "Filtered duplicate request: %(request)s (referer: %(referer)s)",
+                {"request": request, "referer": referer_str(request)},
+                extra={"spider": spider},
+            )
+        elif self.logdupes:
+            logger.debug(
+                "Filtered duplicate request: %(request)s - no more duplicates will be shown"
+                " (see DUPEFILTER_DEBUG to show all duplicates)",
+                {"request": request},
+                extra={"spider": spider},
+            )
+            self.logdupes = False
+        if self.stats is not None:
+            self.stats.inc_value("dupefilter/filtered", spider=spider)
+
+
+def main(argv=None) -> None:
+    args = sys.argv[1:] if argv is None else argv
+    if len(args) >= 3 and args[0] == "merge":
+        target, sources = args[1], args[2:]
+        if not os.path.exists(target):
+            # Start from a copy of the first source so the parameters match
+            shutil.copyfile(sources[0], target)
+            sources = sources[1:]
+        with BloomFilter(target) as bloom:
+            for source in sources:
+                with BloomFilter(source) as other:
+                    bloom.merge(other)
+            print(f"{target}: ~{bloom.count} URLs")
+    elif len(args) == 2 and args[0] == "stats":
+        with BloomFilter(args[1]) as bloom:
+            print(f"{args[1]}: ~{bloom.count} URLs, {bloom.bits} bits, {bloom.hashes} hashes, {bloom.nbytes} bytes")
+    else:
+        print("usage: python -m crawler.frontier merge TARGET SOURCE [SOURCE ...] | stats PATH")
+        sys.exit(2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+"""
+Incremental crawling with conditional GETs.
+
+:class:`ConditionalGetMiddleware` remembers each page's ``ETag``, ``Last-Modified``, content hash
+and outgoing links in a :class:`ValidatorStore`. On the next crawl it sends
+``If-None-Match``/``If-Modified-Since``. The spider receives a ``304`` or a ``200`` whose body
+hashes the same as before flagged ``incremental_unchanged``, with the page's links in
+``incremental_links``; it then only follows links and emits no items, so extraction and
+pipelines are skipped. Media (image/PDF pipeline) and robots.txt requests are left alone.
+
+New validators are only written by :class:`IncrementalSpiderMiddleware` once everything the
+spider produced from the page went through the item pipelines without error, so a page whose
+items failed (or a crawl that died first) is extracted again next time.
+
+Enabled with ``INCREMENTAL_CRAWL=1`` or ``scrapy crawl seed -a incremental=1``; validators are
+kept in ``INCREMENTAL_STORE_PATH``.
+"""
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from dataclasses import dataclass
+from typing import List, Optional
+from weakref import WeakKeyDictionary
+
+from itemadapter import is_item
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from scrapy.http import TextResponse
+from scrapy.http.request import NO_CALLBACK
+
+from crawler.extractors.base import selector_for
+from crawler.frontier import canonicalize_url
+
+@dataclass
+class Validators:
+    url: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    content_hash: Optional[str]
+    length: int
+    links: List[str]
+    fetched_at: float
+
+
+class ValidatorStore:
+    """SQLite table of validators per canonical URL; writes are committed in batches."""
+
+    def __init__(self, path: str, commit_every: int = 200):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.commit_every = commit_every
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS validators ("
+            " url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, content_hash TEXT,"
+            " length INTEGER NOT NULL DEFAULT 0, links TEXT NOT NULL DEFAULT '[]', fetched_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, url: str) -> Optional[Validators]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT url, etag, last_modified, content_hash, length, links, fetched_at FROM validators WHERE url = ?",
+                (url,),
+            ).fetchone()
+        if row is None:
+            return None
+        return Validators(*row[:5], links=json.loads(row[5]), fetched_at=row[6])
+
+    def put(self, v: Validators) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO validators (url, etag, last_modified, content_hash, length, links, fetched_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT(url) DO UPDATE SET etag = excluded.etag,"
+                " last_modified = excluded.last_modified, content_hash = excluded.content_hash,"
+                " length = excluded.length, links = excluded.links, fetched_at = excluded.fetched_at",
+                (v.url, v.etag, v.last_modified, v.content_hash, v.length, json.dumps(v.links), v.fetched_at),
+            )
+            self._pending += 1
+            if self._pending >= self.commit_every:
+                self._conn.commit()
+                self._pending = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM validators").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is None:
+                return
+            self._conn.commit()
+            self._conn.close()
+            self._conn = None
+
+
+@dataclass
+class _Progress:
+    """Validators of a fetched page, written once all items from its response are processed."""
+    validators: Validators
+    outstanding: int = 0
+    exhausted: bool = False
+    failed: bool = False
+    settled: bool = False
+
+
+# One store per crawler, shared by the downloader and spider middlewares
+_stores: "WeakKeyDictionary" = WeakKeyDictionary()
+
+
+def _enabled(crawler) -> bool:
+    spider_flag = str(getattr(crawler.spider, "incremental", "") or "").lower() in ("1", "true", "yes")
+    return crawler.settings.getbool("INCREMENTAL_CRAWL") or spider_flag
+
+
+def _store_for(crawler) -> ValidatorStore:
+    store = _stores.get(crawler)
+    if store is None:
+        path = crawler.settings.get("INCREMENTAL_STORE_PATH") or ".crawl/validators.sqlite3"
+        store = _stores[crawler] = ValidatorStore(path)
+        crawler.signals.connect(store.close, signal=signals.spider_closed)
+    return store
+
+
+def _header(response, name: str) -> Optional[str]:
+    value = response.headers.get(name)
+    return value.decode("latin-1") if value else None
+
+
+class ConditionalGetMiddleware:
+    """Downloader middleware sending conditional requests and flagging unchanged pages."""
+
+    def __init__(self, store: ValidatorStore, stats=None):
+        self.store = store
+        self.stats = stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not _enabled(crawler):
+            raise NotConfigured("incremental crawling is disabled")
+        middleware = cls(_store_for(crawler), crawler.stats)
+        crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
+        return middleware
+
+    def _inc(self, key: str, count: int = 1) -> None:
+        if self.stats is not None:
+            self.stats.inc_value(f"incremental/{key}", count)
+
+    @staticmethod
+    def _applies(request) -> bool:
+        # Media pipelines and robots.txt use NO_CALLBACK; they have their own freshness rules
+        return request.method == "GET" and request.callback is not NO_CALLBACK and request.meta.get("incremental", True)
+
+    def process_request(self, request, spider):
+        if not self._applies(request):
+            return None
+        known = self.store.get(canonicalize_url(request.url))
+        if known is None:
+            return None
+        request.meta["incremental_validators"] = known
+        if not (known.etag or known.last_modified):
+            return None
+        if known.etag:
+            request.headers.setdefault("If-None-Match", known.etag)
+        if known.last_modified:
+            request.headers.setdefault("If-Modified-Since", known.last_modified)
+        # Let the spider see the 304 instead of HttpErrorMiddleware dropping it
+        allowed = list(request.meta.get("handle_httpstatus_list", []))
+        if 304 not in allowed:
+            request.meta["handle_httpstatus_list"] = allowed + [304]
+        self._inc("conditional_requests")
+        return None
+
+    def process_response(self, request, response, spider):
+        if not self._applies(request):
+            return response
+        known: Optional[Validators] = request.meta.get("incremental_validators")
+        key = canonicalize_url(request.url)
+        if response.status == 304 and known is not None:
+            self._inc("not_modified")
+            self._inc("bytes_saved", known.length)
+            request.meta["incremental_links"] = known.links
+            known.etag = _header(response, "ETag") or known.etag
+            known.fetched_at = time.time()
+            self.store.put(known)
+            return response
+        if response.status != 200:
+            return response
+
+        content_hash = hashlib.sha256(response.body).hexdigest()
+        links = selector_for(response).css("a::attr(href)").getall() if isinstance(response, TextResponse) else []
+        if known is not None and known.content_hash == content_hash:
+            # Server ignored the validators (or sent none) but the page is byte-identical
+            self._inc("unchanged")
+            request.meta["incremental_unchanged"] = True
+            request.meta["incremental_links"] = links
+        else:
+            self._inc("changed" if known is not None else "new")
+        # Written by IncrementalSpiderMiddleware once the page's items are through the pipelines
+        request.meta["incremental_progress"] = _Progress(Validators(
+            url=key,
+            etag=_header(response, "ETag"),
+            last_modified=_header(response, "Last-Modified"),
+            content_hash=content_hash,
+            length=len(response.body),
+            links=links,
+            fetched_at=time.time(),
+        ))
+        return response
+
+    def spider_closed(self, spider):
+        if self.stats is None:
+            return
+        stats = {k.split("/", 1)[1]: v for k, v in self.stats.get_stats().items() if k.startswith("incremental/")}
+        saved = stats.get("not_modified", 0) + stats.get("unchanged", 0)
+        spider.logger.info(
+            "Incremental crawl: %d not modified (%d bytes not downloaded), %d unchanged, %d changed, %d new"
+            " -- %d pages skipped extraction",
+            stats.get("not_modified", 0), stats.get("bytes_saved", 0), stats.get("unchanged", 0),
+            stats.get("changed", 0), stats.get("new", 0), saved,
+        )
+
+
+class IncrementalSpiderMiddleware:
+    """
+    Spider middleware committing a page's new validators once every item the spider produced
+    from it has been scraped (or dropped) by the item pipelines. An item error, an exception in
+    the callback or a crawl that stops first leaves the old validators in place.
+    """
+
+    def __init__(self, store: ValidatorStore, stats=None):
+        self.store = store
+        self.stats = stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not _enabled(crawler):
+            raise NotConfigured("incremental crawling is disabled")
+        middleware = cls(_store_for(crawler), crawler.stats)
+        crawler.signals.connect(middleware.item_done, signal=signals.item_scraped)
+        crawler.signals.connect(middleware.item_done, signal=signals.item_dropped)
+        crawler.signals.connect(middleware.item_error, signal=signals.item_error)
+        return middleware
+
+    def process_spider_output(self, response, result, spider):
+        progress = response.meta.get("incremental_progress")
+        if progress is None:
+            yield from result
+            return
+        try:
+            for output in result:
+                if is_item(output):
+                    progress.outstanding += 1
+                yield output
+        except Exception:
+            progress.failed = True
+            raise
+        progress.exhausted = True
+        self._settle(progress)
+
+    def item_done(self, item, response, spider, **kwargs):
+        self._item_finished(response)
+
+    def item_error(self, item, response, spider, failure=None, **kwargs):
+        progress = self._progress(response)
+        if progress is not None:
+            progress.failed = True
+        self._item_finished(response)
+
+    @staticmethod
+    def _progress(response) -> Optional[_Progress]:
+        return response.meta.get("incremental_progress") if response is not None else None
+
+    def _item_finished(self, response) -> None:
+        progress = self._progress(response)
+        if progress is not None:
+            progress.outstanding -= 1
+            self._settle(progress)
+
+    def _settle(self, progress: _Progress) -> None:
+        if progress.settled or not progress.exhausted or progress.outstanding > 0:
+            return
+        progress.settled = True
+        if progress.failed:
+            if self.stats is not None:
+                self.stats.inc_value("incremental/not_committed")
+            return
+        self.store.put(progress.validators)
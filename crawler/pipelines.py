@@ -4,7 +4,24 @@ from scrapy import Request
 from crawler.items import DataItem, ItemType
 import os
 from scrapy.exceptions import NotConfigured
-from shared.db import SessionLocal, create_image, create_document, get_or_create_product
+from sqlalchemy import exists, func, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from shared.db import (
+    Product,
+    SessionLocal,
+    create_image,
+    create_document,
+    get_or_create_product,
+    get_or_create_product_id,
+    product_id_cache,
+)
+
+
+def _product_key(item):
+    """``(model, name)`` identifying the item's product, as ProductPipeline resolves it."""
+    model = item.payload.get('model') or item.url
+    name = item.payload.get('name') or item.payload.get('title', '')
+    return model, name
 
 
 class CategoryImagesPipeline(ImagesPipeline):
@@ -43,7 +60,16 @@ class CategoryImagesPipeline(ImagesPipeline):
                 local_path = file_info.get('path')
                 if ok and prod_id and local_path:
                     from os.path import basename
-                    create_image(session, product_id=prod_id, url=basename(local_path))
+                    try:
+                        create_image(session, product_id=prod_id, url=basename(local_path))
+                    except IntegrityError:
+                        # The cached product was deleted meanwhile; look it up again
+                        session.rollback()
+                        model, name = _product_key(item)
+                        product_id_cache.invalidate(model)
+                        prod_id = get_or_create_product_id(session, model=model, name=name)
+                        item.payload['product_id'] = prod_id
+                        create_image(session, product_id=prod_id, url=basename(local_path))
             session.close()
         return item
 
@@ -81,13 +107,20 @@ class ManualFilesPipeline(FilesPipeline):
             model = item.payload.get('model')
             name = item.payload.get('name')
             if model or name:
-                # Look up or create the product
-                product = get_or_create_product(session, model=model, name=name)
+                # Look up or create the product (cached per model across items)
+                product_id = get_or_create_product_id(session, model=model, name=name)
                 for ok, file_info in results:
                     local_path = file_info.get('path')
                     if ok and local_path:
                         from os.path import basename
-                        create_document(session, product_id=product.id, url=basename(local_path))
+                        try:
+                            create_document(session, product_id=product_id, url=basename(local_path))
+                        except IntegrityError:
+                            # The cached product was deleted meanwhile; look it up again
+                            session.rollback()
+                            product_id_cache.invalidate(model)
+                            product_id = get_or_create_product_id(session, model=model, name=name)
+                            create_document(session, product_id=product_id, url=basename(local_path))
             session.close()
         return item
 
@@ -97,21 +130,48 @@ class ProductPipeline:
     def process_item(self, item, spider):
         if isinstance(item, DataItem) and item.item_type == ItemType.PRODUCT:
             session = SessionLocal()
-            model = item.payload.get('model') or item.url
-            name = item.payload.get('name') or item.payload.get('title', '')
-            product = get_or_create_product(session, model=model, name=name)
-            # Update other fields if present
-            updated = False
-            for field in ('category', 'price', 'brand'):
-                if field in item.payload:
-                    val = item.payload[field]
+            model, name = _product_key(item)
+            fields = {f: item.payload[f] for f in ('category', 'price', 'brand') if f in item.payload}
+            product_id = product_id_cache.get(model)
+            if product_id is not None and fields:
+                # Known model: write changed fields in one UPDATE without reading the product first.
+                # No row updated means nothing changed or the cached product is gone; the same
+                # statement reports whether the row still exists.
+                changed = or_(*(getattr(Product, f).is_distinct_from(v) for f, v in fields.items()))
+                written = (
+                    update(Product).where(Product.id == product_id, changed).values(fields)
+                    .returning(Product.id).cte('written')
+                )
+                _, found = session.execute(select(
+                    select(func.count()).select_from(written).scalar_subquery(),
+                    exists().where(Product.id == product_id),
+                )).one()
+                session.commit()
+                if not found:
+                    product_id_cache.invalidate(model)
+                    product_id = None
+            if product_id is None:
+                product = get_or_create_product(session, model=model, name=name)
+                # Update other fields if present
+                updated = False
+                for field, val in fields.items():
                     if getattr(product, field, None) != val:
                         setattr(product, field, val)
                         updated = True
-            if updated:
-                session.add(product)
-                session.commit()
+                if updated:
+                    session.add(product)
+                    session.commit()
+                product_id = product.id
+                product_id_cache.put(model, product_id)
             # Attach product_id for downstream pipelines
-            item.payload['product_id'] = product.id
+            item.payload['product_id'] = product_id
             session.close()
-        return item 
\ No newline at end of file
+        return item
+
+    def close_spider(self, spider):
+        stats = product_id_cache.stats()
+        spider.logger.info("Product id cache: %(hits)d hits, %(misses)d misses (hit rate %(hit_rate).2f)", stats)
+        crawler = getattr(spider, 'crawler', None)
+        if crawler is not None and crawler.stats is not None:
+            for key, value in stats.items():
+                crawler.stats.set_value(f'product_id_cache/{key}', value) 
\ No newline at end of file
@@ -1,5 +1,7 @@
 # Scrapy settings for GrandGuruAI crawler project
 
+import os
+
 BOT_NAME = 'grandguru'
 
 SPIDER_MODULES = ['crawler.spiders']
@@ -15,6 +17,27 @@ ITEM_PIPELINES = {
     'crawler.pipelines.ManualFilesPipeline': 200,
 }
 
+# Dedupe requests by canonical URL (fragments, tracking params and trailing slashes ignored)
+DUPEFILTER_CLASS = 'crawler.frontier.BloomDupeFilter'
+# Set FRONTIER_PATH (e.g. .crawl/seen.bloom) to skip URLs fetched successfully by earlier crawls
+# (ignored in incremental crawls, which re-check known pages)
+FRONTIER_PATH = os.getenv('FRONTIER_PATH', '')
+FRONTIER_CAPACITY = int(os.getenv('FRONTIER_CAPACITY', '10000000'))
+FRONTIER_ERROR_RATE = float(os.getenv('FRONTIER_ERROR_RATE', '0.001'))
+
+# Incremental crawls: send If-None-Match/If-Modified-Since and skip extraction for unchanged
+# pages. Enable with INCREMENTAL_CRAWL=1 or `scrapy crawl seed -a incremental=1`
+DOWNLOADER_MIDDLEWARES = {
+    # Below HttpCompressionMiddleware (590) so bodies are hashed after decompression
+    'crawler.incremental.ConditionalGetMiddleware': 580,
+}
+# Stores a page's new validators once its items have passed the pipelines
+SPIDER_MIDDLEWARES = {
+    'crawler.incremental.IncrementalSpiderMiddleware': 800,
+}
+INCREMENTAL_CRAWL = os.getenv('INCREMENTAL_CRAWL', '').lower() in ('1', 'true', 'yes')
+INCREMENTAL_STORE_PATH = os.getenv('INCREMENTAL_STORE_PATH', '.crawl/validators.sqlite3')
+
 # Directory to store downloaded category icons
 IMAGES_STORE = 'images'
 
@@ -1,16 +1,19 @@
 import scrapy
 
-from crawler.extractors import get_extractors
+from crawler.extractors import extractor_for
+from crawler.extractors.base import selector_for
 from crawler.items import DataItem, ItemType
 
 
 class SeedSpider(scrapy.Spider):
     name = "seed"
-    def __init__(self, *args, domain=None, **kwargs):
+    def __init__(self, *args, domain=None, incremental=None, **kwargs):
         super().__init__(*args, **kwargs)
         # If domain is passed via -a domain=..., override start_urls
         if domain:
             self.start_urls = [domain]
+        # -a incremental=1 enables conditional GETs (see crawler.incremental)
+        self.incremental = incremental
     custom_settings = {
         "DEPTH_LIMIT": 1,
         "ROBOTSTXT_OBEY": True,
@@ -32,13 +35,21 @@ class SeedSpider(scrapy.Spider):
         product_model = response.meta.get('product_model')
         product_name = response.meta.get('product_name')
 
+        # Page or PDF unchanged since the last incremental crawl: keep traversing its links (recorded by
+        # the incremental middleware), but skip extraction so the pipelines have nothing to redo
+        if response.status == 304 or response.meta.get('incremental_unchanged'):
+            for href in response.meta.get('incremental_links', []):
+                if self._should_follow(href):
+                    yield self._follow(response, href, product_model, product_name)
+            return
+
         # If the response is a PDF, yield as document with context
         content_type = response.headers.get('Content-Type', b'').decode().lower()
         if 'application/pdf' in content_type or response.url.lower().endswith('.pdf'):
             if product_model or product_name:
                 yield DataItem(
                     url=response.url,
-                    item_type=ItemType.DOCUMENT,
+                    item_type=ItemType.MANUAL,
                     payload={
                         'pdf_url': response.url,
                         'model': product_model,
@@ -47,40 +58,48 @@ class SeedSpider(scrapy.Spider):
                 )
             return  # Don't parse further if it's a PDF
 
-        # Use extractors as before
-        for extractor_cls in get_extractors():
-            if extractor_cls.matches(response.url):
-                for item in extractor_cls().extract(response):
-                    # If the item is a product, update context
-                    if hasattr(item, 'item_type') and item.item_type == ItemType.PRODUCT:
-                        product_model = item.payload.get('model')
-                        product_name = item.payload.get('name')
-                    yield item
-                break
+        # Use the extractor registered for this URL's host
+        extractor_cls = extractor_for(response.url)
+        if extractor_cls is not None:
+            for item in extractor_cls().extract(response):
+                # If the item is a product, update context
+                if hasattr(item, 'item_type') and item.item_type == ItemType.PRODUCT:
+                    product_model = item.payload.get('model')
+                    product_name = item.payload.get('name')
+                yield item
 
         # For every <a> link
-        for href in response.css("a::attr(href)").getall():
+        for href in selector_for(response).css("a::attr(href)").getall():
             if href.lower().endswith('.pdf'):
                 # Direct PDF link: yield as document with context
                 if product_model or product_name:
                     yield DataItem(
                         url=href,
-                        item_type=ItemType.DOCUMENT,
+                        item_type=ItemType.MANUAL,
                         payload={
                             'pdf_url': href,
                             'model': product_model,
                             'name': product_name,
                         }
                     )
-            elif href.startswith(("http://", "https://")) and any(
-                extractor.matches(href) for extractor in get_extractors()
-            ):
+            elif self._should_follow(href):
                 # Not a PDF: follow the link for further parsing, pass context
-                yield response.follow(
-                    href,
-                    callback=self.parse,
-                    meta={
-                        'product_model': product_model,
-                        'product_name': product_name,
-                    }
-                )
+                yield self._follow(response, href, product_model, product_name)
+
+    @staticmethod
+    def _should_follow(href):
+        return (
+            not href.lower().endswith('.pdf')
+            and href.startswith(("http://", "https://"))
+            and extractor_for(href) is not None
+        )
+
+    def _follow(self, response, href, product_model, product_name):
+        return response.follow(
+            href,
+            callback=self.parse,
+            meta={
+                'product_model': product_model,
+                'product_name': product_name,
+            }
+        )
@@ -0,0 +1,36 @@
+"""remove duplicate images and add a unique (product_id, url) constraint
+
+Revision ID: c7e9a2d4f1b3
+Revises: b3a1f4e6c8d2
+Create Date: 2026-10-18 12:00:00.000000
+"""
+from typing import Sequence, Union
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7e9a2d4f1b3'
+down_revision: Union[str, None] = 'b3a1f4e6c8d2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Keep the oldest image per (product_id, url), then enforce uniqueness."""
+    op.execute(
+        """
+        DELETE FROM images
+        WHERE id IN (
+            SELECT id FROM (
+                SELECT id, row_number() OVER (PARTITION BY product_id, url ORDER BY id) AS rank
+                FROM images
+            ) ranked
+            WHERE rank > 1
+        )
+        """
+    )
+    op.create_unique_constraint('uq_images_product_id_url', 'images', ['product_id', 'url'])
+
+
+def downgrade() -> None:
+    """Drop the unique constraint (removed duplicates are not restored)."""
+    op.drop_constraint('uq_images_product_id_url', 'images', type_='unique')
@@ -0,0 +1,62 @@
+"""index hot lookup paths: unique document urls, video product ids and trigram search
+
+Revision ID: d8f3b6a1e5c9
+Revises: c7e9a2d4f1b3
+Create Date: 2026-10-18 13:00:00.000000
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'd8f3b6a1e5c9'
+down_revision: Union[str, None] = 'c7e9a2d4f1b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TRIGRAM_INDEXES = {
+    'ix_products_name_trgm': 'name',
+    'ix_products_model_trgm': 'model',
+}
+
+
+def _trigram_available() -> bool:
+    return op.get_bind().execute(
+        sa.text("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+    ).first() is not None
+
+
+def upgrade() -> None:
+    """
+    Add the indexes used by product, image, document and video lookups.
+
+    The unique (product_id, url) constraints on images and documents lead with product_id, so
+    they also serve joins and filters on product_id alone. Trigram indexes for name/model search
+    are only created where the pg_trgm extension is available.
+    """
+    op.execute(
+        """
+        DELETE FROM documents
+        WHERE id IN (
+            SELECT id FROM (
+                SELECT id, row_number() OVER (PARTITION BY product_id, url ORDER BY id) AS rank
+                FROM documents
+            ) ranked
+            WHERE rank > 1
+        )
+        """
+    )
+    op.create_unique_constraint('uq_documents_product_id_url', 'documents', ['product_id', 'url'])
+    op.create_index(op.f('ix_videos_product_id'), 'videos', ['product_id'])
+    if _trigram_available():
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for name, column in TRIGRAM_INDEXES.items():
+            op.execute(f'CREATE INDEX IF NOT EXISTS {name} ON products USING gin ({column} gin_trgm_ops)')
+
+
+def downgrade() -> None:
+    """Drop the lookup indexes (removed duplicate documents are not restored)."""
+    for name in TRIGRAM_INDEXES:
+        op.execute(f'DROP INDEX IF EXISTS {name}')
+    op.drop_index(op.f('ix_videos_product_id'), table_name='videos')
+    op.drop_constraint('uq_documents_product_id_url', 'documents', type_='unique')
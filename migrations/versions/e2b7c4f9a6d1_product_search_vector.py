@@ -0,0 +1,36 @@
+"""add a generated full-text search column with a GIN index to products
+
+Revision ID: e2b7c4f9a6d1
+Revises: d8f3b6a1e5c9
+Create Date: 2026-10-18 14:00:00.000000
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2b7c4f9a6d1'
+down_revision: Union[str, None] = 'd8f3b6a1e5c9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SEARCH_EXPRESSION = (
+    "to_tsvector('simple', coalesce(name, '') || ' ' || coalesce(model, '') || ' ' "
+    "|| coalesce(category, '') || ' ' || coalesce(brand, ''))"
+)
+
+
+def upgrade() -> None:
+    """Add products.search_vector over name, model, category and brand."""
+    op.add_column(
+        'products',
+        sa.Column('search_vector', postgresql.TSVECTOR(), sa.Computed(SEARCH_EXPRESSION, persisted=True), nullable=True),
+    )
+    op.create_index('ix_products_search_vector', 'products', ['search_vector'], postgresql_using='gin')
+
+
+def downgrade() -> None:
+    """Drop the search column and its index."""
+    op.drop_index('ix_products_search_vector', table_name='products')
+    op.drop_column('products', 'search_vector')
@@ -0,0 +1,215 @@
+"""
+Batched embedding stage: collects chunks across items and embeds them with a single
+``embed_documents`` call per size- and token-bounded batch.
+"""
+import os
+import time
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from processors.embedding_cache import text_digest
+
+logger = logging.getLogger(__name__)
+
+# (vector id, embedding, metadata) as accepted by ``index.upsert``
+Vector = Tuple[str, List[float], Dict[str, Any]]
+
+
+def approx_token_count(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English text)."""
+    return len(text) // 4 + 1
+
+
+@dataclass
+class BatchStats:
+    """Running counters for the embedding stage."""
+    batches: int = 0
+    chunks: int = 0
+    tokens: int = 0
+    seconds: float = 0.0
+    last_latency: float = 0.0
+
+    @property
+    def avg_latency(self) -> float:
+        return self.seconds / self.batches if self.batches else 0.0
+
+
+class BatchEmbedder:
+    """
+    Buffer chunks from any number of items and embed them in batches.
+
+    A batch is flushed when it reaches ``max_batch_size`` chunks, when adding the next
+    chunk would exceed ``max_batch_tokens``, or when the oldest buffered chunk is older
+    than ``flush_interval`` seconds; a timer thread enforces the interval while no chunks
+    arrive, and an error it hits is raised by the next ``add`` or ``flush``. Embedded
+    vectors are handed to ``sink``, which may be called from the timer thread. When a
+    ``cache`` is given, only chunks missing from it are sent to the embedder. Safe to
+    call from several threads.
+    """
+    def __init__(
+        self,
+        embedder,
+        sink: Callable[[List[Vector]], None],
+        max_batch_size: Optional[int] = None,
+        max_batch_tokens: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+        token_counter: Callable[[str], int] = approx_token_count,
+        cache=None,
+    ):
+        self.embedder = embedder
+        self.cache = cache
+        self.sink = sink
+        self.max_batch_size = (
+            max_batch_size if max_batch_size is not None else int(os.getenv("EMBED_BATCH_SIZE", "128"))
+        )
+        self.max_batch_tokens = (
+            max_batch_tokens if max_batch_tokens is not None else int(os.getenv("EMBED_BATCH_TOKENS", "100000"))
+        )
+        self.flush_interval = (
+            flush_interval if flush_interval is not None else float(os.getenv("EMBED_FLUSH_INTERVAL", "5.0"))
+        )
+        self.token_counter = token_counter
+        self.stats = BatchStats()
+        self._stats_lock = threading.Lock()
+        # Guards the buffer, the timer and the timer's error
+        self._lock = threading.Lock()
+        self._pending: List[Tuple[str, str, Dict[str, Any]]] = []
+        self._pending_tokens = 0
+        self._first_pending_at: Optional[float] = None
+        self._timer: Optional[threading.Timer] = None
+        self._timer_error: Optional[BaseException] = None
+
+    def add(self, vid: str, text: str, metadata: Dict[str, Any]) -> None:
+        """Queue a single chunk for embedding, flushing if a batch limit is reached."""
+        tokens = self.token_counter(text)
+        with self._lock:
+            self._raise_timer_error_locked()
+            full = None
+            if self._pending and self._pending_tokens + tokens > self.max_batch_tokens:
+                full = self._take_locked()
+            if not self._pending:
+                self._first_pending_at = time.monotonic()
+                self._schedule_locked(self.flush_interval)
+            self._pending.append((vid, text, metadata))
+            self._pending_tokens += tokens
+            due = None
+            if (
+                len(self._pending) >= self.max_batch_size
+                or time.monotonic() - self._first_pending_at >= self.flush_interval
+            ):
+                due = self._take_locked()
+        for batch in (full, due):
+            if batch is not None:
+                self._send(*batch)
+
+    def add_chunks(self, url: str, chunks: List[str], metadata: Dict[str, Any]) -> None:
+        """Queue all chunks of one item using ``url::i`` vector IDs."""
+        for i, chunk in enumerate(chunks):
+            self.add(f"{url}::{i}", chunk, metadata)
+
+    def flush(self) -> int:
+        """Embed everything buffered so far and pass the vectors to the sink."""
+        with self._lock:
+            self._raise_timer_error_locked()
+            batch = self._take_locked()
+        if batch is None:
+            return 0
+        return self._send(*batch)
+
+    def close(self) -> None:
+        """Flush and stop the interval timer."""
+        try:
+            self.flush()
+        finally:
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+
+    def _take_locked(self) -> Optional[Tuple[List[Tuple[str, str, Dict[str, Any]]], int]]:
+        if not self._pending:
+            return None
+        batch = (self._pending, self._pending_tokens)
+        self._pending, self._pending_tokens, self._first_pending_at = [], 0, None
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        return batch
+
+    def _send(self, batch: List[Tuple[str, str, Dict[str, Any]]], tokens: int) -> int:
+        embeddings = self.embed_texts([text for _, text, _ in batch], tokens)
+        vectors = [(vid, emb, meta) for (vid, _, meta), emb in zip(batch, embeddings)]
+        self.sink(vectors)
+        return len(batch)
+
+    def _schedule_locked(self, delay: float) -> None:
+        if delay <= 0 or self._timer is not None:
+            return
+        self._timer = threading.Timer(delay, self._on_timer)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _on_timer(self) -> None:
+        with self._lock:
+            self._timer = None
+            if self._first_pending_at is None:
+                return
+            age = time.monotonic() - self._first_pending_at
+            if age < self.flush_interval:
+                self._schedule_locked(self.flush_interval - age)
+                return
+            batch = self._take_locked()
+        try:
+            self._send(*batch)
+        except Exception as e:
+            logger.error("Interval flush of %d chunks failed: %s", len(batch[0]), e)
+            with self._lock:
+                if self._timer_error is None:
+                    self._timer_error = e
+
+    def _raise_timer_error_locked(self) -> None:
+        if self._timer_error is not None:
+            error, self._timer_error = self._timer_error, None
+            raise error
+
+    def embed_texts(self, texts: List[str], tokens: Optional[int] = None) -> List[List[float]]:
+        """Embed one batch of texts (through the cache, if any) and record its latency."""
+        if self.cache is not None:
+            return self._embed_with_cache(texts)
+        if tokens is None:
+            tokens = sum(self.token_counter(t) for t in texts)
+        return self._embed(texts, tokens)
+
+    def _embed(self, texts: List[str], tokens: int) -> List[List[float]]:
+        start = time.perf_counter()
+        embeddings = self.embedder.embed_documents(texts)
+        latency = time.perf_counter() - start
+
+        with self._stats_lock:
+            self.stats.batches += 1
+            self.stats.chunks += len(texts)
+            self.stats.tokens += tokens
+            self.stats.seconds += latency
+            self.stats.last_latency = latency
+        logger.info(
+            "Embedded batch of %d chunks (~%d tokens) in %.3fs", len(texts), tokens, latency
+        )
+        return embeddings
+
+    def _embed_with_cache(self, texts: List[str]) -> List[List[float]]:
+        digests = [text_digest(t) for t in texts]
+        cached = self.cache.get_many(texts)
+        # Embed each distinct missing text once
+        missing = list({d: t for d, t in zip(digests, texts) if d not in cached}.items())
+        if missing:
+            miss_texts = [t for _, t in missing]
+            fresh = self._embed(miss_texts, sum(self.token_counter(t) for t in miss_texts))
+            self.cache.put_many(miss_texts, fresh)
+            cached.update((d, v) for (d, _), v in zip(missing, fresh))
+        logger.info(
+            "Embedding cache: %d/%d chunks served from cache (%d hits, %d misses total)",
+            len(texts) - len(missing), len(texts), self.cache.hits, self.cache.misses,
+        )
+        return [cached[d] for d in digests]
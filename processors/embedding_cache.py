@@ -0,0 +1,122 @@
+"""
+Persistent embedding cache keyed by (embedding model, sha256 of chunk text).
+
+Backed by a local SQLite file so unchanged chunks are never sent to the embedder again.
+Entries are evicted least-recently-used first once ``max_entries`` is exceeded.
+
+Vectors are stored as float32, half the size of Python floats. That is lossless for OpenAI
+embeddings, which are float32 values; float64 vectors from other embedders come back rounded.
+"""
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from array import array
+from typing import Dict, List, Optional
+
+
+def text_digest(text: str) -> str:
+    """Return the sha256 hex digest used as the cache key for a chunk."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """SQLite-backed LRU cache of embedding vectors."""
+
+    def __init__(self, path: str, model: str, max_entries: Optional[int] = None):
+        self.path = path
+        self.model = model
+        self.max_entries = max_entries or int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "500000"))
+        self.hits = 0
+        self.misses = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL,"
+            " digest TEXT NOT NULL,"
+            " vector BLOB NOT NULL,"
+            " last_used REAL NOT NULL,"
+            " PRIMARY KEY (model, digest))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+
+    def get_many(self, texts: List[str]) -> Dict[str, List[float]]:
+        """Return cached vectors for the given texts, keyed by text digest."""
+        digests = list({text_digest(t) for t in texts})
+        found: Dict[str, List[float]] = {}
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(digests), 500):
+                part = digests[start:start + 500]
+                placeholders = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT digest, vector FROM embeddings WHERE model = ? AND digest IN ({placeholders})",
+                    [self.model, *part],
+                ).fetchall()
+                for digest, blob in rows:
+                    found[digest] = array("f", blob).tolist()
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND digest = ?",
+                    [(now, self.model, d) for d in found],
+                )
+                self._conn.commit()
+            hits = sum(1 for t in texts if text_digest(t) in found)
+            self.hits += hits
+            self.misses += len(texts) - hits
+        return found
+
+    def put_many(self, texts: List[str], vectors: List[List[float]]) -> None:
+        """Store vectors (as float32) for the given texts and evict the least recently used overflow."""
+        now = time.time()
+        rows = [
+            (self.model, text_digest(t), array("f", v).tobytes(), now)
+            for t, v in zip(texts, vectors)
+        ]
+        with self._lock:
+            added = self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (model, digest, vector, last_used) VALUES (?, ?, ?, ?)",
+                rows,
+            ).rowcount
+            if added < len(rows):
+                # Some were cached already (e.g. by a concurrent batch): refresh them
+                self._conn.executemany(
+                    "UPDATE embeddings SET vector = ?, last_used = ? WHERE model = ? AND digest = ?",
+                    [(blob, used, model, digest) for model, digest, blob, used in rows],
+                )
+            if added:
+                # Counted inside the write transaction, so rows added by other processes sharing
+                # the file are included; only writes that grew the table pay for the count
+                (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+                if count > self.max_entries:
+                    self._conn.execute(
+                        "DELETE FROM embeddings WHERE rowid IN ("
+                        " SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+                        (count - self.max_entries,),
+                    )
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        return count
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+def cache_from_env(embedder) -> Optional[EmbeddingCache]:
+    """Open the cache at ``EMBEDDING_CACHE_PATH`` if set; caching is off otherwise."""
+    path = os.getenv("EMBEDDING_CACHE_PATH")
+    if not path:
+        return None
+    model = getattr(embedder, "model", None)
+    return EmbeddingCache(path, model=model if isinstance(model, str) else "default")
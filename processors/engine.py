@@ -0,0 +1,359 @@
+"""
+Pipelined asyncio ingest engine: fetch → parse → split → embed → upsert.
+
+Each stage runs its own pool of tasks and stages are joined by bounded queues, so network-bound
+fetching and embedding overlap with CPU-bound parsing and with vector upserts while backpressure
+keeps memory flat. The engine drives an :class:`~processors.ingest_worker.IngestWorker` and reuses
+its fetcher, parse pool, ledger and embedding batcher. Vectors go through an upsert buffer of the
+engine's own, so a failed batch is only reported to the engine (and job) that queued it.
+"""
+import os
+import time
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Any, AsyncIterable, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from crawler.items import DataItem
+from processors.ingest_worker import IngestWorker, chunk_metadata, is_pdf_item
+from processors.upsert import UpsertBuffer
+
+logger = logging.getLogger(__name__)
+
+# Sentinel telling a stage task to exit
+_DONE = object()
+
+
+@dataclass
+class IngestResult:
+    """Outcome of one item once its chunks are queued for embedding (or it was dropped)."""
+    item: DataItem
+    chunks: int = 0
+    skipped: bool = False
+    error: Optional[BaseException] = None
+
+
+@dataclass
+class EngineStats:
+    items: int = 0
+    ingested: int = 0
+    skipped: int = 0
+    failed: int = 0
+    chunks: int = 0
+    deduped: int = 0
+    vectors: int = 0
+    batch_errors: int = 0
+    seconds: float = 0.0
+
+
+@dataclass
+class _Pending:
+    """An item whose chunks are queued; reported once every vector is written or one fails."""
+    item: DataItem
+    chunks: int
+    remaining: int
+    error: Optional[BaseException] = None
+
+
+@dataclass
+class _Job:
+    item: DataItem
+    kind: str = "html"
+    path: Optional[str] = None
+    temp: bool = False
+    text: Optional[str] = None
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+
+class IngestEngine:
+    """
+    Bounded-queue pipeline around an :class:`IngestWorker`.
+
+    ``load_remote=True`` mirrors ``IngestWorker.ingest_item`` (persist the product, fetch the URL);
+    ``load_remote=False`` mirrors ``ingest_file`` (parse local files, otherwise use the payload
+    ``content``). ``on_result`` is called on the event loop for every finished item: once all of
+    its vectors are upserted, or with the error of the first embed/upsert batch holding one of
+    its chunks that failed. :meth:`close` re-raises the first such error.
+    Concurrency per stage defaults to the ``INGEST_*_CONCURRENCY`` environment variables; for the
+    upsert stage it is the number of parallel requests of the engine's upsert buffer.
+    """
+
+    def __init__(
+        self,
+        worker: IngestWorker,
+        fetch_concurrency: Optional[int] = None,
+        parse_concurrency: Optional[int] = None,
+        split_concurrency: Optional[int] = None,
+        embed_concurrency: Optional[int] = None,
+        upsert_concurrency: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        load_remote: bool = True,
+        persist: bool = True,
+        on_result: Optional[Callable[[IngestResult], None]] = None,
+    ):
+        self.worker = worker
+        self.concurrency = {
+            "fetch": fetch_concurrency or int(os.getenv("INGEST_FETCH_CONCURRENCY", "8")),
+            "parse": parse_concurrency or int(
+                os.getenv("INGEST_PARSE_CONCURRENCY", str(max(worker.parser.max_workers, 1)))
+            ),
+            "split": split_concurrency or int(os.getenv("INGEST_SPLIT_CONCURRENCY", "2")),
+            "embed": embed_concurrency or int(os.getenv("INGEST_EMBED_CONCURRENCY", "4")),
+            "upsert": upsert_concurrency or int(os.getenv("INGEST_UPSERT_CONCURRENCY", "4")),
+        }
+        self.queue_size = queue_size or int(os.getenv("INGEST_QUEUE_SIZE", "64"))
+        self.load_remote = load_remote
+        self.persist = persist
+        self.on_result = on_result
+        self.stats = EngineStats()
+        self._queues: Dict[str, asyncio.Queue] = {}
+        self._tasks: Dict[str, List[asyncio.Task]] = {}
+        self._started_at = 0.0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # Items waiting for their vectors, by vector id (one id may be queued by several items)
+        self._pending: Dict[str, List[_Pending]] = {}
+        self._errors: List[BaseException] = []
+        # The worker's callbacks commit ledger entries and notify upsert_listeners (this engine included)
+        self.upserter = UpsertBuffer(
+            worker.index,
+            worker.namespace,
+            workers=self.concurrency["upsert"],
+            on_done=worker._on_upserted,
+            on_error=worker._on_upsert_failed,
+        )
+
+    async def start(self) -> None:
+        self._started_at = time.perf_counter()
+        self._loop = asyncio.get_running_loop()
+        self.worker.upsert_listeners.append(self._on_upsert)
+        self._queues = {name: asyncio.Queue(maxsize=self.queue_size) for name in self.concurrency}
+        handlers = {"fetch": self._fetch, "parse": self._parse, "split": self._split}
+        for name, handler in handlers.items():
+            self._tasks[name] = [
+                asyncio.create_task(self._run_stage(self._queues[name], handler))
+                for _ in range(self.concurrency[name])
+            ]
+        self._tasks["embed"] = [asyncio.create_task(self._embed_loop()) for _ in range(self.concurrency["embed"])]
+        # One task feeds the upsert buffer, whose threads send the requests in parallel
+        self._tasks["upsert"] = [asyncio.create_task(self._upsert_loop())]
+
+    async def submit(self, item: DataItem) -> None:
+        """Queue an item; waits while the fetch queue is full."""
+        self.stats.items += 1
+        await self._queues["fetch"].put(_Job(item=item, kind="pdf" if is_pdf_item(item) else "html"))
+
+    async def close(self) -> EngineStats:
+        """Drain every stage in order, report the remaining items and return the final stats."""
+        for name in self.concurrency:
+            for _ in self._tasks[name]:
+                await self._queues[name].put(_DONE)
+            await asyncio.gather(*self._tasks[name])
+        try:
+            # Products may still be buffered and vectors handed to the upsert buffer still in flight
+            await asyncio.to_thread(self.worker.flush_persisted)
+            await asyncio.to_thread(self.upserter.flush)
+        except Exception as e:
+            # A failed upsert batch was already counted (and its items failed) by _upsert_finished
+            if not any(e is seen for seen in self._errors):
+                self.stats.batch_errors += 1
+                self._errors.append(e)
+            logger.error("Final flush failed: %s", e)
+        finally:
+            self.worker.upsert_listeners.remove(self._on_upsert)
+            self.upserter.shutdown()
+        # Let upsert callbacks scheduled from the buffer's threads run
+        await asyncio.sleep(0)
+        leftover = {id(p): p for waiting in self._pending.values() for p in waiting}
+        self._pending.clear()
+        for pending in leftover.values():
+            pending.error = pending.error or RuntimeError("vectors were not upserted")
+            self._report(IngestResult(item=pending.item, chunks=pending.chunks, error=pending.error))
+        if self.worker.deduper is not None:
+            self.stats.deduped = self.worker.deduper.stats.saved
+        self.stats.seconds = time.perf_counter() - self._started_at
+        logger.info("Ingest engine finished: %s", self.stats)
+        if self._errors:
+            raise self._errors[0]
+        return self.stats
+
+    async def run(self, items: Union[Iterable[DataItem], AsyncIterable[DataItem]]) -> EngineStats:
+        """Push all items through the pipeline and wait for the last upsert."""
+        await self.start()
+        try:
+            if hasattr(items, "__aiter__"):
+                async for item in items:
+                    await self.submit(item)
+            else:
+                for item in items:
+                    await self.submit(item)
+        finally:
+            await self.close()
+        return self.stats
+
+    def _report(self, result: IngestResult) -> None:
+        if result.error is not None:
+            self.stats.failed += 1
+            logger.warning("Ingest failed for %s: %s", result.item.url, result.error)
+        elif result.skipped:
+            self.stats.skipped += 1
+        else:
+            self.stats.ingested += 1
+            self.stats.chunks += result.chunks
+        if self.on_result is not None:
+            self.on_result(result)
+
+    async def _run_stage(self, inbox: asyncio.Queue, handler) -> None:
+        while True:
+            job = await inbox.get()
+            if job is _DONE:
+                return
+            try:
+                await handler(job)
+            except Exception as e:
+                if job.temp and job.path:
+                    _remove(job.path)
+                self._report(IngestResult(item=job.item, error=e))
+
+    async def _fetch(self, job: _Job) -> None:
+        item, worker = job.item, self.worker
+        if self.persist:
+            await asyncio.to_thread(worker.persist_item, item)
+        if self.load_remote and item.url.startswith("http"):
+            previous = worker.ledger.get(item.url) if worker.ledger is not None else None
+            result = await worker.fetcher.afetch_to_file(
+                item.url,
+                suffix=".pdf" if job.kind == "pdf" else ".html",
+                etag=previous.etag if previous else None,
+                last_modified=previous.last_modified if previous else None,
+                text=job.kind != "pdf",
+            )
+            if result.not_modified:
+                self._report(IngestResult(item=item, skipped=True))
+                return
+            job.path, job.temp = result.path, True
+            job.etag, job.last_modified = result.etag, result.last_modified
+        elif self.load_remote or os.path.isfile(item.url):
+            job.path = item.url
+        else:
+            job.text = item.payload.get("content", "")
+            await self._queues["split"].put(job)
+            return
+        await self._queues["parse"].put(job)
+
+    async def _parse(self, job: _Job) -> None:
+        try:
+            job.text = await self.worker.parser.aparse(job.path, job.kind)
+        finally:
+            if job.temp:
+                _remove(job.path)
+                job.temp = False
+        await self._queues["split"].put(job)
+
+    async def _split(self, job: _Job) -> None:
+        if not job.text or not job.text.strip():
+            self._report(IngestResult(item=job.item, skipped=True))
+            return
+        planned = await asyncio.to_thread(
+            self.worker.plan_chunks, job.item, job.text, job.etag, job.last_modified
+        )
+        if not planned:
+            self._report(IngestResult(item=job.item, skipped=True))
+            return
+        pending = _Pending(item=job.item, chunks=len(planned), remaining=len(planned))
+        for vid, _ in planned:
+            self._pending.setdefault(vid, []).append(pending)
+        for vid, chunk in planned:
+            await self._queues["embed"].put((vid, chunk, chunk_metadata(job.item, chunk)))
+
+    async def _embed_loop(self) -> None:
+        """Collect chunks into size/token/time-bounded batches and embed them."""
+        inbox, batcher = self._queues["embed"], self.worker.batcher
+        loop = asyncio.get_running_loop()
+        finished = False
+        # A chunk that would have pushed the last batch over the token budget opens the next one
+        carry = None
+        while not finished or carry is not None:
+            first, carry = (carry, None) if carry is not None else (await inbox.get(), None)
+            if first is _DONE:
+                return
+            batch: List[Tuple[str, str, Dict[str, Any]]] = [first]
+            tokens = batcher.token_counter(first[1])
+            deadline = loop.time() + batcher.flush_interval
+            while not finished and len(batch) < batcher.max_batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    record = await asyncio.wait_for(inbox.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if record is _DONE:
+                    finished = True
+                    break
+                record_tokens = batcher.token_counter(record[1])
+                if tokens + record_tokens > batcher.max_batch_tokens:
+                    carry = record
+                    break
+                batch.append(record)
+                tokens += record_tokens
+            try:
+                embeddings = await asyncio.to_thread(batcher.embed_texts, [text for _, text, _ in batch], tokens)
+            except Exception as e:
+                self.stats.batch_errors += 1
+                logger.error("Embedding batch of %d chunks failed: %s", len(batch), e)
+                self._vectors_done([vid for vid, _, _ in batch], e)
+                continue
+            vectors = [(vid, emb, meta) for (vid, _, meta), emb in zip(batch, embeddings)]
+            await self._queues["upsert"].put(vectors)
+
+    async def _upsert_loop(self) -> None:
+        inbox = self._queues["upsert"]
+        while True:
+            vectors = await inbox.get()
+            if vectors is _DONE:
+                return
+            try:
+                # Buffered here; the written or failed batches come back through _on_upsert
+                await asyncio.to_thread(self.upserter.add, vectors)
+            except Exception as e:
+                self.stats.batch_errors += 1
+                logger.error("Upsert of %d vectors failed: %s", len(vectors), e)
+                self._vectors_done([vid for vid, _, _ in vectors], e)
+
+    def _on_upsert(self, vectors, error: Optional[BaseException]) -> None:
+        # Runs on an upsert thread; hand over to the event loop
+        self._loop.call_soon_threadsafe(self._upsert_finished, [vid for vid, _, _ in vectors], error)
+
+    def _upsert_finished(self, vids: List[str], error: Optional[BaseException]) -> None:
+        if error is not None and any(vid in self._pending for vid in vids):
+            self.stats.batch_errors += 1
+        self._vectors_done(vids, error)
+
+    def _vectors_done(self, vids: List[str], error: Optional[BaseException] = None) -> None:
+        """Settle the items owning these vectors: count them down, or fail them with ``error``."""
+        if error is not None and any(vid in self._pending for vid in vids):
+            self._errors.append(error)
+        for vid in vids:
+            waiting = self._pending.get(vid)
+            if not waiting:
+                # Not ours: another engine sharing the worker queued this vector
+                continue
+            pending = waiting.pop(0)
+            if not waiting:
+                del self._pending[vid]
+            if error is None:
+                self.stats.vectors += 1
+            elif pending.error is None:
+                pending.error = error
+                self.worker.discard_pending([vid])
+            pending.remaining -= 1
+            if pending.remaining == 0:
+                self._report(IngestResult(item=pending.item, chunks=pending.chunks, error=pending.error))
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -0,0 +1,144 @@
+"""
+Shared HTTP fetch layer for the ingest worker.
+
+One pooled ``requests.Session`` (keep-alive connections) is shared by all callers, with a
+per-host concurrency limit and connect/read timeouts. Bodies are streamed to disk in
+chunks so large manuals never sit in memory. ``afetch_to_file`` exposes the same fetcher
+to asyncio callers by running it on a worker thread.
+
+Note: ``requests`` speaks HTTP/1.1 only; connection reuse comes from keep-alive pooling.
+"""
+import os
+import codecs
+import asyncio
+import threading
+from dataclasses import dataclass
+from tempfile import NamedTemporaryFile
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+@dataclass
+class FetchResult:
+    """Outcome of a fetch; ``path`` is None when the server answered 304 Not Modified."""
+    url: str
+    status: int
+    path: Optional[str] = None
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    bytes: int = 0
+
+    @property
+    def not_modified(self) -> bool:
+        return self.status == 304
+
+
+class Fetcher:
+    """Pooled, host-limited HTTP client that streams responses into temporary files."""
+
+    def __init__(
+        self,
+        pool_size: Optional[int] = None,
+        per_host: Optional[int] = None,
+        connect_timeout: Optional[float] = None,
+        read_timeout: Optional[float] = None,
+        chunk_size: int = 1 << 16,
+    ):
+        self.pool_size = pool_size or int(os.getenv("FETCH_POOL_SIZE", "20"))
+        self.per_host = per_host or int(os.getenv("FETCH_PER_HOST", "4"))
+        self.timeout = (
+            connect_timeout or float(os.getenv("FETCH_CONNECT_TIMEOUT", "10")),
+            read_timeout or float(os.getenv("FETCH_READ_TIMEOUT", "60")),
+        )
+        self.chunk_size = chunk_size
+        self.session = requests.Session()
+        retry = Retry(
+            total=2,
+            backoff_factor=0.5,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset({"GET", "HEAD"}),
+        )
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._hosts: Dict[str, threading.BoundedSemaphore] = {}
+        self._hosts_lock = threading.Lock()
+
+    def _host_slot(self, url: str) -> threading.BoundedSemaphore:
+        host = urlsplit(url).netloc.lower()
+        with self._hosts_lock:
+            slot = self._hosts.get(host)
+            if slot is None:
+                slot = self._hosts[host] = threading.BoundedSemaphore(self.per_host)
+            return slot
+
+    def fetch_to_file(
+        self,
+        url: str,
+        suffix: str = "",
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+        text: bool = False,
+    ) -> FetchResult:
+        """
+        Stream ``url`` into a temporary file and return its path and validators.
+
+        Passing ``etag``/``last_modified`` makes the request conditional. With ``text=True``
+        the body is decoded with the response charset and written as UTF-8.
+        The caller owns (and must remove) the returned file.
+        """
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        with self._host_slot(url):
+            with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as resp:
+                result = FetchResult(
+                    url=url,
+                    status=resp.status_code,
+                    etag=resp.headers.get("ETag"),
+                    last_modified=resp.headers.get("Last-Modified"),
+                )
+                if resp.status_code == 304:
+                    return result
+                resp.raise_for_status()
+                body = resp.iter_content(self.chunk_size)
+                if text:
+                    decoder = codecs.iterdecode(body, resp.encoding or "utf-8", errors="replace")
+                    body = (part.encode("utf-8") for part in decoder)
+                with NamedTemporaryFile(delete=False, suffix=suffix) as tf:
+                    try:
+                        for part in body:
+                            tf.write(part)
+                            result.bytes += len(part)
+                    except BaseException:
+                        tf.close()
+                        os.remove(tf.name)
+                        raise
+                    result.path = tf.name
+        return result
+
+    async def afetch_to_file(self, url: str, **kwargs) -> FetchResult:
+        """Asyncio variant of :meth:`fetch_to_file`; runs on the default thread executor."""
+        return await asyncio.to_thread(self.fetch_to_file, url, **kwargs)
+
+    def close(self) -> None:
+        self.session.close()
+
+
+_fetcher: Optional[Fetcher] = None
+_fetcher_lock = threading.Lock()
+
+
+def get_fetcher() -> Fetcher:
+    """Return the process-wide shared :class:`Fetcher`."""
+    global _fetcher
+    with _fetcher_lock:
+        if _fetcher is None:
+            _fetcher = Fetcher()
+        return _fetcher
@@ -2,31 +2,35 @@
 Ingest worker: processes Scrapy JSONL exports, loads content, splits, embeds, and upserts to Pinecone.
 """
 import os
-import json
-from typing import Iterator
-from tempfile import NamedTemporaryFile
-import requests
+import asyncio
+import logging
+import threading
+import itertools
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Collection, Iterator, Optional
 
 from dotenv import load_dotenv
 load_dotenv()
 
 import pinecone
 from langchain_openai import OpenAIEmbeddings
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-try:
-    from langchain.document_loaders.unstructured import UnstructuredHTMLLoader as HTMLLoader, UnstructuredPDFLoader as PyPDFLoader
-except ImportError:
-    # Fallback stubs for loaders if official implementations aren't available
-    class HTMLLoader:
-        def __init__(self, file_path):
-            self.file_path = file_path
-        def load(self):
-            return []
-    class PyPDFLoader(HTMLLoader):
-        pass
 
 from crawler.items import DataItem, ItemType
-from shared.db import SessionLocal, get_or_create_product, create_image, create_document
+from processors.embedding import BatchEmbedder
+from processors.embedding_cache import cache_from_env, text_digest
+from processors.fetch import Fetcher, get_fetcher
+from processors.jobs import DeadLetterQueue, dead_letter_path, item_key, jobs_from_env
+from processors.jsonl import JsonlCheckpoint, iter_jsonl
+from processors.ledger import LedgerEntry, ledger_from_env
+# HTMLLoader/PyPDFLoader are re-exported here for callers that patch them on this module
+from processors.parsing import HTMLLoader, PyPDFLoader, ParsePool, parse_file
+from processors.splitter import deduper_from_env, get_splitter
+from processors.upsert import UpsertBuffer
+from processors.vectorstore import LocalVectorStore, vector_store_from_env
+from shared.db import SessionLocal, bulk_persist_products, product_id_cache
+
+logger = logging.getLogger(__name__)
 
 # Pinecone v6+ moved away from top-level init; ensure it exists for backward compatibility
 if not hasattr(pinecone, 'init'):
@@ -71,170 +75,577 @@ def init_pinecone():
         raise RuntimeError(f"Failed to initialize Pinecone client: {e}")
 
 
-def load_content(item: DataItem) -> str:
-    """Given a DataItem, load its full text via the appropriate loader."""
+@dataclass
+class LoadedContent:
+    """Text of an item plus the HTTP validators it was fetched with."""
+    text: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    not_modified: bool = False
+
+
+def is_pdf_item(item: DataItem) -> bool:
+    return item.url.lower().endswith(".pdf") or item.payload.get("doc_type") == "manual"
+
+
+def load_document(
+    item: DataItem,
+    fetcher: Optional[Fetcher] = None,
+    etag: Optional[str] = None,
+    last_modified: Optional[str] = None,
+    parser: Optional[ParsePool] = None,
+) -> LoadedContent:
+    """
+    Load an item's full text, streaming remote sources to disk through the shared fetcher.
+
+    When ``etag``/``last_modified`` are given the download is conditional; a 304 response
+    yields ``LoadedContent(text="", not_modified=True)``. Files are parsed by ``parser``
+    (a process pool) when given, otherwise inline.
+    """
     url = item.url
-    payload = item.payload
-    temp_path = None
-    # Determine loader based on file type or manual docs
-    if url.lower().endswith(".pdf") or payload.get("doc_type") == "manual":
-        # Handle remote PDF URLs
-        if url.startswith("http"):  # download PDF locally
-            resp = requests.get(url)
-            resp.raise_for_status()
-            tf = NamedTemporaryFile(delete=False, suffix=".pdf")
-            tf.write(resp.content)
-            tf.flush()
-            temp_path = tf.name
-            loader = PyPDFLoader(temp_path)
-        else:
-            loader = PyPDFLoader(url)
-    else:
-        # Handle remote HTML URLs
-        if url.startswith("http"):
-            resp = requests.get(url)
-            resp.raise_for_status()
-            tf = NamedTemporaryFile(delete=False, suffix=".html")
-            tf.write(resp.text.encode("utf-8"))
-            tf.flush()
-            temp_path = tf.name
-            loader = HTMLLoader(temp_path)
-        else:
-            loader = HTMLLoader(url)
-    docs = loader.load()
-    # Cleanup temporary file if used
-    if temp_path:
+    is_pdf = is_pdf_item(item)
+    kind = "pdf" if is_pdf else "html"
+    parse = parser.parse if parser is not None else parse_file
+    if not url.startswith("http"):
+        return LoadedContent(text=parse(url, kind))
+
+    fetcher = fetcher or get_fetcher()
+    result = fetcher.fetch_to_file(
+        url,
+        suffix=".pdf" if is_pdf else ".html",
+        etag=etag,
+        last_modified=last_modified,
+        text=not is_pdf,
+    )
+    if result.not_modified:
+        return LoadedContent(text="", etag=etag, last_modified=last_modified, not_modified=True)
+    try:
+        text = parse(result.path, kind)
+    finally:
+        # Cleanup temporary file
         try:
-            os.remove(temp_path)
+            os.remove(result.path)
         except OSError:
             pass
-    # load() returns a list of Document; concatenate all pages
-    return "\n".join(doc.page_content for doc in docs)
+    return LoadedContent(
+        text=text,
+        etag=result.etag,
+        last_modified=result.last_modified,
+    )
+
+
+def load_content(item: DataItem) -> str:
+    """Given a DataItem, load its full text via the appropriate loader."""
+    return load_document(item).text
+
+
+def chunk_metadata(item: DataItem, chunk: Optional[str] = None) -> dict:
+    """Metadata stored alongside a vector of an item; the chunk text is kept under ``text`` for retrieval."""
+    metadata = {"url": item.url, "type": item.item_type}
+    if chunk is not None:
+        metadata["text"] = chunk
+    return metadata
 
 
 def chunk_text(text: str) -> list[str]:
-    """Split text into overlapping chunks for embeddings."""
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1000,
-        chunk_overlap=200,
-    )
-    return splitter.split_text(text)
-
-
-def ingest_from_jsonl(path: str) -> Iterator[DataItem]:
-    """Yield DataItem objects from a Scrapy-exported JSONL file."""
-    with open(path, "r", encoding="utf-8") as f:
-        for line in f:
-            obj = json.loads(line)
-            yield DataItem(
-                url=obj["url"],
-                item_type=ItemType(obj["item_type"]),
-                payload=obj["payload"],
-            )
+    """Split text into overlapping, token-sized chunks for embeddings (see ``processors.splitter``)."""
+    return get_splitter().split_text(text)
 
 
-def main(jsonl_path: str = "out.jl"):
-    """Full pipeline: load items, extract text, embed, and upsert into Pinecone."""
-    index = init_pinecone()
+def ingest_from_jsonl(path: str, offset: int = 0) -> Iterator[DataItem]:
+    """Lazily yield DataItem objects from a (optionally .gz/.zst) Scrapy JSONL export."""
+    for _, item in iter_jsonl(path, offset):
+        yield item
+
+
+def main(jsonl_path: str = "out.jl", resume: bool = False, replay: bool = False):
+    """
+    Full pipeline: load items, extract text, embed, and upsert into Pinecone.
+
+    The export is streamed and the byte offset of the last fully upserted record is kept in
+    ``<jsonl_path>.offset``; ``resume=True`` continues an interrupted run from there and skips
+    items the job ledger (``INGEST_JOBS_PATH``) already marks done. Items that fail to load are
+    written to the dead-letter file (``<jsonl_path>.dead.jl``); ``replay=True`` retries those
+    whose backoff has expired instead of reading the export.
+    """
+    # VECTOR_STORE=local writes to the on-disk index instead of Pinecone
+    index = vector_store_from_env() or init_pinecone()
+    jobs = jobs_from_env(default=".ingest/jobs.sqlite3")
+    job = os.path.abspath(jsonl_path)
+    dead_letters = DeadLetterQueue(dead_letter_path(jsonl_path))
+    checkpoint = JsonlCheckpoint(jsonl_path)
+    start = checkpoint.load() if resume and not replay else 0
+    if start:
+        print(f"Resuming {jsonl_path} at byte {start}")
+    done = jobs.done_keys(job) if resume or replay else set()
+    # Records in export order as [offset, job key or None, vectors not yet upserted]; the
+    # checkpoint and job ledger advance over the prefix whose vectors have all been upserted
+    records_in_flight: deque = deque()
+    # Records waiting on each vector id, oldest first
+    waiting: dict[str, list] = {}
+    progress_lock = threading.Lock()
+
+    def commit() -> None:
+        with progress_lock:
+            offset, keys = None, []
+            while records_in_flight and records_in_flight[0][2] == 0:
+                offset, key, _ = records_in_flight.popleft()
+                if key is not None:
+                    keys.append(key)
+            if offset is not None and not replay:
+                checkpoint.save(offset)
+            if keys:
+                jobs.mark_done(job, keys)
+
+    def upserted(batch) -> None:
+        with progress_lock:
+            for vid, _, _ in batch:
+                owners = waiting.get(vid)
+                if owners:
+                    owners.pop(0)[2] -= 1
+                    if not owners:
+                        del waiting[vid]
+        print(f"Upserted {len(batch)} vectors")
+        commit()
+
+    def upsert_failed(batch, error) -> None:
+        # Leave the records' counts above zero so the checkpoint never moves past them
+        with progress_lock:
+            for vid, _, _ in batch:
+                waiting.pop(vid, None)
+
+    # upsert into Pinecone namespace in fixed-size batches over parallel requests; the sink only
+    # queues vectors and progress is committed as each batch lands
+    upserter = UpsertBuffer(index, namespace="grandguru-dev", on_done=upserted, on_error=upsert_failed)
+
+    def track(offset, key, vids) -> None:
+        with progress_lock:
+            record = [offset, key, len(vids)]
+            records_in_flight.append(record)
+            for vid in vids:
+                waiting.setdefault(vid, []).append(record)
+        if not vids:
+            commit()
+
+    def records():
+        if not replay:
+            yield from iter_jsonl(jsonl_path, start)
+            return
+        for item in dead_letters:
+            if jobs.is_due(jobs.get(job, item_key(item))):
+                yield None, item
+
     embedder = OpenAIEmbeddings()
-    items = list(ingest_from_jsonl(jsonl_path))
-
-    for item in items:
-        text = load_content(item)
-        if not text.strip():
-            continue  # skip empty content
-
-        chunks = chunk_text(text)
-        # prepare vectors [(id, embedding, metadata), ...]
-        vectors = []
-        for i, chunk in enumerate(chunks):
-            vec = embedder.embed_query(chunk)
-            # use a unique ID per chunk
-            vid = f"{item.url}::{i}"
-            vectors.append((vid, vec, {"url": item.url, "type": item.item_type}))
-
-        # upsert into Pinecone namespace
-        index.upsert(
-            vectors=vectors,
-            namespace="grandguru-dev",
+    cache = cache_from_env(embedder)
+    batcher = BatchEmbedder(embedder, sink=upserter.add, cache=cache)
+    deduper = deduper_from_env()
+
+    failed = 0
+    for offset, item in records():
+        key = item_key(item)
+        planned = []
+        if key not in done:
+            jobs.start(job, item)
+            try:
+                text = load_content(item)
+            except Exception as e:
+                failed += 1
+                print(f"Failed to load {item.url}: {e}")
+                jobs.mark_failed(job, item, e)
+                key = None
+                text = ""
+            if text.strip():
+                planned = [(f"{item.url}::{i}", chunk) for i, chunk in enumerate(chunk_text(text))]
+                if deduper is not None:
+                    planned = deduper.filter(planned)
+        else:
+            key = None
+        # Registered before the chunks are queued so no upsert can land untracked
+        track(offset, key, [vid for vid, _ in planned])
+        # chunks are embedded in batches across items, one ID per chunk
+        for vid, chunk in planned:
+            batcher.add(vid, chunk, chunk_metadata(item, chunk))
+
+    batcher.flush()
+    upserter.close()
+    dead_letters.write(jobs.failed(job))
+    print(
+        f"Embedded {batcher.stats.chunks} chunks in {batcher.stats.batches} batches "
+        f"(avg {batcher.stats.avg_latency:.3f}s per batch)"
+    )
+    print(
+        f"Upserted {upserter.stats.vectors} vectors in {upserter.stats.batches} requests "
+        f"({upserter.stats.upserts_per_second:.1f} vectors/s, {upserter.stats.retries} retries)"
+    )
+    if cache is not None:
+        print(f"Embedding cache: {cache.hits} hits, {cache.misses} misses")
+    if deduper is not None:
+        print(
+            f"Dropped {deduper.stats.saved} duplicate chunks of {deduper.stats.chunks} "
+            f"({deduper.stats.exact} exact, {deduper.stats.near} near-duplicate)"
         )
-        print(f"Upserted {len(vectors)} vectors for {item.url}")
+    print(f"Job {job}: {jobs.summary(job)}")
+    if failed:
+        print(f"{failed} items failed; see {dead_letters.path} (replay with --replay)")
 
 
 class IngestWorker:
     """
     Worker that reads a JSONL file of DataItems, loads content, splits, embeds, and upserts to Pinecone.
+
+    Chunks are embedded in batches that may span several items; call ``flush()`` after the
+    last ``ingest_item`` so the final partial batch is written.
     """
     def __init__(self, index_name: str = None, pinecone_api_key: str = None, pinecone_env: str = None):
         idx_name = index_name or os.getenv("PINECONE_INDEX_NAME", "grandguru-dev")
         key = pinecone_api_key or os.getenv("PINECONE_API_KEY", "")
         env = pinecone_env or os.getenv("PINECONE_ENV", "")
-        try:
-            pinecone.init(api_key=key, environment=env)
-        except AttributeError:
-            # Pinecone v6+: init is deprecated; skip init and rely on top-level Index
-            pass
-        self.index = pinecone.Index(idx_name)
+        # VECTOR_STORE=local swaps Pinecone for the on-disk LocalVectorStore
+        self.index = vector_store_from_env()
+        if self.index is None:
+            try:
+                pinecone.init(api_key=key, environment=env)
+            except AttributeError:
+                # Pinecone v6+: init is deprecated; skip init and rely on top-level Index
+                pass
+            self.index = pinecone.Index(idx_name)
         self.embedder = OpenAIEmbeddings()
-        self.splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
+        self.splitter = get_splitter()
+        # Corpus-wide exact/near-duplicate chunk filter (CHUNK_DEDUPE, CHUNK_SIMHASH_DISTANCE)
+        self.deduper = deduper_from_env()
+        self.fetcher = get_fetcher()
+        # CPU-heavy PDF/HTML parsing runs in a process pool (PARSE_WORKERS, PARSE_TIMEOUT)
+        self.parser = ParsePool()
+        # Optional persistent cache (EMBEDDING_CACHE_PATH) so unchanged chunks are not re-embedded
+        self.embedding_cache = cache_from_env(self.embedder)
+        # Vectors are written in fixed-size batches over parallel, retried requests (UPSERT_*)
+        self.upserter = UpsertBuffer(
+            self.index, self.namespace, on_done=self._on_upserted, on_error=self._on_upsert_failed
+        )
+        # Called as listener(vectors, error) when a batch is written (error None) or given up on
+        self.upsert_listeners: list[Callable[[list, Optional[BaseException]], None]] = []
+        self.batcher = BatchEmbedder(self.embedder, sink=self.upsert_vectors, cache=self.embedding_cache)
+        # Optional per-URL ledger (INGEST_LEDGER_PATH) enabling incremental re-ingest
+        self.ledger = ledger_from_env()
+        # Ledger entries waiting for their remaining chunks to be upserted, keyed by a ticket per
+        # ingest so two ingests of the same URL in flight do not overwrite each other
+        self._tickets = itertools.count()
+        self._pending_entries: dict[int, LedgerEntry] = {}
+        self._outstanding: dict[int, int] = {}
+        # Tickets waiting on each vector id, oldest first, and the newest ticket per URL
+        self._waiting: dict[str, list[int]] = {}
+        self._latest: dict[str, int] = {}
+        self._ledger_lock = threading.Lock()
+        self.skipped = 0
+        # (url, error) of items whose content could not be loaded in ingest_file
+        self.failures: list[tuple[str, str]] = []
+        # Products, images and documents are written in batches, one transaction per batch
+        self.persist_batch_size = int(os.getenv("PERSIST_BATCH_SIZE", "500"))
+        self._persist_buffer: list[DataItem] = []
+        self._persist_lock = threading.Lock()
+        # Product id per item URL, shared with the crawler pipelines and filled as batches are written
+        self.product_ids = product_id_cache
+
+    @property
+    def namespace(self) -> str:
+        return os.getenv("PINECONE_INDEX_NAME", "grandguru-dev")
+
+    def upsert_vectors(self, vectors) -> None:
+        """Sink for the embedding stage: queue vectors for batched upserts into Pinecone."""
+        self.upserter.add(vectors)
+
+    def _on_upserted(self, vectors) -> None:
+        # An item's ledger entry is committed once all of its changed chunks are upserted
+        with self._ledger_lock:
+            for vid, _, _ in vectors:
+                tickets = self._waiting.get(vid)
+                if not tickets:
+                    continue
+                ticket = tickets.pop(0)
+                if not tickets:
+                    del self._waiting[vid]
+                if ticket in self._outstanding:
+                    self._outstanding[ticket] -= 1
+                    if self._outstanding[ticket] == 0:
+                        self._commit_entry(ticket)
+        for listener in list(self.upsert_listeners):
+            listener(vectors, None)
+
+    def _on_upsert_failed(self, vectors, error: BaseException) -> None:
+        self.discard_pending(vid for vid, _, _ in vectors)
+        for listener in list(self.upsert_listeners):
+            listener(vectors, error)
+
+    def discard_pending(self, vector_ids) -> None:
+        """Forget the pending ledger entries waiting on these vectors; their items are re-ingested next time."""
+        with self._ledger_lock:
+            for vid in vector_ids:
+                for ticket in self._waiting.pop(vid, ()):
+                    self._outstanding.pop(ticket, None)
+                    entry = self._pending_entries.pop(ticket, None)
+                    if entry is not None and self._latest.get(entry.url) == ticket:
+                        del self._latest[entry.url]
+
+    def _commit_entry(self, ticket: int) -> None:
+        self._outstanding.pop(ticket, None)
+        entry = self._pending_entries.pop(ticket, None)
+        if entry is None:
+            return
+        # An older ingest finishing after a newer one of the same URL must not overwrite it
+        if self._latest.get(entry.url) != ticket:
+            return
+        del self._latest[entry.url]
+        if self.ledger is not None:
+            self.ledger.record(entry)
 
-    def ingest_file(self, jsonl_path: str) -> None:
+    def plan_chunks(
+        self, item: DataItem, text: str, etag: str = None, last_modified: str = None
+    ) -> list[tuple[str, str]]:
+        """
+        Split the text of one item and return the ``(vector id, chunk)`` pairs that need embedding.
+
+        With a ledger configured, unchanged items yield nothing; for changed items only new or
+        modified chunks are returned, and stale ``url::i`` vectors past the new chunk count are
+        deleted. Chunks repeating content already kept elsewhere in the corpus are dropped, and
+        their old vectors deleted.
+        """
+        content_hash = text_digest(text)
+        encoding = getattr(self.splitter, "encoding_name", None)
+        encoding = encoding if isinstance(encoding, str) else None
+        previous = self.ledger.get(item.url) if self.ledger is not None else None
+        # Chunks cut with another tokenizer (e.g. the pseudo-token fallback) are split again;
+        # entries from before the encoding was recorded are taken as current
+        if (
+            previous is not None
+            and previous.content_hash == content_hash
+            and previous.encoding in (None, encoding)
+        ):
+            self.skipped += 1
+            return []
+
+        chunks = self.splitter.split_text(text)
+        chunk_hashes = [text_digest(c) for c in chunks]
+        old_hashes = previous.chunk_hashes if previous is not None else []
+        changed = [
+            i for i, h in enumerate(chunk_hashes)
+            if i >= len(old_hashes) or old_hashes[i] != h
+        ]
+
+        stale = [f"{item.url}::{i}" for i in range(len(chunks), len(old_hashes))]
+        planned = [(f"{item.url}::{i}", chunks[i]) for i in changed]
+        if self.deduper is not None:
+            kept = self.deduper.filter(planned)
+            # A changed chunk dropped as a duplicate must not leave its old vector in place
+            kept_ids = {vid for vid, _ in kept}
+            stale += [
+                vid for (vid, _), i in zip(planned, changed)
+                if i < len(old_hashes) and vid not in kept_ids
+            ]
+            planned = kept
+        if stale:
+            self.index.delete(ids=stale, namespace=self.namespace)
+
+        if self.ledger is not None:
+            with self._ledger_lock:
+                ticket = next(self._tickets)
+                self._latest[item.url] = ticket
+                self._pending_entries[ticket] = LedgerEntry(
+                    url=item.url,
+                    content_hash=content_hash,
+                    chunk_hashes=chunk_hashes,
+                    vector_ids=[f"{item.url}::{i}" for i in range(len(chunks))],
+                    etag=etag,
+                    last_modified=last_modified,
+                    encoding=encoding,
+                )
+                self._outstanding[ticket] = len(planned)
+                for vid, _ in planned:
+                    self._waiting.setdefault(vid, []).append(ticket)
+                if not planned:
+                    self._commit_entry(ticket)
+
+        return planned
+
+    def index_text(
+        self,
+        item: DataItem,
+        text: str,
+        etag: str = None,
+        last_modified: str = None,
+        on_planned: Optional[Callable[[list[str]], None]] = None,
+    ) -> int:
+        """
+        Split, embed and upsert the text of one item, returning the number of chunks queued.
+
+        See :meth:`plan_chunks` for how the ledger limits this to changed chunks. ``on_planned``
+        is called with the vector ids before any chunk is queued, so callers can wait for their
+        upserts (see ``upsert_listeners``).
+        """
+        planned = self.plan_chunks(item, text, etag=etag, last_modified=last_modified)
+        if on_planned is not None:
+            on_planned([vid for vid, _ in planned])
+        for vid, chunk in planned:
+            self.batcher.add(vid, chunk, chunk_metadata(item, chunk))
+        return len(planned)
+
+    def flush(self, vector_ids: Optional[Collection[str]] = None) -> None:
+        """
+        Write buffered products, then embed and upsert buffered chunks and wait for every upsert.
+        Jobs sharing the worker pass the ids of their vectors so only their upsert failures are raised.
+        """
+        self.flush_persisted()
+        self.batcher.flush()
+        self.upserter.flush(vector_ids)
+
+    def close(self) -> None:
+        """
+        Write everything still buffered, then stop the parse processes and upsert threads and close
+        the ledger, embedding cache and local vector store. The shared fetcher stays open.
+        """
+        try:
+            self.flush()
+        finally:
+            self.parser.close()
+            self.upserter.shutdown()
+            for resource in (self.ledger, self.embedding_cache):
+                if resource is not None:
+                    resource.close()
+            if isinstance(self.index, LocalVectorStore):
+                self.index.close()
+
+    def ingest_file(self, jsonl_path: str, pipelined: bool = False) -> None:
+        """
+        Ingest every item of a JSONL export. Local file URLs are parsed; other items use the
+        payload ``content``. ``pipelined=True`` runs the stages concurrently via ``IngestEngine``.
+        """
+        if pipelined:
+            from processors.engine import IngestEngine
+
+            engine = IngestEngine(self, load_remote=False, persist=False)
+            asyncio.run(engine.run(ingest_from_jsonl(jsonl_path)))
+            return
         for item in ingest_from_jsonl(jsonl_path):
             # Only attempt load_content for local file paths; otherwise use payload content
             if os.path.isfile(item.url):
                 try:
-                    text = load_content(item)
-                except Exception:
-                    text = ""
+                    text = load_document(item, parser=self.parser).text
+                except Exception as e:
+                    logger.warning("Failed to load %s: %s", item.url, e)
+                    self.failures.append((item.url, f"{type(e).__name__}: {e}"))
+                    continue
             else:
                 text = item.payload.get("content", "")
-            # Split into chunks (empty text yields empty list)
-            chunks = self.splitter.split_text(text)
-            vectors = []
-            for i, chunk in enumerate(chunks):
-                vec = self.embedder.embed_query(chunk)
-                vid = f"{item.url}::{i}"
-                vectors.append((vid, vec, {"url": item.url, "type": item.item_type}))
-            # Always upsert, even if vectors list is empty
-            self.index.upsert(vectors=vectors, namespace=os.getenv("PINECONE_INDEX_NAME", "grandguru-dev"))
-
-    def ingest_item(self, item: DataItem) -> None:
+            if not text.strip():
+                continue  # nothing to embed; never send empty upserts
+            self.index_text(item, text)
+        self.flush()
+
+    def persist_item(self, item: DataItem) -> None:
         """
-        Ingest a single DataItem: load content, split text, embed chunks, and upsert.
+        Queue the item's product (keyed by URL) and any image/PDF URLs for batched persistence.
+
+        ``payload["product_id"]`` is set once the item's batch is written: immediately for a
+        product already seen by this worker without new assets, otherwise on the batch flush.
+        """
+        known = self.product_ids.get(item.url)
+        if known is not None and "image_url" not in item.payload and "pdf_url" not in item.payload:
+            item.payload["product_id"] = known
+            return
+        with self._persist_lock:
+            self._persist_buffer.append(item)
+            full = len(self._persist_buffer) >= self.persist_batch_size
+        if full:
+            try:
+                self.flush_persisted()
+            except Exception as e:
+                # The batch stays buffered for the next flush; it is not this item's failure
+                logger.warning("Persisting buffered items failed, will retry on the next flush: %s", e)
+
+    def flush_persisted(self) -> int:
         """
-        # Persist or lookup product based on item URL (use URL as unique model)
+        Write buffered products, images and documents in one transaction; returns the item count.
+        If the write fails the items are put back in the buffer and the error is raised.
+        """
+        with self._persist_lock:
+            items, self._persist_buffer = self._persist_buffer, []
+        if not items:
+            return 0
+        try:
+            ids = self._write_persisted(items)
+        except Exception:
+            with self._persist_lock:
+                self._persist_buffer[:0] = items
+            raise
+        self.product_ids.update(ids)
+        for item in items:
+            # Attach product_id for persistence
+            item.payload["product_id"] = ids[item.url]
+        return len(items)
+
+    def _write_persisted(self, items: list[DataItem]) -> dict[str, int]:
+        products: dict[str, str] = {}
+        for item in items:
+            products.setdefault(item.url, item.payload.get("title", item.url))
         session = SessionLocal()
         try:
-            product = get_or_create_product(
+            ids = bulk_persist_products(
                 session,
-                model=item.url,
-                name=item.payload.get('title', item.url)
+                products,
+                images=[(i.url, i.payload["image_url"]) for i in items if "image_url" in i.payload],
+                documents=[(i.url, i.payload["pdf_url"]) for i in items if "pdf_url" in i.payload],
             )
-            # Attach product_id for persistence
-            item.payload['product_id'] = product.id
-            # Persist any asset URLs directly into DB
-            if 'image_url' in item.payload:
-                create_image(session, product_id=product.id, url=item.payload['image_url'])
-            if 'pdf_url' in item.payload:
-                create_document(session, product_id=product.id, url=item.payload['pdf_url'])
         finally:
             session.close()
-        # Load the content (HTML or PDF)
-        try:
-            text = load_content(item)
-        except Exception:
-            text = ""
-        if not text.strip():
+        return ids
+
+    def ingest_item(self, item: DataItem, on_planned: Optional[Callable[[list[str]], None]] = None) -> None:
+        """
+        Ingest a single DataItem: load content, split text, embed chunks, and upsert.
+
+        Fetch and parse errors propagate so callers can count the failure or dead-letter the item.
+        ``on_planned`` is passed to :meth:`index_text`; it is not called for unchanged or empty items.
+        """
+        self.persist_item(item)
+        # Load the content (HTML or PDF), conditionally if the ledger has validators for it
+        previous = self.ledger.get(item.url) if self.ledger is not None else None
+        loaded = load_document(
+            item,
+            self.fetcher,
+            etag=previous.etag if previous else None,
+            last_modified=previous.last_modified if previous else None,
+            parser=self.parser,
+        )
+        if loaded.not_modified:
+            self.skipped += 1
             return
-        # Split text
-        chunks = self.splitter.split_text(text)
-        vectors = []
-        for i, chunk in enumerate(chunks):
-            embedding = self.embedder.embed_query(chunk)
-            vid = f"{item.url}::{i}"
-            vectors.append((vid, embedding, {"url": item.url, "type": item.item_type}))
-        # Upsert into Pinecone
-        self.index.upsert(vectors=vectors, namespace=os.getenv("PINECONE_INDEX_NAME", "grandguru-dev"))
+        if not loaded.text.strip():
+            return
+        # Split text and queue changed chunks; they are embedded and upserted batch-wise
+        self.index_text(
+            item, loaded.text, etag=loaded.etag, last_modified=loaded.last_modified, on_planned=on_planned
+        )
+
+
+_worker: Optional[IngestWorker] = None
+_worker_lock = threading.Lock()
+
+
+def get_ingest_worker() -> IngestWorker:
+    """Process-wide worker shared by crawl jobs, so its pools and connections are created once."""
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = IngestWorker()
+        return _worker
+
+
+def close_ingest_worker() -> None:
+    """Close the shared worker, if one was created (e.g. on API shutdown)."""
+    global _worker
+    with _worker_lock:
+        worker, _worker = _worker, None
+    if worker is not None:
+        worker.close()
 
 
 if __name__ == "__main__":
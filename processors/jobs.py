@@ -0,0 +1,201 @@
+"""
+Ingest job ledger and dead-letter queue.
+
+Every item of an ingest run is tracked per job (the export path) as ``pending`` while it is
+processed, ``done`` once its vectors are upserted, or ``failed`` with the error and attempt count.
+A resumed run skips ``done`` items; failed items are written to a dead-letter JSONL file in the
+export format and replayed with exponential backoff until ``max_attempts`` is reached.
+"""
+import os
+import json
+import time
+import sqlite3
+import threading
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+
+from crawler.items import DataItem, ItemType
+from processors.jsonl import iter_jsonl
+
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+
+
+def item_key(item: DataItem) -> str:
+    return item.url
+
+
+def _item_json(item: DataItem) -> str:
+    return json.dumps({"url": item.url, "item_type": item.item_type.value, "payload": item.payload}, default=str)
+
+
+@dataclass
+class JobItem:
+    """Ledger row of one item within a job."""
+    key: str
+    state: str
+    attempts: int
+    item: DataItem
+    error: Optional[str] = None
+    next_attempt_at: float = 0.0
+
+
+class JobLedger:
+    """
+    SQLite-backed per-item state of ingest jobs.
+
+    A failed item may be retried ``max_attempts`` times in total (``INGEST_MAX_ATTEMPTS``); after
+    the n-th failure it is not due again for ``backoff * 2 ** (n - 1)`` seconds
+    (``INGEST_RETRY_BACKOFF``).
+    """
+
+    def __init__(self, path: str, max_attempts: Optional[int] = None, backoff: Optional[float] = None):
+        self.path = path
+        self.max_attempts = max_attempts or int(os.getenv("INGEST_MAX_ATTEMPTS", "5"))
+        self.backoff = backoff if backoff is not None else float(os.getenv("INGEST_RETRY_BACKOFF", "60"))
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS ingest_jobs ("
+            " job TEXT NOT NULL,"
+            " key TEXT NOT NULL,"
+            " state TEXT NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " error TEXT,"
+            " item TEXT NOT NULL,"
+            " next_attempt_at REAL NOT NULL DEFAULT 0,"
+            " updated_at REAL NOT NULL,"
+            " PRIMARY KEY (job, key))"
+        )
+        self._conn.commit()
+
+    def done_keys(self, job: str) -> Set[str]:
+        with self._lock:
+            rows = self._conn.execute("SELECT key FROM ingest_jobs WHERE job = ? AND state = ?", (job, DONE))
+            return {row[0] for row in rows}
+
+    def start(self, job: str, item: DataItem) -> None:
+        """Mark an item pending and count the attempt."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO ingest_jobs (job, key, state, attempts, item, updated_at) VALUES (?, ?, ?, 1, ?, ?)"
+                " ON CONFLICT (job, key) DO UPDATE SET state = excluded.state, attempts = attempts + 1,"
+                " item = excluded.item, updated_at = excluded.updated_at",
+                (job, item_key(item), PENDING, _item_json(item), time.time()),
+            )
+            self._conn.commit()
+
+    def mark_done(self, job: str, keys: Iterable[str]) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE ingest_jobs SET state = ?, error = NULL, updated_at = ? WHERE job = ? AND key = ?",
+                [(DONE, now, job, key) for key in keys],
+            )
+            self._conn.commit()
+
+    def mark_failed(self, job: str, item: DataItem, error: BaseException) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE ingest_jobs SET state = ?, error = ?, updated_at = ?,"
+                " next_attempt_at = ? + ? * (1 << (attempts - 1)) WHERE job = ? AND key = ?",
+                (FAILED, f"{type(error).__name__}: {error}", now, now, self.backoff, job, item_key(item)),
+            )
+            self._conn.commit()
+
+    def get(self, job: str, key: str) -> Optional[JobItem]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT key, state, attempts, item, error, next_attempt_at FROM ingest_jobs"
+                " WHERE job = ? AND key = ?",
+                (job, key),
+            ).fetchone()
+        return _job_item(row) if row else None
+
+    def failed(self, job: str) -> List[JobItem]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, state, attempts, item, error, next_attempt_at FROM ingest_jobs"
+                " WHERE job = ? AND state = ? ORDER BY updated_at",
+                (job, FAILED),
+            ).fetchall()
+        return [_job_item(row) for row in rows]
+
+    def is_due(self, entry: Optional[JobItem], now: Optional[float] = None) -> bool:
+        """Whether an item should be (re)tried now: unseen, interrupted, or failed and past its backoff."""
+        if entry is None or entry.state == PENDING:
+            return True
+        if entry.state == DONE:
+            return False
+        return entry.attempts < self.max_attempts and entry.next_attempt_at <= (now or time.time())
+
+    def summary(self, job: str) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT state, COUNT(*) FROM ingest_jobs WHERE job = ? GROUP BY state", (job,)
+            ).fetchall()
+        return dict(rows)
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+def _job_item(row) -> JobItem:
+    obj = json.loads(row[3])
+    return JobItem(
+        key=row[0],
+        state=row[1],
+        attempts=row[2],
+        item=DataItem(url=obj["url"], item_type=ItemType(obj["item_type"]), payload=obj["payload"]),
+        error=row[4],
+        next_attempt_at=row[5],
+    )
+
+
+class DeadLetterQueue:
+    """
+    JSONL file of failed items in the Scrapy export format, plus ``error``/``attempts`` fields,
+    so it can be inspected, edited or fed to any ingest entry point.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def write(self, entries: List[JobItem]) -> None:
+        """Replace the file with ``entries``; an empty list removes it."""
+        if not entries:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+            return
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for entry in entries:
+                record = json.loads(_item_json(entry.item))
+                record.update(error=entry.error, attempts=entry.attempts, next_attempt_at=entry.next_attempt_at)
+                f.write(json.dumps(record, default=str) + "\n")
+        os.replace(tmp, self.path)
+
+    def __iter__(self) -> Iterator[DataItem]:
+        if not os.path.exists(self.path):
+            return
+        for _, item in iter_jsonl(self.path):
+            yield item
+
+
+def dead_letter_path(jsonl_path: str) -> str:
+    return os.getenv("INGEST_DEAD_LETTER_PATH") or f"{jsonl_path}.dead.jl"
+
+
+def jobs_from_env(default: Optional[str] = None) -> Optional[JobLedger]:
+    """Open the job ledger at ``INGEST_JOBS_PATH``, else at ``default`` if given."""
+    path = os.getenv("INGEST_JOBS_PATH") or default
+    return JobLedger(path) if path else None
@@ -0,0 +1,105 @@
+"""
+Streaming reader for Scrapy JSONL exports.
+
+Records are decoded lazily with orjson (stdlib ``json`` as a fallback); ``.gz`` and ``.zst``
+exports are decompressed transparently. Every record is yielded with the byte offset just past
+it in the decompressed stream, so a :class:`JsonlCheckpoint` can resume an interrupted run.
+"""
+import io
+import os
+import gzip
+import json
+from typing import BinaryIO, Iterator, Tuple
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+from crawler.items import DataItem, ItemType
+
+
+def open_export(path: str) -> BinaryIO:
+    """Open a JSONL export for binary line reading, decompressing by file extension."""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    if path.endswith(".zst"):
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError("Reading .zst exports requires the 'zstandard' package")
+        reader = zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+        return io.BufferedReader(reader, buffer_size=1 << 20)
+    return open(path, "rb")
+
+
+def _skip_to(f: BinaryIO, offset: int) -> None:
+    if not offset:
+        return
+    if f.seekable():
+        # gzip seeks forward by decompressing; plain files seek directly
+        f.seek(offset)
+        return
+    remaining = offset
+    while remaining:
+        block = f.read(min(remaining, 1 << 20))
+        if not block:
+            break
+        remaining -= len(block)
+
+
+def iter_jsonl(path: str, offset: int = 0) -> Iterator[Tuple[int, DataItem]]:
+    """Yield ``(end offset, DataItem)`` pairs starting at byte ``offset``."""
+    with open_export(path) as f:
+        _skip_to(f, offset)
+        position = offset
+        for line in f:
+            position += len(line)
+            if not line.strip():
+                continue
+            obj = _loads(line)
+            yield position, DataItem(
+                url=obj["url"],
+                item_type=ItemType(obj["item_type"]),
+                payload=obj["payload"],
+            )
+
+
+class JsonlCheckpoint:
+    """
+    Sidecar file (``<export>.offset``) holding the offset of the last committed record.
+
+    The stored offset is only honoured while the export's size and mtime are unchanged, so a
+    re-exported file is read from the start.
+    """
+
+    def __init__(self, jsonl_path: str, checkpoint_path: str = None):
+        self.jsonl_path = jsonl_path
+        self.path = checkpoint_path or f"{jsonl_path}.offset"
+
+    def _fingerprint(self) -> dict:
+        st = os.stat(self.jsonl_path)
+        return {"size": st.st_size, "mtime": st.st_mtime}
+
+    def load(self) -> int:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return 0
+        if state.get("source") != self._fingerprint():
+            return 0
+        return int(state.get("offset", 0))
+
+    def save(self, offset: int) -> None:
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"offset": offset, "source": self._fingerprint()}, f)
+        os.replace(tmp, self.path)
+
+    def clear(self) -> None:
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
@@ -0,0 +1,106 @@
+"""
+Per-URL ingest ledger: remembers what was last ingested for each source URL so re-crawls
+only embed and upsert what actually changed.
+"""
+import os
+import json
+import time
+import sqlite3
+import threading
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+
+@dataclass
+class LedgerEntry:
+    """State of a URL after its last successful ingest."""
+    url: str
+    content_hash: str
+    chunk_hashes: List[str] = field(default_factory=list)
+    vector_ids: List[str] = field(default_factory=list)
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    # Tokenizer the chunks were cut with (see TokenSplitter.encoding_name)
+    encoding: Optional[str] = None
+
+    @property
+    def chunk_count(self) -> int:
+        return len(self.chunk_hashes)
+
+
+class IngestLedger:
+    """SQLite-backed store of :class:`LedgerEntry` rows keyed by URL."""
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS ingest_ledger ("
+            " url TEXT PRIMARY KEY,"
+            " content_hash TEXT NOT NULL,"
+            " etag TEXT,"
+            " last_modified TEXT,"
+            " chunk_count INTEGER NOT NULL,"
+            " chunk_hashes TEXT NOT NULL,"
+            " vector_ids TEXT NOT NULL,"
+            " updated_at REAL NOT NULL,"
+            " encoding TEXT)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(ingest_ledger)")}
+        if "encoding" not in columns:
+            # Ledgers written before the encoding was recorded
+            self._conn.execute("ALTER TABLE ingest_ledger ADD COLUMN encoding TEXT")
+        self._conn.commit()
+
+    def get(self, url: str) -> Optional[LedgerEntry]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT url, content_hash, chunk_hashes, vector_ids, etag, last_modified, encoding"
+                " FROM ingest_ledger WHERE url = ?",
+                (url,),
+            ).fetchone()
+        if row is None:
+            return None
+        return LedgerEntry(
+            url=row[0],
+            content_hash=row[1],
+            chunk_hashes=json.loads(row[2]),
+            vector_ids=json.loads(row[3]),
+            etag=row[4],
+            last_modified=row[5],
+            encoding=row[6],
+        )
+
+    def record(self, entry: LedgerEntry) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO ingest_ledger"
+                " (url, content_hash, etag, last_modified, chunk_count, chunk_hashes, vector_ids, updated_at, encoding)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    entry.url,
+                    entry.content_hash,
+                    entry.etag,
+                    entry.last_modified,
+                    entry.chunk_count,
+                    json.dumps(entry.chunk_hashes),
+                    json.dumps(entry.vector_ids),
+                    time.time(),
+                    entry.encoding,
+                ),
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+def ledger_from_env() -> Optional[IngestLedger]:
+    """Open the ledger at ``INGEST_LEDGER_PATH`` if set; incremental ingest is off otherwise."""
+    path = os.getenv("INGEST_LEDGER_PATH")
+    return IngestLedger(path) if path else None
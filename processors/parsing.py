@@ -0,0 +1,133 @@
+"""
+Document parsing stage: runs the CPU-heavy Unstructured PDF/HTML loaders in a process pool.
+
+Parsing in separate processes keeps it off the event loop and out of the GIL, scales across
+cores, and isolates crashes: a PDF that hangs or kills its worker only fails that document.
+"""
+import os
+import asyncio
+import threading
+import multiprocessing
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor, TimeoutError as FuturesTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Optional, Tuple
+
+try:
+    from langchain.document_loaders.unstructured import UnstructuredHTMLLoader as HTMLLoader, UnstructuredPDFLoader as PyPDFLoader
+except ImportError:
+    # Fallback stubs for loaders if official implementations aren't available
+    class HTMLLoader:
+        def __init__(self, file_path):
+            self.file_path = file_path
+        def load(self):
+            return []
+    class PyPDFLoader(HTMLLoader):
+        pass
+
+
+class ParseError(RuntimeError):
+    """Raised when a document times out or crashes its parser process."""
+
+
+def parse_file(path: str, kind: str) -> str:
+    """Load ``path`` with the PDF or HTML loader and return the concatenated page text."""
+    loader = PyPDFLoader(path) if kind == "pdf" else HTMLLoader(path)
+    # load() returns a list of Document; concatenate all pages
+    return "\n".join(doc.page_content for doc in loader.load())
+
+
+class ParsePool:
+    """
+    Process pool that turns downloaded files into text.
+
+    ``max_workers`` defaults to ``PARSE_WORKERS`` (2); ``0`` parses inline in the calling thread.
+    At most ``max_workers`` documents are submitted at once, so each one's ``timeout`` seconds
+    (``PARSE_TIMEOUT``) count parsing time only. A timeout or crashed worker restarts the pool;
+    the other documents that were in flight are parsed again, each in a one-off process of its
+    own, so only the document that hangs or crashes fails. ``target`` is the module-level
+    function run per document (``parse_file`` by default).
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        timeout: Optional[float] = None,
+        target: Callable[[str, str], str] = parse_file,
+    ):
+        if max_workers is None:
+            max_workers = int(os.getenv("PARSE_WORKERS", "2"))
+        self.max_workers = max_workers
+        self.timeout = timeout or float(os.getenv("PARSE_TIMEOUT", "120"))
+        self.target = target
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max(max_workers, 1))
+
+    def _new_executor(self, max_workers: int) -> ProcessPoolExecutor:
+        # spawn: forking a process that runs threads and an event loop is unsafe
+        return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def _submit(self, path: str, kind: str) -> Tuple[ProcessPoolExecutor, Future]:
+        while True:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = self._new_executor(self.max_workers)
+                executor = self._executor
+            try:
+                return executor, executor.submit(self.target, path, kind)
+            except (BrokenProcessPool, RuntimeError):
+                # Another thread broke or reset this pool between lookup and submit
+                self._reset(executor)
+
+    def _reset(self, executor: ProcessPoolExecutor, kill: bool = False) -> None:
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        if kill:
+            _terminate(executor)
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _parse_isolated(self, path: str, kind: str) -> str:
+        """Parse in a one-off single-process pool, so a hang or crash affects this document only."""
+        executor = self._new_executor(1)
+        try:
+            return executor.submit(self.target, path, kind).result(timeout=self.timeout)
+        except FuturesTimeoutError:
+            _terminate(executor)
+            raise ParseError(f"Parsing {path} timed out after {self.timeout}s")
+        except BrokenProcessPool:
+            raise ParseError(f"Parser process crashed on {path}")
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def parse(self, path: str, kind: str) -> str:
+        """Parse one file, blocking until its text is ready."""
+        if self.max_workers == 0:
+            return self.target(path, kind)
+        with self._slots:
+            executor, future = self._submit(path, kind)
+            try:
+                return future.result(timeout=self.timeout)
+            except FuturesTimeoutError:
+                self._reset(executor, kill=True)
+                raise ParseError(f"Parsing {path} timed out after {self.timeout}s")
+            except (BrokenProcessPool, CancelledError):
+                # The pool died while this document was in it: it may be the culprit or a bystander
+                self._reset(executor)
+            return self._parse_isolated(path, kind)
+
+    async def aparse(self, path: str, kind: str) -> str:
+        """Asyncio variant of :meth:`parse` that never blocks the event loop."""
+        return await asyncio.to_thread(self.parse, path, kind)
+
+    def close(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _terminate(executor: ProcessPoolExecutor) -> None:
+    # A hung parser never returns on its own; terminate the worker processes
+    for proc in list((getattr(executor, "_processes", None) or {}).values()):
+        proc.terminate()
@@ -0,0 +1,246 @@
+"""
+Token-aware text splitting and chunk-level de-duplication.
+
+:class:`TokenSplitter` encodes a text once, measures chunks in model tokens and cuts at
+paragraph/sentence breaks where it can, slicing chunks straight out of the source string.
+:class:`ChunkDeduper` drops chunks already seen elsewhere in the corpus, either verbatim or as a
+near-duplicate (64-bit SimHash within a small Hamming distance), before they are embedded.
+"""
+import os
+import re
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+# Recorded as the encoding of chunks measured in pseudo-tokens
+PSEUDO_ENCODING = "pseudo"
+# Rough stand-in for BPE tokens when no tokenizer is available: words and punctuation marks
+_PSEUDO_TOKEN = re.compile(r"\w+|[^\w\s]")
+# Preferred cut points: paragraph breaks, sentence ends and line breaks
+_BREAK = re.compile(r"\n\s*\n|(?<=[.!?])\s+|\n")
+_WORD = re.compile(r"\w+")
+
+
+@lru_cache(maxsize=None)
+def load_encoding(name: str):
+    """Return the tiktoken encoding ``name``, or ``None`` if tiktoken or its BPE file is unavailable."""
+    if tiktoken is None:
+        logger.warning("tiktoken is not installed; chunks are measured in word-level pseudo-tokens")
+        return None
+    try:
+        return tiktoken.get_encoding(name)
+    except Exception as e:
+        # The BPE ranks are downloaded on first use; offline hosts fall back to pseudo-tokens
+        logger.warning("Cannot load tiktoken encoding %s (%s); chunks are measured in pseudo-tokens", name, e)
+        return None
+
+
+class TokenSplitter:
+    """
+    Split text into chunks of at most ``chunk_tokens`` tokens overlapping by ``overlap_tokens``.
+
+    Defaults come from ``CHUNK_TOKENS``/``CHUNK_OVERLAP_TOKENS`` and the ``CHUNK_ENCODING``
+    tiktoken encoding. A chunk ends at the last paragraph/sentence break in its second half when
+    there is one. Build one splitter and reuse it; :func:`get_splitter` returns a shared instance.
+    """
+
+    def __init__(
+        self,
+        chunk_tokens: Optional[int] = None,
+        overlap_tokens: Optional[int] = None,
+        encoding_name: Optional[str] = None,
+    ):
+        self.chunk_tokens = chunk_tokens or int(os.getenv("CHUNK_TOKENS", "256"))
+        self.overlap_tokens = (
+            overlap_tokens if overlap_tokens is not None else int(os.getenv("CHUNK_OVERLAP_TOKENS", "48"))
+        )
+        if not 0 <= self.overlap_tokens < self.chunk_tokens:
+            raise ValueError("overlap_tokens must be smaller than chunk_tokens")
+        self.encoding = load_encoding(encoding_name or os.getenv("CHUNK_ENCODING", "cl100k_base"))
+
+    @property
+    def encoding_name(self) -> str:
+        """Name of the tokenizer chunks are measured with, :data:`PSEUDO_ENCODING` for the fallback."""
+        return self.encoding.name if self.encoding is not None else PSEUDO_ENCODING
+
+    def token_offsets(self, text: str) -> np.ndarray:
+        """Character offset at which each token of ``text`` starts."""
+        if self.encoding is not None:
+            _, offsets = self.encoding.decode_with_offsets(self.encoding.encode(text, disallowed_special=()))
+            return np.asarray(offsets, dtype=np.int64)
+        return np.fromiter((m.start() for m in _PSEUDO_TOKEN.finditer(text)), dtype=np.int64)
+
+    def count_tokens(self, text: str) -> int:
+        if self.encoding is not None:
+            return len(self.encoding.encode(text, disallowed_special=()))
+        return sum(1 for _ in _PSEUDO_TOKEN.finditer(text))
+
+    def iter_chunks(self, text: str) -> Iterator[str]:
+        offsets = self.token_offsets(text)
+        n = len(offsets)
+        if n == 0:
+            return
+        # Token index at which each break's following text begins
+        breaks = np.fromiter((m.end() for m in _BREAK.finditer(text)), dtype=np.int64)
+        cuts = np.unique(np.searchsorted(offsets, breaks))
+        start = 0
+        while start < n:
+            end = min(start + self.chunk_tokens, n)
+            if end < n:
+                i = np.searchsorted(cuts, end, side="right") - 1
+                if i >= 0 and cuts[i] > start + self.chunk_tokens // 2:
+                    end = int(cuts[i])
+            chunk = text[offsets[start]: offsets[end] if end < n else len(text)].strip()
+            if chunk:
+                yield chunk
+            if end >= n:
+                return
+            # Start the overlap at a break inside it when possible
+            overlap_start = max(end - self.overlap_tokens, start + 1)
+            i = np.searchsorted(cuts, overlap_start)
+            start = int(cuts[i]) if i < len(cuts) and cuts[i] < end else overlap_start
+
+    def split_text(self, text: str) -> List[str]:
+        return list(self.iter_chunks(text))
+
+
+_splitter: Optional[TokenSplitter] = None
+
+
+def get_splitter() -> TokenSplitter:
+    """Process-wide splitter configured from the environment."""
+    global _splitter
+    if _splitter is None:
+        _splitter = TokenSplitter()
+    return _splitter
+
+
+def simhash(text: str, shingle: int = 3) -> Optional[int]:
+    """64-bit SimHash over word shingles, or ``None`` if the text has no words."""
+    words = _WORD.findall(text.lower())
+    if not words:
+        return None
+    features = {" ".join(words[i:i + shingle]) for i in range(max(len(words) - shingle + 1, 1))}
+    hashes = np.array(
+        [int.from_bytes(hashlib.blake2b(f.encode("utf-8"), digest_size=8).digest(), "little") for f in features],
+        dtype=np.uint64,
+    )
+    bits = (hashes[:, None] >> np.arange(64, dtype=np.uint64)) & np.uint64(1)
+    votes = bits.sum(axis=0) * 2 > len(hashes)
+    return int(np.packbits(votes, bitorder="little").view("<u8")[0])
+
+
+@dataclass
+class DedupeStats:
+    chunks: int = 0
+    exact: int = 0
+    near: int = 0
+
+    @property
+    def saved(self) -> int:
+        return self.exact + self.near
+
+
+class ChunkDeduper:
+    """
+    Corpus-wide filter for repeated chunks (boilerplate headers, footers, legal text).
+
+    A chunk is dropped when its whitespace-normalised text was already kept, or when its SimHash
+    is within ``max_distance`` bits (``CHUNK_SIMHASH_DISTANCE``) of a kept chunk with at least
+    ``min_words`` words. Fingerprints are split into ``max_distance + 1`` bands so candidates
+    come from exact band lookups. A chunk re-submitted under the vector id it was first kept
+    with counts as an update, not a duplicate. At most ``max_entries`` kept chunks
+    (``CHUNK_DEDUPE_MAX_ENTRIES``) are remembered, the oldest forgotten first.
+    """
+
+    def __init__(self, max_distance: Optional[int] = None, min_words: int = 8, max_entries: Optional[int] = None):
+        self.max_distance = (
+            max_distance if max_distance is not None else int(os.getenv("CHUNK_SIMHASH_DISTANCE", "3"))
+        )
+        self.min_words = min_words
+        self.max_entries = (
+            max_entries if max_entries is not None else int(os.getenv("CHUNK_DEDUPE_MAX_ENTRIES", "200000"))
+        )
+        self.stats = DedupeStats()
+        bands = self.max_distance + 1
+        width = 64 // bands
+        self._bands = [(i * width, 64 if i == bands - 1 else (i + 1) * width) for i in range(bands)]
+        self._exact: Dict[str, str] = {}
+        self._tables: List[Dict[int, List[Tuple[int, str]]]] = [{} for _ in self._bands]
+        # Kept chunks in insertion order: vid -> (digest, fingerprint)
+        self._kept: "OrderedDict[str, Tuple[str, Optional[int]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _band_keys(self, fingerprint: int) -> List[int]:
+        return [(fingerprint >> lo) & ((1 << (hi - lo)) - 1) for lo, hi in self._bands]
+
+    def __len__(self) -> int:
+        return len(self._kept)
+
+    def is_duplicate(self, vid: str, text: str) -> bool:
+        """Record ``text`` under ``vid`` and report whether it repeats an already kept chunk."""
+        digest = hashlib.sha256(" ".join(text.split()).encode("utf-8")).hexdigest()
+        near = self.max_distance > 0 and len(_WORD.findall(text)) >= self.min_words
+        fingerprint = simhash(text) if near else None
+        with self._lock:
+            self.stats.chunks += 1
+            owner = self._exact.get(digest)
+            if owner is not None and owner != vid:
+                self.stats.exact += 1
+                return True
+            keys = self._band_keys(fingerprint) if fingerprint is not None else []
+            for table, key in zip(self._tables, keys):
+                for other, other_vid in table.get(key, ()):
+                    if other_vid != vid and bin(other ^ fingerprint).count("1") <= self.max_distance:
+                        self.stats.near += 1
+                        return True
+            # An update replaces what was kept under this id
+            self._forget(vid)
+            for table, key in zip(self._tables, keys):
+                table.setdefault(key, []).append((fingerprint, vid))
+            self._exact.setdefault(digest, vid)
+            self._kept[vid] = (digest, fingerprint)
+            while len(self._kept) > self.max_entries:
+                self._forget(next(iter(self._kept)))
+            return False
+
+    def _forget(self, vid: str) -> None:
+        entry = self._kept.pop(vid, None)
+        if entry is None:
+            return
+        digest, fingerprint = entry
+        if self._exact.get(digest) == vid:
+            del self._exact[digest]
+        if fingerprint is None:
+            return
+        for table, key in zip(self._tables, self._band_keys(fingerprint)):
+            bucket = table.get(key)
+            if bucket is None:
+                continue
+            bucket[:] = [(f, v) for f, v in bucket if v != vid]
+            if not bucket:
+                del table[key]
+
+    def filter(self, chunks: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+        """Keep the ``(vector id, chunk)`` pairs that are not duplicates."""
+        return [(vid, chunk) for vid, chunk in chunks if not self.is_duplicate(vid, chunk)]
+
+
+def deduper_from_env() -> Optional[ChunkDeduper]:
+    """Chunk de-duplication is on unless ``CHUNK_DEDUPE=0``."""
+    if os.getenv("CHUNK_DEDUPE", "1").lower() in ("0", "false", "no"):
+        return None
+    return ChunkDeduper()
@@ -0,0 +1,233 @@
+"""
+Upsert buffer: accumulates vectors across items and writes them to the vector index in
+fixed-size batches over a small pool of parallel requests, retrying throttled (429) and
+server-side (5xx) failures with exponential backoff.
+"""
+import os
+import json
+import time
+import random
+import logging
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable, Collection, Dict, List, Optional, Tuple
+
+from processors.embedding import Vector
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+def _status_of(error: BaseException) -> Optional[int]:
+    """Best-effort HTTP status of a client exception (Pinecone, requests or httpx style)."""
+    for attr in ("status", "status_code"):
+        value = getattr(error, attr, None)
+        if isinstance(value, int):
+            return value
+    response = getattr(error, "response", None)
+    value = getattr(response, "status_code", None)
+    return value if isinstance(value, int) else None
+
+
+def is_retryable(error: BaseException) -> bool:
+    status = _status_of(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    return isinstance(error, (ConnectionError, TimeoutError))
+
+
+def vector_size(vector: Vector) -> int:
+    """Approximate request payload size of one vector in bytes."""
+    vid, values, metadata = vector
+    return len(vid) + 12 * len(values) + len(json.dumps(metadata, default=str))
+
+
+@dataclass
+class UpsertStats:
+    batches: int = 0
+    vectors: int = 0
+    retries: int = 0
+    failures: int = 0
+    # Summed request time, overlapping across workers
+    seconds: float = 0.0
+    # Wall time with at least one request in flight; idle time between batches is not counted
+    busy_seconds: float = 0.0
+    in_flight: int = 0
+    busy_since: Optional[float] = None
+
+    def request_started(self) -> None:
+        if self.in_flight == 0:
+            self.busy_since = time.perf_counter()
+        self.in_flight += 1
+
+    def request_finished(self) -> None:
+        self.in_flight -= 1
+        if self.in_flight == 0 and self.busy_since is not None:
+            self.busy_seconds += time.perf_counter() - self.busy_since
+            self.busy_since = None
+
+    @property
+    def upserts_per_second(self) -> float:
+        busy = self.busy_seconds
+        if self.busy_since is not None:
+            busy += time.perf_counter() - self.busy_since
+        return self.vectors / busy if busy > 0 else 0.0
+
+
+class UpsertBuffer:
+    """
+    Batch vectors for ``index.upsert`` and send batches from a thread pool.
+
+    A batch is sent once it holds ``batch_size`` vectors or ``max_bytes`` of payload. At most
+    ``2 * workers`` batches are in flight; ``add`` blocks beyond that. ``on_done`` is called
+    with each batch after it has been written, ``on_error`` with a batch and its error once
+    retries are exhausted. ``flush`` sends the remainder, waits for every request and re-raises
+    the first failure; callers sharing the buffer pass their ``vector_ids`` so they only see the
+    failures of their own vectors.
+    """
+
+    def __init__(
+        self,
+        index,
+        namespace: str,
+        batch_size: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        workers: Optional[int] = None,
+        max_retries: Optional[int] = None,
+        backoff: float = 0.5,
+        on_done: Optional[Callable[[List[Vector]], None]] = None,
+        on_error: Optional[Callable[[List[Vector], BaseException], None]] = None,
+    ):
+        self.index = index
+        self.namespace = namespace
+        self.batch_size = batch_size or int(os.getenv("UPSERT_BATCH_SIZE", "100"))
+        self.max_bytes = max_bytes or int(os.getenv("UPSERT_MAX_BYTES", str(2 * 1024 * 1024)))
+        self.workers = workers or int(os.getenv("UPSERT_WORKERS", "4"))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("UPSERT_MAX_RETRIES", "5"))
+        self.backoff = backoff
+        self.on_done = on_done
+        self.on_error = on_error
+        self.stats = UpsertStats()
+        # Re-entrant: done-callbacks may run inline while add() holds the lock
+        self._lock = threading.RLock()
+        self._pending: List[Vector] = []
+        self._pending_bytes = 0
+        # Batches in flight, with the ids of their vectors, and failures with the ids they held
+        self._futures: Dict[Future, List[str]] = {}
+        self._errors: List[Tuple[BaseException, List[str]]] = []
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="upsert")
+
+    def add(self, vectors: List[Vector]) -> None:
+        """Buffer vectors, sending full batches as they fill up."""
+        for vector in vectors:
+            size = vector_size(vector)
+            with self._lock:
+                if self._pending and self._pending_bytes + size > self.max_bytes:
+                    self._submit_locked()
+                self._pending.append(vector)
+                self._pending_bytes += size
+                if len(self._pending) >= self.batch_size:
+                    self._submit_locked()
+            self._throttle()
+
+    def _submit_locked(self) -> None:
+        batch, self._pending, self._pending_bytes = self._pending, [], 0
+        future = self._executor.submit(self._send, batch)
+        self._futures[future] = [vid for vid, _, _ in batch]
+        future.add_done_callback(self._finished)
+
+    def _finished(self, future: Future) -> None:
+        # Runs as the done-callback and again from flush(), whichever comes first records the error
+        with self._lock:
+            vector_ids = self._futures.pop(future, None)
+            if vector_ids is None:
+                return
+            error = future.exception()
+            if error is not None:
+                self._errors.append((error, vector_ids))
+
+    def _throttle(self) -> None:
+        # Backpressure: don't queue more than two batches per worker
+        while True:
+            with self._lock:
+                in_flight = set(self._futures)
+            if len(in_flight) < 2 * self.workers:
+                return
+            wait(in_flight, return_when=FIRST_COMPLETED)
+
+    def _send(self, batch: List[Vector]) -> None:
+        with self._lock:
+            self.stats.request_started()
+        try:
+            self._send_batch(batch)
+        finally:
+            with self._lock:
+                self.stats.request_finished()
+
+    def _send_batch(self, batch: List[Vector]) -> None:
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                self.index.upsert(vectors=batch, namespace=self.namespace)
+                break
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    with self._lock:
+                        self.stats.failures += 1
+                    logger.error("Upsert of %d vectors failed: %s", len(batch), e)
+                    if self.on_error is not None:
+                        self.on_error(batch, e)
+                    raise
+                delay = self.backoff * (2 ** attempt) * (1 + random.random())
+                attempt += 1
+                with self._lock:
+                    self.stats.retries += 1
+                logger.warning("Upsert throttled/failed (%s); retry %d in %.2fs", e, attempt, delay)
+                time.sleep(delay)
+        with self._lock:
+            self.stats.batches += 1
+            self.stats.vectors += len(batch)
+            self.stats.seconds += time.perf_counter() - start
+        if self.on_done is not None:
+            self.on_done(batch)
+
+    def flush(self, vector_ids: Optional[Collection[str]] = None) -> None:
+        """
+        Send anything buffered, wait for all in-flight batches and surface failures. With
+        ``vector_ids`` only failed batches holding one of them are raised (and forgotten); the
+        failures of other callers' vectors are kept for their own flush.
+        """
+        with self._lock:
+            if self._pending:
+                self._submit_locked()
+            in_flight = set(self._futures)
+        wait(in_flight)
+        # wait() can return before the done-callbacks have run
+        for future in in_flight:
+            self._finished(future)
+        with self._lock:
+            if vector_ids is None:
+                errors, self._errors = self._errors, []
+            else:
+                errors = [e for e in self._errors if any(vid in vector_ids for vid in e[1])]
+                self._errors = [e for e in self._errors if not any(e is error for error in errors)]
+        if self.stats.vectors:
+            logger.info(
+                "Upserted %d vectors in %d batches (%.1f vectors/s, %d retries)",
+                self.stats.vectors, self.stats.batches, self.stats.upserts_per_second, self.stats.retries,
+            )
+        if errors:
+            raise errors[0][0]
+
+    def shutdown(self) -> None:
+        """Stop the request threads without sending what is still buffered."""
+        self._executor.shutdown(wait=True)
+
+    def close(self) -> None:
+        try:
+            self.flush()
+        finally:
+            self.shutdown()
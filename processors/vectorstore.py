@@ -0,0 +1,357 @@
+"""
+Local vector store: an on-disk stand-in for a Pinecone index.
+
+Vectors live in one memory-mapped float32 matrix per namespace and ids/metadata in SQLite, so
+ingest and retrieval run without network access. The class mirrors the subset of the Pinecone
+``Index`` API the project uses (``upsert``, ``delete``, ``query``, ``fetch``,
+``describe_index_stats``) and can be passed anywhere an index is expected. Search is exact by
+default; ``index_type="ivf"`` adds an inverted-file (k-means) approximate index per namespace.
+"""
+import os
+import json
+import hashlib
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+METRICS = ("cosine", "dotproduct")
+INDEX_TYPES = ("flat", "ivf")
+
+
+def _as_record(vector) -> tuple:
+    """Normalise a Pinecone-style vector (tuple or dict) to ``(id, values, metadata)``."""
+    if isinstance(vector, dict):
+        return vector["id"], vector["values"], vector.get("metadata") or {}
+    vid, values, *rest = vector
+    return vid, values, (rest[0] if rest else None) or {}
+
+
+def _matches(metadata: Dict[str, Any], flt: Optional[Dict[str, Any]]) -> bool:
+    """Evaluate the equality/``$eq``/``$ne``/``$in``/``$nin`` subset of Pinecone metadata filters."""
+    if not flt:
+        return True
+    for key, cond in flt.items():
+        value = metadata.get(key)
+        if not isinstance(cond, dict):
+            cond = {"$eq": cond}
+        for op, arg in cond.items():
+            if op == "$eq" and value != arg:
+                return False
+            if op == "$ne" and value == arg:
+                return False
+            if op == "$in" and value not in arg:
+                return False
+            if op == "$nin" and value in arg:
+                return False
+            if op not in ("$eq", "$ne", "$in", "$nin"):
+                raise ValueError(f"Unsupported filter operator {op!r}")
+    return True
+
+
+class _Namespace:
+    """Vectors of one namespace: a growable memmap plus row bookkeeping and an optional IVF index."""
+
+    def __init__(self, path: str, dimension: int, rows: int):
+        self.path = path
+        self.dimension = dimension
+        self.rows = rows  # allocated rows, live or free
+        self.capacity = 0
+        self.matrix: Optional[np.memmap] = None
+        self.live = np.zeros(0, dtype=bool)
+        self.row_ids: Dict[int, str] = {}
+        self.id_rows: Dict[str, int] = {}
+        self.metadata: Dict[int, Dict[str, Any]] = {}
+        self.free: List[int] = []
+        # IVF state: centroids and each row's list (-1 = not assigned)
+        self.centroids: Optional[np.ndarray] = None
+        self.assignment = np.zeros(0, dtype=np.int32)
+        self.trained_on = 0
+        self._open(max(rows, 1))
+
+    def _open(self, capacity: int) -> None:
+        if self.matrix is not None:
+            self.matrix.flush()
+            del self.matrix
+        with open(self.path, "ab") as f:
+            f.truncate(max(os.path.getsize(self.path), capacity * self.dimension * 4))
+        self.capacity = capacity
+        self.matrix = np.memmap(self.path, dtype=np.float32, mode="r+", shape=(capacity, self.dimension))
+        self.live = np.concatenate([self.live, np.zeros(capacity - len(self.live), dtype=bool)])
+        self.assignment = np.concatenate(
+            [self.assignment, np.full(capacity - len(self.assignment), -1, dtype=np.int32)]
+        )
+
+    def allocate(self) -> int:
+        if self.free:
+            return self.free.pop()
+        if self.rows == self.capacity:
+            self._open(self.capacity * 2)
+        self.rows += 1
+        return self.rows - 1
+
+    @property
+    def count(self) -> int:
+        return len(self.id_rows)
+
+
+class LocalVectorStore:
+    """
+    Pinecone-compatible vector index stored under ``path``.
+
+    ``metric`` is ``"cosine"`` (vectors are normalised on write) or ``"dotproduct"``.
+    ``index_type="ivf"`` answers queries from ``nprobe`` of ``nlist`` k-means clusters once a
+    namespace holds ``ivf_min_rows`` vectors; smaller namespaces are always searched exactly.
+    The IVF index is trained lazily in memory, new vectors join their nearest cluster, and it is
+    retrained when the namespace has doubled since the last training (or via :meth:`build_index`).
+    """
+
+    def __init__(
+        self,
+        path: str,
+        metric: str = "cosine",
+        index_type: Optional[str] = None,
+        nlist: Optional[int] = None,
+        nprobe: Optional[int] = None,
+        ivf_min_rows: int = 1024,
+    ):
+        if metric not in METRICS:
+            raise ValueError(f"metric must be one of {METRICS}")
+        index_type = index_type or os.getenv("LOCAL_VECTOR_INDEX", "flat")
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"index_type must be one of {INDEX_TYPES}")
+        self.path = path
+        self.metric = metric
+        self.index_type = index_type
+        self.nlist = nlist or int(os.getenv("LOCAL_VECTOR_NLIST", "0"))  # 0 = sqrt(vector count)
+        self.nprobe = nprobe or int(os.getenv("LOCAL_VECTOR_NPROBE", "8"))
+        self.ivf_min_rows = ivf_min_rows
+        os.makedirs(path, exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(os.path.join(path, "index.sqlite3"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS namespaces ("
+            " name TEXT PRIMARY KEY, file TEXT NOT NULL, dimension INTEGER NOT NULL, rows INTEGER NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS vectors ("
+            " namespace TEXT NOT NULL, id TEXT NOT NULL, row INTEGER NOT NULL, metadata TEXT NOT NULL,"
+            " PRIMARY KEY (namespace, id))"
+        )
+        self._conn.commit()
+        self._namespaces: Dict[str, _Namespace] = {}
+        for name, file, dimension, rows in self._conn.execute("SELECT name, file, dimension, rows FROM namespaces"):
+            self._namespaces[name] = self._load(name, file, dimension, rows)
+
+    def _load(self, name: str, file: str, dimension: int, rows: int) -> _Namespace:
+        ns = _Namespace(os.path.join(self.path, file), dimension, rows)
+        for vid, row, metadata in self._conn.execute(
+            "SELECT id, row, metadata FROM vectors WHERE namespace = ?", (name,)
+        ):
+            ns.id_rows[vid] = row
+            ns.row_ids[row] = vid
+            ns.metadata[row] = json.loads(metadata)
+            ns.live[row] = True
+        ns.free = [r for r in range(ns.rows) if not ns.live[r]]
+        return ns
+
+    def _namespace(self, name: str, dimension: int) -> _Namespace:
+        ns = self._namespaces.get(name)
+        if ns is None:
+            file = hashlib.sha1(name.encode("utf-8")).hexdigest()[:16] + ".f32"
+            self._conn.execute(
+                "INSERT INTO namespaces (name, file, dimension, rows) VALUES (?, ?, ?, 0)",
+                (name, file, dimension),
+            )
+            ns = self._namespaces[name] = _Namespace(os.path.join(self.path, file), dimension, 0)
+        elif ns.dimension != dimension:
+            raise ValueError(f"Vector dimension {dimension} does not match namespace dimension {ns.dimension}")
+        return ns
+
+    def _prepare(self, values) -> np.ndarray:
+        vec = np.asarray(values, dtype=np.float32)
+        if self.metric == "cosine":
+            norm = np.linalg.norm(vec, axis=-1, keepdims=True)
+            vec = vec / np.where(norm == 0, 1, norm)
+        return vec
+
+    def upsert(self, vectors: Iterable, namespace: str = "") -> Dict[str, int]:
+        """Insert or overwrite ``(id, values, metadata)`` vectors (tuples or Pinecone-style dicts)."""
+        records = [_as_record(v) for v in vectors]
+        if not records:
+            return {"upserted_count": 0}
+        matrix = self._prepare([values for _, values, _ in records])
+        with self._lock:
+            ns = self._namespace(namespace, matrix.shape[1])
+            rows = []
+            for vid, _, metadata in records:
+                row = ns.id_rows.get(vid)
+                if row is None:
+                    row = ns.allocate()
+                    ns.id_rows[vid], ns.row_ids[row] = row, vid
+                ns.metadata[row] = metadata
+                ns.live[row] = True
+                rows.append(row)
+            ns.matrix[rows] = matrix
+            if ns.centroids is not None:
+                ns.assignment[rows] = np.argmax(matrix @ ns.centroids.T, axis=1)
+            # Vectors reach the file before the metadata that points at them is committed
+            ns.matrix.flush()
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO vectors (namespace, id, row, metadata) VALUES (?, ?, ?, ?)",
+                [(namespace, vid, row, json.dumps(meta, default=str)) for (vid, _, meta), row in zip(records, rows)],
+            )
+            self._conn.execute("UPDATE namespaces SET rows = ? WHERE name = ?", (ns.rows, namespace))
+            self._conn.commit()
+        return {"upserted_count": len(records)}
+
+    def delete(self, ids: Optional[Sequence[str]] = None, namespace: str = "", delete_all: bool = False) -> Dict:
+        with self._lock:
+            ns = self._namespaces.get(namespace)
+            if ns is None:
+                return {}
+            targets = list(ns.id_rows) if delete_all else [i for i in ids or [] if i in ns.id_rows]
+            for vid in targets:
+                row = ns.id_rows.pop(vid)
+                del ns.row_ids[row]
+                ns.metadata.pop(row, None)
+                ns.live[row] = False
+                ns.assignment[row] = -1
+                ns.free.append(row)
+            self._conn.executemany(
+                "DELETE FROM vectors WHERE namespace = ? AND id = ?", [(namespace, vid) for vid in targets]
+            )
+            self._conn.commit()
+        return {}
+
+    def fetch(self, ids: Sequence[str], namespace: str = "") -> Dict[str, Any]:
+        with self._lock:
+            ns = self._namespaces.get(namespace)
+            found = {}
+            for vid in ids:
+                row = ns.id_rows.get(vid) if ns is not None else None
+                if row is not None:
+                    found[vid] = {"id": vid, "values": ns.matrix[row].tolist(), "metadata": ns.metadata[row]}
+        return {"vectors": found, "namespace": namespace}
+
+    def describe_index_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            namespaces = {name: {"vector_count": ns.count} for name, ns in self._namespaces.items()}
+            dimension = next((ns.dimension for ns in self._namespaces.values()), 0)
+        return {
+            "namespaces": namespaces,
+            "dimension": dimension,
+            "total_vector_count": sum(n["vector_count"] for n in namespaces.values()),
+        }
+
+    def build_index(self, namespace: str = "", nlist: Optional[int] = None, iterations: int = 10, seed: int = 0) -> None:
+        """(Re)train the IVF clusters of a namespace with k-means over its live vectors."""
+        with self._lock:
+            ns = self._namespaces.get(namespace)
+            if ns is None or ns.count == 0:
+                return
+            rows = np.flatnonzero(ns.live[: ns.rows])
+            data = np.asarray(ns.matrix[rows])
+            k = min(nlist or self.nlist or max(int(np.sqrt(len(rows))), 1), len(rows))
+            rng = np.random.default_rng(seed)
+            centroids = data[rng.choice(len(rows), size=k, replace=False)].copy()
+            for _ in range(iterations):
+                assignment = np.argmax(data @ centroids.T, axis=1)
+                for c in range(k):
+                    members = data[assignment == c]
+                    if len(members):
+                        centroids[c] = members.mean(axis=0)
+                if self.metric == "cosine":
+                    centroids = self._prepare(centroids)
+            ns.centroids = centroids
+            ns.assignment[:] = -1
+            ns.assignment[rows] = np.argmax(data @ centroids.T, axis=1)
+            ns.trained_on = len(rows)
+
+    def _candidates(self, ns: _Namespace, namespace: str, query: np.ndarray, exact: bool) -> np.ndarray:
+        use_ivf = self.index_type == "ivf" and not exact and ns.count >= self.ivf_min_rows
+        if not use_ivf:
+            return np.flatnonzero(ns.live[: ns.rows])
+        if ns.centroids is None or ns.count >= 2 * ns.trained_on:
+            self.build_index(namespace)
+        probes = np.argsort(-(ns.centroids @ query))[: self.nprobe]
+        return np.flatnonzero(np.isin(ns.assignment[: ns.rows], probes) & ns.live[: ns.rows])
+
+    def query(
+        self,
+        vector: Sequence[float],
+        top_k: int = 10,
+        namespace: str = "",
+        filter: Optional[Dict[str, Any]] = None,
+        include_metadata: bool = False,
+        include_values: bool = False,
+        exact: bool = False,
+    ) -> Dict[str, Any]:
+        """Return the ``top_k`` best matches as ``{"matches": [{"id", "score", ...}]}``, best first."""
+        query = self._prepare(vector)
+        with self._lock:
+            ns = self._namespaces.get(namespace)
+            if ns is None or ns.count == 0:
+                return {"matches": [], "namespace": namespace}
+            rows = self._candidates(ns, namespace, query, exact)
+            if filter:
+                rows = np.array([r for r in rows if _matches(ns.metadata[r], filter)], dtype=np.int64)
+            if len(rows) == 0:
+                return {"matches": [], "namespace": namespace}
+            scores = np.asarray(ns.matrix[rows]) @ query
+            k = min(top_k, len(rows))
+            best = np.argpartition(-scores, k - 1)[:k]
+            best = best[np.argsort(-scores[best])]
+            matches = []
+            for i in best:
+                row = int(rows[i])
+                match = {"id": ns.row_ids[row], "score": float(scores[i])}
+                if include_metadata:
+                    match["metadata"] = ns.metadata[row]
+                if include_values:
+                    match["values"] = ns.matrix[row].tolist()
+                matches.append(match)
+        return {"matches": matches, "namespace": namespace}
+
+    def close(self) -> None:
+        with self._lock:
+            for ns in self._namespaces.values():
+                ns.matrix.flush()
+            self._conn.close()
+
+
+class IndexRetriever(BaseRetriever):
+    """LangChain retriever over any Pinecone-compatible index (including :class:`LocalVectorStore`)."""
+
+    index: Any
+    embeddings: Any
+    namespace: str = ""
+    top_k: int = 4
+    text_key: str = "text"
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        result = self.index.query(
+            vector=self.embeddings.embed_query(query),
+            top_k=self.top_k,
+            namespace=self.namespace,
+            include_metadata=True,
+        )
+        documents = []
+        for match in result["matches"]:
+            metadata = dict(match.get("metadata") or {})
+            text = metadata.pop(self.text_key, "")
+            documents.append(Document(page_content=text, metadata={**metadata, "id": match["id"], "score": match["score"]}))
+        return documents
+
+
+def vector_store_from_env() -> Optional[LocalVectorStore]:
+    """Open the local store at ``LOCAL_VECTOR_STORE_PATH`` when ``VECTOR_STORE=local``; Pinecone is used otherwise."""
+    if os.getenv("VECTOR_STORE", "pinecone").lower() != "local":
+        return None
+    return LocalVectorStore(os.getenv("LOCAL_VECTOR_STORE_PATH", ".ingest/vectors"))
@@ -0,0 +1,175 @@
+"""
+Structured, sampled SQL query log.
+
+A :class:`QueryLog` hooks SQLAlchemy cursor events on an engine and aggregates per-statement
+counters (calls, rows, total/max time, p50/p95 from a bounded reservoir). Individual statements
+are logged as JSON only when sampled (``QUERY_LOG_SAMPLE_RATE``) or slower than
+``QUERY_LOG_SLOW_MS``. Nothing is hooked unless ``QUERY_LOG`` is enabled, so the default cost
+is zero.
+"""
+import os
+import re
+import json
+import time
+import random
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import event
+
+logger = logging.getLogger("gsg.sql")
+
+# Expanded IN lists and multi-row VALUES would otherwise make every batch size its own statement
+_IN_LIST = re.compile(r"IN \((?:[^()]|\([^()]*\))*\)", re.IGNORECASE)
+_VALUES_ROWS = re.compile(r"VALUES \([^()]*\)(?:\s*,\s*\([^()]*\))+", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+_OTHER = "<other statements>"
+
+
+def normalize_statement(statement: str) -> str:
+    """Collapse whitespace, IN lists and multi-row VALUES so similar statements share counters."""
+    statement = _WHITESPACE.sub(" ", statement).strip()
+    statement = _IN_LIST.sub("IN (...)", statement)
+    return _VALUES_ROWS.sub("VALUES (...), ...", statement)
+
+
+@dataclass
+class StatementStats:
+    calls: int = 0
+    rows: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+    samples: List[float] = field(default_factory=list)
+
+    def record(self, ms: float, rows: int, reservoir: int) -> None:
+        self.calls += 1
+        self.rows += rows
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        # Reservoir sampling keeps the percentile estimate unbiased with bounded memory
+        if len(self.samples) < reservoir:
+            self.samples.append(ms)
+        else:
+            i = random.randrange(self.calls)
+            if i < reservoir:
+                self.samples[i] = ms
+
+    def percentile(self, p: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(int(p / 100 * len(ordered)), len(ordered) - 1)]
+
+
+class QueryLog:
+    """
+    Per-statement timing counters for one or more engines.
+
+    ``sample_rate`` (0..1) is the share of statements logged individually; statements taking at
+    least ``slow_ms`` are always logged as warnings. At most ``max_statements`` distinct
+    statements are tracked; the rest are counted together.
+    """
+
+    def __init__(
+        self,
+        sample_rate: Optional[float] = None,
+        slow_ms: Optional[float] = None,
+        reservoir: int = 1000,
+        max_statements: int = 1000,
+    ):
+        self.sample_rate = sample_rate if sample_rate is not None else float(os.getenv("QUERY_LOG_SAMPLE_RATE", "0"))
+        self.slow_ms = slow_ms if slow_ms is not None else float(os.getenv("QUERY_LOG_SLOW_MS", "500"))
+        self.reservoir = reservoir
+        self.max_statements = max_statements
+        self.started_at = time.time()
+        self._stats: Dict[str, StatementStats] = {}
+        self._lock = threading.Lock()
+        self._engines: list = []
+
+    def attach(self, engine) -> "QueryLog":
+        """Start timing statements on ``engine`` (an async engine's ``sync_engine`` also works)."""
+        engine = getattr(engine, "sync_engine", engine)
+        event.listen(engine, "before_cursor_execute", self._before)
+        event.listen(engine, "after_cursor_execute", self._after)
+        event.listen(engine, "handle_error", self._error)
+        self._engines.append(engine)
+        return self
+
+    def detach(self) -> None:
+        for engine in self._engines:
+            event.remove(engine, "before_cursor_execute", self._before)
+            event.remove(engine, "after_cursor_execute", self._after)
+            event.remove(engine, "handle_error", self._error)
+        self._engines = []
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        conn.info.setdefault("query_log_start", []).append(time.perf_counter())
+
+    def _error(self, exception_context) -> None:
+        # A failed statement never reaches _after; drop its start time so the stack stays balanced
+        conn = exception_context.connection
+        starts = conn.info.get("query_log_start") if conn is not None else None
+        if starts:
+            starts.pop()
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        started = conn.info["query_log_start"].pop()
+        ms = (time.perf_counter() - started) * 1000
+        rows = max(getattr(cursor, "rowcount", 0) or 0, 0)
+        key = normalize_statement(statement)
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                if len(self._stats) >= self.max_statements:
+                    key = _OTHER
+                stats = self._stats.setdefault(key, StatementStats())
+            stats.record(ms, rows, self.reservoir)
+        slow = ms >= self.slow_ms
+        if slow or (self.sample_rate and random.random() < self.sample_rate):
+            logger.log(
+                logging.WARNING if slow else logging.INFO,
+                json.dumps({
+                    "statement": key[:1000],
+                    "ms": round(ms, 3),
+                    "rows": rows,
+                    "executemany": bool(executemany),
+                    "slow": slow,
+                }),
+            )
+
+    @property
+    def total_calls(self) -> int:
+        with self._lock:
+            return sum(s.calls for s in self._stats.values())
+
+    def snapshot(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Counters per statement, most total time first."""
+        with self._lock:
+            items = sorted(self._stats.items(), key=lambda kv: kv[1].total_ms, reverse=True)
+            return [
+                {
+                    "statement": statement,
+                    "calls": s.calls,
+                    "rows": s.rows,
+                    "total_ms": round(s.total_ms, 3),
+                    "mean_ms": round(s.total_ms / s.calls, 3),
+                    "p50_ms": round(s.percentile(50), 3),
+                    "p95_ms": round(s.percentile(95), 3),
+                    "max_ms": round(s.max_ms, 3),
+                }
+                for statement, s in items[:limit]
+            ]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+            self.started_at = time.time()
+
+
+def query_log_from_env(engine) -> Optional[QueryLog]:
+    """Attach a :class:`QueryLog` to ``engine`` if ``QUERY_LOG`` is enabled; otherwise return ``None``."""
+    if os.getenv("QUERY_LOG", "").lower() not in ("1", "true", "yes"):
+        return None
+    return QueryLog().attach(engine)
@@ -1,8 +1,14 @@
+import asyncio
+import json
+import sys
+from unittest.mock import MagicMock
+
 import pytest
 from datetime import datetime
 from fastapi.testclient import TestClient
 from api.main import create_app
 from api.models import LogMessage
+from api.routers.logs import log_stream as real_log_stream
 
 # Stub log_stream to yield predictable messages
 def fake_log_stream(job_id: str):
@@ -40,4 +46,62 @@ def test_websocket_logs_sequence():
         assert msg4["status"] == "completed"
         # No more messages
         with pytest.raises(Exception):
-            ws.receive_json(timeout=1) 
\ No newline at end of file
+            ws.receive_json(timeout=1) 
+
+
+def test_log_stream_records_jobs_and_dead_letters_failures(tmp_path, monkeypatch):
+    import api.routers.logs as logs_module
+    from processors.jobs import DONE, FAILED, PENDING, JobLedger
+
+    jobs_path = tmp_path / "jobs.sqlite3"
+    monkeypatch.setenv("INGEST_JOBS_PATH", str(jobs_path))
+    monkeypatch.delenv("INGEST_PIPELINED", raising=False)
+    items = [{"url": f"https://example.com/p{n}", "item_type": "page", "payload": {}} for n in range(3)]
+    lines = "".join(json.dumps(i) + "\n" for i in items)
+
+    spawn = asyncio.create_subprocess_exec
+
+    async def fake_crawl(*args, **kwargs):
+        # Stands in for the scrapy subprocess: prints the exported items
+        return await spawn(sys.executable, "-c", f"import sys; sys.stdout.write({lines!r})", **kwargs)
+
+    queued = []
+
+    def ingest(item, on_planned=None):
+        if item.url.endswith("p1"):
+            raise RuntimeError("fetch failed")
+        vids = [f"{item.url}::0", f"{item.url}::1"]
+        on_planned(vids)
+        queued.extend((vid, [0.0], {}) for vid in vids)
+
+    def flush(vector_ids=None):
+        # Nothing is done before its vectors are upserted; p2's batch fails
+        assert JobLedger(str(jobs_path)).summary("crawl:job1") == {FAILED: 1, PENDING: 2}
+        for listener in list(worker.upsert_listeners):
+            listener(queued[:2], None)
+            listener(queued[2:], RuntimeError("upsert failed"))
+
+    worker = MagicMock()
+    worker.upsert_listeners = []
+    worker.ingest_item.side_effect = ingest
+    worker.flush.side_effect = flush
+    monkeypatch.setattr(logs_module.asyncio, "create_subprocess_exec", fake_crawl)
+    monkeypatch.setattr(logs_module, "get_ingest_worker", lambda: worker)
+
+    async def run():
+        return [(m.status, m.url) async for m in real_log_stream("job1", start_url="https://example.com")]
+
+    messages = [m for m in asyncio.run(run()) if m[0] in ("ingested", "error")]
+    assert messages == [
+        ("error", "https://example.com/p1"),
+        ("ingested", "https://example.com/p0"),
+        ("error", "https://example.com/p2"),
+    ]
+    assert worker.upsert_listeners == []
+    jobs = JobLedger(str(jobs_path))
+    assert jobs.summary("crawl:job1") == {DONE: 1, FAILED: 2}
+    dead = [json.loads(line) for line in open(tmp_path / "crawl-job1.dead.jl", encoding="utf-8")]
+    assert sorted((d["url"], d["error"]) for d in dead) == [
+        ("https://example.com/p1", "RuntimeError: fetch failed"),
+        ("https://example.com/p2", "RuntimeError: upsert failed"),
+    ]
@@ -0,0 +1,80 @@
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from api import pagination
+from api.main import app
+from shared.db import Base, Document, Product, SessionLocal, engine
+
+client = TestClient(app)
+
+PREFIX = "PAGE-"
+
+
+@pytest.fixture(scope="module")
+def catalog():
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        for n in range(25):
+            product = Product(model=f"{PREFIX}{n}", name=f"Product {n}")
+            product.documents = [Document(url=f"{PREFIX}{n}.pdf")]
+            db.add(product)
+        db.commit()
+        yield
+    finally:
+        ids = [pid for (pid,) in db.query(Product.id).filter(Product.model.like(f"{PREFIX}%"))]
+        db.query(Document).filter(Document.product_id.in_(ids)).delete(synchronize_session=False)
+        db.query(Product).filter(Product.id.in_(ids)).delete(synchronize_session=False)
+        db.commit()
+        db.close()
+
+
+def _walk(path, limit):
+    ids, params = [], {"limit": limit, "total": "none"}
+    while True:
+        data = client.get(path, params=params).json()
+        assert data["total"] is None
+        ids += [item["id"] for item in data["items"]]
+        if data["next_cursor"] is None:
+            return ids
+        params["cursor"] = data["next_cursor"]
+
+
+@pytest.mark.parametrize("path", ["/products/", "/api/admin/products", "/api/admin/documents"])
+def test_cursor_walk_matches_offset_listing(catalog, path):
+    first = client.get(path, params={"limit": 100}).json()
+    assert first["total"] == len(first["items"]) and first["total_estimated"] is False
+
+    ids = _walk(path, limit=7)
+    assert ids == sorted(ids) == [item["id"] for item in first["items"]]
+
+    after = client.get(path, params={"limit": 3, "after_id": ids[4], "total": "none"}).json()
+    assert [item["id"] for item in after["items"]] == ids[5:8]
+
+
+def test_offset_paging_still_reports_total(catalog):
+    data = client.get("/products/", params={"offset": 5, "limit": 5}).json()
+    everything = client.get("/products/", params={"limit": 100}).json()
+    assert data["total"] == everything["total"]
+    assert [p["id"] for p in data["items"]] == [p["id"] for p in everything["items"][5:10]]
+
+
+def test_estimated_total(catalog, monkeypatch):
+    with engine.begin() as conn:
+        conn.exec_driver_sql("ANALYZE products")
+    data = client.get("/products/", params={"limit": 1, "total": "estimate"}).json()
+    assert data["total_estimated"] is True and data["total"] >= 25
+
+    # auto only switches to the estimate once the table is large
+    monkeypatch.setattr(pagination, "EXACT_COUNT_THRESHOLD", 10**9)
+    assert client.get("/products/", params={"limit": 1}).json()["total_estimated"] is False
+    monkeypatch.setattr(pagination, "EXACT_COUNT_THRESHOLD", 0)
+    assert client.get("/products/", params={"limit": 1}).json()["total_estimated"] is True
+
+
+def test_cursor_roundtrip_and_validation():
+    assert pagination.decode_cursor(pagination.encode_cursor(12345)) == 12345
+    with pytest.raises(HTTPException):
+        pagination.decode_cursor("not-a-cursor")
+    assert client.get("/products/", params={"cursor": "%%%"}).status_code == 400
@@ -0,0 +1,58 @@
+"""Regression benchmark: listing endpoints must issue a fixed number of queries per page."""
+import pytest
+from fastapi.testclient import TestClient
+
+from api.main import app
+from shared.db import Base, Document, Image, Product, SessionLocal, engine
+from shared.querylog import QueryLog
+
+client = TestClient(app)
+
+PREFIX = "QCOUNT-"
+
+
+@pytest.fixture(scope="module")
+def catalog():
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        for n in range(60):
+            product = Product(model=f"{PREFIX}{n}", name=f"Product {n}")
+            product.images = [Image(url=f"{PREFIX}{n}-{i}.jpg") for i in range(2)]
+            product.documents = [Document(url=f"{PREFIX}{n}.pdf")]
+            db.add(product)
+        db.commit()
+        yield
+    finally:
+        ids = [pid for (pid,) in db.query(Product.id).filter(Product.model.like(f"{PREFIX}%"))]
+        db.query(Image).filter(Image.product_id.in_(ids)).delete(synchronize_session=False)
+        db.query(Document).filter(Document.product_id.in_(ids)).delete(synchronize_session=False)
+        db.query(Product).filter(Product.id.in_(ids)).delete(synchronize_session=False)
+        db.commit()
+        db.close()
+
+
+def _queries(path, **params):
+    log = QueryLog(sample_rate=0).attach(engine)
+    try:
+        response = client.get(path, params=params)
+    finally:
+        log.detach()
+    assert response.status_code == 200
+    return log.total_calls, response.json()
+
+
+@pytest.mark.parametrize("path", ["/products/", "/api/admin/products"])
+def test_query_count_is_independent_of_page_size(catalog, path):
+    small, small_page = _queries(path, limit=5)
+    large, large_page = _queries(path, limit=50)
+    assert len(large_page["items"]) == 50
+    assert small == large
+    assert all(len(item["images"]) == 2 for item in large_page["items"] if item["model"].startswith(PREFIX))
+
+
+def test_listing_shape_includes_relationships(catalog):
+    _, page = _queries("/products/", limit=100)
+    item = next(i for i in page["items"] if i["model"] == f"{PREFIX}0")
+    assert sorted(item["images"]) == [f"{PREFIX}0-0.jpg", f"{PREFIX}0-1.jpg"]
+    assert item["documents"] == [f"{PREFIX}0.pdf"]
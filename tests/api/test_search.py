@@ -0,0 +1,90 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from api.main import app
+from shared.db import Base, Document, Image, Product, SessionLocal, engine
+from shared.querylog import QueryLog
+
+client = TestClient(app)
+
+PREFIX = "SRCH-"
+CATALOG = [
+    ("GXP2170", "Enterprise HD IP Phone", "IP Phones", "Grandstream", 180.0),
+    ("GXP2160", "Enterprise IP Phone", "IP Phones", "Grandstream", 120.0),
+    ("HT801", "Analog Telephone Adapter", "ATA", "Grandstream", 40.0),
+    ("T54W", "Prime Business Phone", "IP Phones", "Yealink", 210.0),
+    ("W60B", "DECT IP Base Station", "DECT", "Yealink", 90.0),
+]
+
+
+@pytest.fixture(scope="module")
+def catalog():
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        for model, name, category, brand, price in CATALOG:
+            product = Product(model=f"{PREFIX}{model}", name=name, category=category, brand=brand, price=price)
+            product.images = [Image(url=f"{model}.jpg")]
+            product.documents = [Document(url=f"{model}.pdf")]
+            db.add(product)
+        db.commit()
+        yield
+    finally:
+        ids = [pid for (pid,) in db.query(Product.id).filter(Product.model.like(f"{PREFIX}%"))]
+        db.query(Image).filter(Image.product_id.in_(ids)).delete(synchronize_session=False)
+        db.query(Document).filter(Document.product_id.in_(ids)).delete(synchronize_session=False)
+        db.query(Product).filter(Product.id.in_(ids)).delete(synchronize_session=False)
+        db.commit()
+        db.close()
+
+
+def _search(**params):
+    response = client.get("/products/search", params=params)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_text_search_returns_product_shape(catalog):
+    data = _search(q="enterprise phone")
+    assert data["total"] == 2
+    assert {p["model"] for p in data["items"]} == {f"{PREFIX}GXP2170", f"{PREFIX}GXP2160"}
+    item = data["items"][0]
+    assert item["images"] == [item["model"][len(PREFIX):] + ".jpg"]
+    assert item["documents"] == [item["model"][len(PREFIX):] + ".pdf"]
+    assert item["created_at"]
+
+
+def test_facets_and_filters(catalog):
+    data = _search(q="phone", brand="Yealink")
+    assert [p["model"] for p in data["items"]] == [f"{PREFIX}T54W"]
+    # Each facet ignores its own filter so alternatives stay visible
+    assert data["facets"]["brand"] == [{"value": "Grandstream", "count": 2}, {"value": "Yealink", "count": 1}]
+    assert data["facets"]["category"] == [{"value": "IP Phones", "count": 1}]
+
+    data = _search(min_price=50, max_price=150, limit=1)
+    assert data["total"] == 2 and len(data["items"]) == 1
+    assert _search(q="nothing-matches-this")["items"] == []
+
+
+def test_search_is_one_query(catalog):
+    log = QueryLog(sample_rate=0).attach(engine)
+    try:
+        _search(q="ip", category=["IP Phones", "DECT"])
+    finally:
+        log.detach()
+    assert log.total_calls == 1
+
+
+def test_search_uses_gin_index(catalog):
+    with engine.connect() as conn:
+        conn.execute(text("SET LOCAL enable_seqscan = off"))
+        plan = "\n".join(conn.execute(text(
+            "EXPLAIN SELECT id FROM products WHERE search_vector @@ websearch_to_tsquery('simple', 'phone')"
+        )).scalars())
+        conn.rollback()
+    assert "ix_products_search_vector" in plan
+
+
+def test_search_route_is_not_shadowed_by_product_id():
+    assert client.get("/products/search", params={"limit": 1}).status_code == 200
@@ -14,3 +14,13 @@ def _patched_testclient_init(self, *args, **kwargs):
     kwargs.pop('app', None)
     return _orig_testclient_init(self, *args, **kwargs)
 _TestClient.__init__ = _patched_testclient_init
+
+import pytest
+from shared.db import product_id_cache
+
+
+@pytest.fixture(autouse=True)
+def _clear_product_id_cache():
+    # Tests recreate tables, so cached product ids must not leak between them
+    product_id_cache.invalidate()
+    yield
@@ -15,3 +15,38 @@ def test_title_extraction():
     resp = type("FakeResponse", (), {"text": SAMPLE_HTML, "url": "https://grandstream.com/x"})()
     items = GrandstreamExtractor().extract(resp)
     assert items[0].payload["title"] == "GXV3370 High-End IP Video Phone"
+
+
+def test_matches_by_host_not_substring():
+    assert GrandstreamExtractor.matches("https://www.grandstream.com/products")
+    assert not GrandstreamExtractor.matches("https://example.com/?ref=grandstream.com")
+    assert not GrandstreamExtractor.matches("https://notgrandstream.com/")
+
+
+def test_extractor_index_matches_linear_scan():
+    from crawler.extractors import ExtractorIndex, extractor_for, get_extractors
+    from crawler.extractors.base import BaseExtractor
+
+    urls = [
+        "https://documentation.grandstream.com/article/gxp2170",
+        "https://www.grandstream.com/products",
+        "https://smallbusinessphones.ca/networking-solutions/routers.html",
+        "https://example.com/page",
+        "/relative/path",
+    ]
+    for url in urls:
+        expected = next((e for e in get_extractors() if e.matches(url)), None)
+        assert extractor_for(url) is expected
+
+    class PatternExtractor(BaseExtractor):
+        @classmethod
+        def matches(cls, url):
+            return url.endswith(".aspx")
+
+        def extract(self, response):
+            return []
+
+    index = ExtractorIndex([PatternExtractor, GrandstreamExtractor])
+    assert index.lookup("https://grandstream.com/a.aspx") is PatternExtractor
+    assert index.lookup("https://grandstream.com/a.html") is GrandstreamExtractor
+    assert index.lookup("https://example.com/a.html") is None
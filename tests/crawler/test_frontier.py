@@ -0,0 +1,109 @@
+import pytest
+from scrapy import Request
+from scrapy.http import Response
+from scrapy.utils.test import get_crawler
+
+from crawler.frontier import BloomDupeFilter, BloomFilter, canonicalize_url, main
+
+
+@pytest.mark.parametrize("variant", [
+    "https://Documentation.Grandstream.com/article-categories/gwn/",
+    "https://documentation.grandstream.com:443/article-categories/gwn#top",
+    "https://documentation.grandstream.com/article-categories//gwn?utm_source=x&utm_medium=y",
+    "https://documentation.grandstream.com/article-categories/gwn?fbclid=abc",
+])
+def test_canonical_variants_collapse(variant):
+    assert canonicalize_url(variant) == "https://documentation.grandstream.com/article-categories/gwn"
+
+
+def test_canonical_keeps_meaningful_query():
+    assert canonicalize_url("http://x.com/?b=2&a=1&gclid=z") == "http://x.com/?a=1&b=2"
+    assert canonicalize_url("http://x.com/p?page=2") != canonicalize_url("http://x.com/p?page=3")
+    assert canonicalize_url("http://x.com:8080/p?session=1", strip_params=["session"]) == "http://x.com:8080/p"
+
+
+def test_bloom_filter_false_positive_rate():
+    bloom = BloomFilter(capacity=20_000, error_rate=0.01)
+    added = sum(bloom.add(f"https://x.com/{n}") for n in range(20_000))
+    assert added > 20_000 * 0.99  # a few late inserts collide with earlier keys
+    assert not bloom.add("https://x.com/5")
+    false_positives = sum(f"https://y.com/{n}" in bloom for n in range(20_000))
+    assert false_positives < 20_000 * 0.02
+    assert abs(bloom.estimated_count() - 20_000) < 500
+    # Size depends on capacity, not on how much is added
+    assert bloom.nbytes < 20_000 * 10 / 8 + 64
+
+
+def test_persistence_and_merge(tmp_path, capsys):
+    a, b = str(tmp_path / "a.bloom"), str(tmp_path / "b.bloom")
+    with BloomFilter(a, capacity=1000) as bloom:
+        bloom.add("https://x.com/1")
+    with BloomFilter(b, capacity=1000) as bloom:
+        bloom.add("https://x.com/2")
+    with BloomFilter(a) as bloom:
+        assert "https://x.com/1" in bloom and "https://x.com/2" not in bloom
+        assert bloom.count == 1
+
+    merged = str(tmp_path / "merged.bloom")
+    main(["merge", merged, a, b])
+    with BloomFilter(merged) as bloom:
+        assert "https://x.com/1" in bloom and "https://x.com/2" in bloom
+        assert bloom.count == 2
+    with pytest.raises(ValueError):
+        BloomFilter(a).merge(BloomFilter(capacity=5000))
+
+
+def test_dupe_filter_skips_variants_across_runs(tmp_path):
+    path = str(tmp_path / "seen.bloom")
+    dupes = BloomDupeFilter(path=path, capacity=1000)
+    fetched = Request("https://x.com/a/?utm_campaign=spring")
+    assert not dupes.request_seen(fetched)
+    assert dupes.request_seen(Request("https://x.com/a#reviews"))
+    assert not dupes.request_seen(Request("https://x.com/a", method="POST"))
+    dupes.response_received(Response(fetched.url, status=200), fetched)
+    dupes.close("finished")
+
+    again = BloomDupeFilter(path=path)
+    assert again.request_seen(Request("https://X.com/a"))
+    assert not again.request_seen(Request("https://x.com/b"))
+    again.close("finished")
+
+
+def test_dupe_filter_persists_only_successful_fetches(tmp_path):
+    path = str(tmp_path / "seen.bloom")
+    dupes = BloomDupeFilter(path=path, capacity=1000)
+    queued, failed = Request("https://x.com/queued"), Request("https://x.com/failed")
+    assert not dupes.request_seen(queued)
+    assert not dupes.request_seen(failed)
+    dupes.response_received(Response(failed.url, status=503), failed)
+    # Interrupted before the queued request was downloaded
+    dupes.close("shutdown")
+
+    again = BloomDupeFilter(path=path)
+    assert not again.request_seen(Request("https://x.com/queued"))
+    assert not again.request_seen(Request("https://x.com/failed"))
+    again.close("finished")
+
+
+def test_dupe_filter_ignores_frontier_path_in_incremental_crawls(tmp_path):
+    from crawler.spiders.seed_spider import SeedSpider
+
+    crawler = get_crawler(SeedSpider, {"FRONTIER_PATH": str(tmp_path / "seen.bloom"), "INCREMENTAL_CRAWL": True})
+    crawler.spider = SeedSpider()
+    dupes = BloomDupeFilter.from_crawler(crawler)
+    assert dupes.crawled is None
+    dupes.close("finished")
+    assert not (tmp_path / "seen.bloom").exists()
+
+
+def test_dupe_filter_follows_redirects_to_the_same_canonical_url():
+    dupes = BloomDupeFilter()
+    assert not dupes.request_seen(Request("https://x.com/foo"))
+    # /foo answered 301 -> /foo/, which shares its key
+    redirected = Request("https://x.com/foo/", meta={"redirect_urls": ["https://x.com/foo"]})
+    assert not dupes.request_seen(redirected)
+    assert dupes.request_seen(Request("https://x.com/foo/"))
+    # A redirect to a page this crawl already scheduled is still a duplicate
+    assert not dupes.request_seen(Request("https://x.com/bar"))
+    assert dupes.request_seen(Request("https://x.com/bar", meta={"redirect_urls": ["https://x.com/old-bar"]}))
+    dupes.close("finished")
@@ -0,0 +1,62 @@
+"""The Grandstream extractor must produce exactly the recorded output on reference pages."""
+import json
+from pathlib import Path
+
+import pytest
+from scrapy.http import HtmlResponse
+
+from benchmarks.reference import reference_pages
+from crawler.extractors.base import selector_for
+from crawler.extractors.grandstream import GrandstreamExtractor
+
+FIXTURE = Path(__file__).parent / "fixtures" / "grandstream_reference.json"
+
+# Edge cases beyond html_reference; the fixture holds their output from the BeautifulSoup version
+EXTRA_PAGES = {
+    "no_title": "<html><body><p>No title here</p></body></html>",
+    "empty_title": "<html><head><title></title></head><body></body></html>",
+    "entity_title": "<html><head><title>\n  Phones &amp; ATAs – GXP  </title></head></html>",
+    "nested_article_text": (
+        '<ul class="hkb-category__articlelist"><li><a href="/kb/a/">GXP <b>2170</b>\n  Guide</a></li>'
+        '<li><a>No link</a></li></ul>'
+    ),
+    "manual_icon_nested": (
+        '<a href="https://x.com/files/Quick-Start-Guide.pdf" download><img src="/i.png"></a>'
+        '<a href="https://x.com/files/other.pdf" download><span><img src="/j.png"></span></a>'
+    ),
+    "category_partial": (
+        '<a class="hkb-category__link" href="https://x.com/article-categories/gxp-series/">'
+        '<h2 class="hkb-category__title"> GXP  Series </h2></a>'
+        '<a class="hkb-category__link" href="https://x.com/phones/">'
+        '<div class="hkb-category__iconwrap"><img alt="no src"></div></a>'
+    ),
+}
+
+
+def _pages():
+    pages = {name: (page["url"], page["html"]) for name, page in reference_pages().items()}
+    pages.update((name, ("https://www.grandstream.com/page", html)) for name, html in EXTRA_PAGES.items())
+    return pages
+
+
+def _extract(url, html):
+    response = HtmlResponse(url=url, body=html.encode("utf-8"), encoding="utf-8")
+    return [
+        {"url": item.url, "item_type": item.item_type.value, "payload": item.payload}
+        for item in GrandstreamExtractor().extract(response)
+    ]
+
+
+@pytest.mark.parametrize("name", sorted(_pages()))
+def test_output_matches_recorded_reference(name):
+    expected = json.loads(FIXTURE.read_text(encoding="utf-8"))[name]
+    assert json.dumps(_extract(*_pages()[name]), ensure_ascii=False) == json.dumps(expected, ensure_ascii=False)
+
+
+def test_selector_is_parsed_once_per_response():
+    url, html = _pages()["level2"]
+    response = HtmlResponse(url=url, body=html.encode("utf-8"), encoding="utf-8")
+    assert selector_for(response) is response.selector
+
+    fake = type("FakeResponse", (), {"text": html, "url": url})()
+    assert selector_for(fake) is selector_for(fake)
@@ -60,4 +60,28 @@ def test_guides_extractor_fallback():
     assert only.url == url
     assert only.payload["title"] == "Only Title"
     # Fallback payload does not include 'url' key aside from the item.url
-    assert "url" not in only.payload or only.payload.get("url") == url 
\ No newline at end of file
+    assert "url" not in only.payload or only.payload.get("url") == url 
+
+def test_guides_extractor_quotes_and_repeated_links():
+    html = '''
+    <html><body>
+      <div class="toctree-wrapper">
+        <a href='say-"hi".html'>Quoted</a>
+        <a href="dup.html">First</a>
+        <a href="dup.html">Second</a>
+        <a href="icon.html"><img src="i.png"></a>
+      </div>
+    </body></html>
+    '''
+    url = "https://documentation.grandstream.com/index.html"
+    response = TextResponse(url=url, body=html.encode('utf-8'), encoding='utf-8')
+
+    items = GuidesExtractor().extract(response)
+
+    assert [i.payload["title"] for i in items] == [
+        "Quoted",
+        "First",
+        "First",
+        "https://documentation.grandstream.com/icon.html",
+    ]
+    assert items[0].url == 'https://documentation.grandstream.com/say-"hi".html'
@@ -0,0 +1,176 @@
+import pytest
+from scrapy import Request
+from scrapy.exceptions import NotConfigured
+from scrapy.http import HtmlResponse, Response
+from scrapy.http.request import NO_CALLBACK
+from scrapy.statscollectors import MemoryStatsCollector
+from scrapy.utils.test import get_crawler
+
+from crawler.incremental import ConditionalGetMiddleware, IncrementalSpiderMiddleware, ValidatorStore
+from crawler.items import DataItem
+from crawler.spiders.seed_spider import SeedSpider
+
+URL = "https://documentation.grandstream.com/guides/"
+# What Scrapy builds for application/pdf: a plain Response without a text selector
+TextlessResponse = Response
+BODY = (
+    b'<html><head><title>Guides</title></head><body><div class="toctree-wrapper">'
+    b'<a href="https://documentation.grandstream.com/guides/gwn/">GWN</a></div>'
+    b'<a href="https://documentation.grandstream.com/manual.pdf">Manual</a></body></html>'
+)
+
+
+@pytest.fixture
+def spider():
+    return SeedSpider()
+
+
+@pytest.fixture
+def middleware(tmp_path, spider):
+    crawler = get_crawler(SeedSpider)
+    stats = MemoryStatsCollector(crawler)
+    mw = ConditionalGetMiddleware(ValidatorStore(str(tmp_path / "validators.sqlite3")), stats)
+    yield mw
+    mw.spider_closed(spider)
+    mw.store.close()
+
+
+def fetch(mw, spider, status=200, body=BODY, headers=None, url=URL, response_cls=HtmlResponse, item_failed=False,
+          meta=None):
+    """
+    Run one request through the downloader middleware, the spider and the spider middleware,
+    then report every item as scraped by the pipelines (or failed with ``item_failed``).
+    """
+    request = Request(url, callback=spider.parse, meta=meta)
+    mw.process_request(request, spider)
+    if status == 304:
+        response = Response(url, status=304, headers=headers, request=request)
+    else:
+        response = response_cls(url, status=status, body=body, headers=headers, request=request)
+    response = mw.process_response(request, response, spider)
+    committer = IncrementalSpiderMiddleware(mw.store, mw.stats)
+    results = list(committer.process_spider_output(response, spider.parse(response), spider))
+    for result in results:
+        if isinstance(result, DataItem):
+            if item_failed:
+                committer.item_error(result, response, spider, failure=None)
+            else:
+                committer.item_done(result, response, spider)
+    return request, results
+
+
+def test_first_fetch_extracts_and_stores_validators(middleware, spider):
+    request, results = fetch(middleware, spider, headers={"ETag": '"v1"'})
+    assert "If-None-Match" not in request.headers
+    assert any(isinstance(r, DataItem) for r in results)
+    assert middleware.stats.get_value("incremental/new") == 1
+    stored = middleware.store.get(URL.rstrip("/"))
+    assert stored.etag == '"v1"' and stored.length == len(BODY)
+
+
+def test_not_modified_follows_stored_links_without_items(middleware, spider):
+    fetch(middleware, spider, headers={"ETag": '"v1"', "Last-Modified": "Tue, 01 Sep 2026 00:00:00 GMT"})
+    request, results = fetch(middleware, spider, status=304)
+    assert request.headers["If-None-Match"] == b'"v1"'
+    assert request.headers["If-Modified-Since"] == b"Tue, 01 Sep 2026 00:00:00 GMT"
+    assert 304 in request.meta["handle_httpstatus_list"]
+    assert not any(isinstance(r, DataItem) for r in results)
+    assert [r.url for r in results] == ["https://documentation.grandstream.com/guides/gwn/"]
+    assert middleware.stats.get_value("incremental/not_modified") == 1
+    assert middleware.stats.get_value("incremental/bytes_saved") == len(BODY)
+
+
+def test_unchanged_hash_skips_extraction(middleware, spider):
+    # No validators from the server: only the content hash can tell the page is unchanged
+    fetch(middleware, spider)
+    request, results = fetch(middleware, spider)
+    assert "If-None-Match" not in request.headers
+    assert request.meta["incremental_unchanged"]
+    assert not any(isinstance(r, DataItem) for r in results)
+    assert len(results) == 1
+    assert middleware.stats.get_value("incremental/unchanged") == 1
+
+
+def test_changed_page_is_extracted_again(middleware, spider):
+    fetch(middleware, spider, headers={"ETag": '"v1"'})
+    _, results = fetch(middleware, spider, body=BODY.replace(b"GWN", b"GWN series"), headers={"ETag": '"v2"'})
+    assert any(isinstance(r, DataItem) for r in results)
+    assert middleware.stats.get_value("incremental/changed") == 1
+    assert middleware.store.get(URL.rstrip("/")).etag == '"v2"'
+
+
+def test_media_requests_are_not_conditional(middleware, spider):
+    fetch(middleware, spider, headers={"ETag": '"v1"'})
+    request = Request(URL, callback=NO_CALLBACK)
+    middleware.process_request(request, spider)
+    assert "If-None-Match" not in request.headers
+
+
+def test_store_persists_across_crawls(tmp_path, spider):
+    path = str(tmp_path / "validators.sqlite3")
+    first = ConditionalGetMiddleware(ValidatorStore(path))
+    fetch(first, spider, headers={"ETag": '"v1"'})
+    first.store.close()
+    second = ConditionalGetMiddleware(ValidatorStore(path))
+    request, _ = fetch(second, spider, status=304)
+    assert request.headers["If-None-Match"] == b'"v1"'
+    assert len(second.store) == 1
+    second.store.close()
+
+
+def test_disabled_by_default(tmp_path):
+    crawler = get_crawler(SeedSpider, {"INCREMENTAL_STORE_PATH": str(tmp_path / "v.sqlite3")})
+    crawler.spider = SeedSpider()
+    with pytest.raises(NotConfigured):
+        ConditionalGetMiddleware.from_crawler(crawler)
+    crawler.spider = SeedSpider(incremental="1")
+    middleware = ConditionalGetMiddleware.from_crawler(crawler)
+    assert isinstance(middleware, ConditionalGetMiddleware)
+    # Both middlewares share the crawler's store
+    assert IncrementalSpiderMiddleware.from_crawler(crawler).store is middleware.store
+    middleware.store.close()
+
+
+def test_validators_wait_for_the_pipelines(middleware, spider):
+    request = Request(URL, callback=spider.parse)
+    response = middleware.process_response(
+        request, HtmlResponse(URL, body=BODY, headers={"ETag": '"v1"'}, request=request), spider
+    )
+    committer = IncrementalSpiderMiddleware(middleware.store, middleware.stats)
+    items = [r for r in committer.process_spider_output(response, spider.parse(response), spider)
+             if isinstance(r, DataItem)]
+    assert middleware.store.get(URL.rstrip("/")) is None
+    for item in items:
+        committer.item_done(item, response, spider)
+    assert middleware.store.get(URL.rstrip("/")).etag == '"v1"'
+
+
+def test_failed_items_leave_the_page_to_be_extracted_again(middleware, spider):
+    fetch(middleware, spider, headers={"ETag": '"v1"'}, item_failed=True)
+    assert middleware.store.get(URL.rstrip("/")) is None
+    assert middleware.stats.get_value("incremental/not_committed") == 1
+    request, results = fetch(middleware, spider, headers={"ETag": '"v1"'})
+    assert "If-None-Match" not in request.headers
+    assert any(isinstance(r, DataItem) for r in results)
+
+
+def test_unchanged_pdf_is_not_parsed_as_html(middleware, spider):
+    pdf_url = "https://documentation.grandstream.com/manual.pdf"
+    for _ in range(2):
+        _, results = fetch(
+            middleware, spider, url=pdf_url, body=b"%PDF-1.4 ...", response_cls=TextlessResponse,
+            headers={"Content-Type": "application/pdf"},
+        )
+        assert results == []
+    assert middleware.stats.get_value("incremental/unchanged") == 1
+
+
+@pytest.mark.parametrize("status", [200, 304])
+def test_unchanged_manual_is_not_emitted_again(middleware, spider, status):
+    pdf_url = "https://documentation.grandstream.com/manual.pdf"
+    product = {"product_model": "GXP2170", "product_name": "Enterprise HD IP Phone"}
+    pdf = dict(url=pdf_url, body=b"%PDF-1.4 ...", response_cls=TextlessResponse, meta=product)
+    _, first = fetch(middleware, spider, headers={"Content-Type": "application/pdf", "ETag": '"v1"'}, **pdf)
+    assert [r.payload["pdf_url"] for r in first] == [pdf_url]
+    _, again = fetch(middleware, spider, status=status, headers={"Content-Type": "application/pdf"}, **pdf)
+    assert again == []
@@ -81,4 +81,93 @@ def test_product_pipeline_upsert_and_attach_id(monkeypatch):
     # Ensure product_id is attached and payload preserved
     assert processed.payload['product_id'] == dummy_product.id
     for key, val in payload.items():
-        assert processed.payload[key] == val 
\ No newline at end of file
+        assert processed.payload[key] == val 
+
+def test_product_pipeline_reuses_cached_product_id():
+    from crawler.pipelines import ProductPipeline
+    from shared.db import Base, Product, SessionLocal, engine
+    from shared.querylog import QueryLog
+
+    Base.metadata.create_all(bind=engine)
+    pipeline = ProductPipeline()
+
+    def run(price):
+        item = DataItem(url='http://example.com/cached', item_type=ItemType.PRODUCT,
+                        payload={'model': 'CACHE-1', 'name': 'Cached', 'price': price})
+        log = QueryLog(sample_rate=0).attach(engine)
+        try:
+            pipeline.process_item(item, spider=None)
+        finally:
+            log.detach()
+        return item.payload['product_id'], [s['statement'].split()[0] for s in log.snapshot()]
+
+    try:
+        product_id, _ = run(10.0)
+        # Known model: no lookup by model, one conditional UPDATE that writes nothing when unchanged
+        assert run(10.0) == (product_id, ['WITH'])
+        run(12.5)
+        session = SessionLocal()
+        assert session.get(Product, product_id).price == 12.5
+        session.close()
+    finally:
+        session = SessionLocal()
+        session.query(Product).filter(Product.model == 'CACHE-1').delete()
+        session.commit()
+        session.close()
+
+
+def _delete_products(*models):
+    from shared.db import Image, Product, SessionLocal
+
+    session = SessionLocal()
+    ids = [p.id for p in session.query(Product).filter(Product.model.in_(models))]
+    session.query(Image).filter(Image.product_id.in_(ids)).delete(synchronize_session=False)
+    session.query(Product).filter(Product.id.in_(ids)).delete(synchronize_session=False)
+    session.commit()
+    session.close()
+
+
+def test_product_pipeline_reresolves_deleted_cached_product():
+    from shared.db import Base, Product, SessionLocal, engine, product_id_cache
+
+    Base.metadata.create_all(bind=engine)
+    pipeline = ProductPipeline()
+
+    def run():
+        item = DataItem(url='http://example.com/gone', item_type=ItemType.PRODUCT,
+                        payload={'model': 'GONE-1', 'name': 'Gone', 'price': 5.0})
+        return pipeline.process_item(item, spider=None).payload['product_id']
+
+    try:
+        stale_id = run()
+        _delete_products('GONE-1')
+        # Same fields, so the UPDATE matches nothing; the missing row must still be noticed
+        product_id = run()
+        assert product_id != stale_id
+        assert product_id_cache.get('GONE-1') == product_id
+        session = SessionLocal()
+        assert session.get(Product, product_id).price == 5.0
+        session.close()
+    finally:
+        _delete_products('GONE-1')
+
+
+def test_category_images_pipeline_reresolves_deleted_product():
+    from shared.db import Base, Image, SessionLocal, engine, get_or_create_product_id
+
+    Base.metadata.create_all(bind=engine)
+    # Built without ImagesPipeline.__init__, which needs Pillow; item_completed uses no state
+    pipeline = CategoryImagesPipeline.__new__(CategoryImagesPipeline)
+    session = SessionLocal()
+    try:
+        stale_id = get_or_create_product_id(session, model='IMG-GONE-1', name='Gone')
+        _delete_products('IMG-GONE-1')
+        item = DataItem(url='http://example.com/img-gone', item_type=ItemType.PRODUCT,
+                        payload={'model': 'IMG-GONE-1', 'name': 'Gone', 'product_id': stale_id})
+        pipeline.item_completed([(True, {'path': 'full/pic.jpg'})], item, info=None)
+        assert item.payload['product_id'] != stale_id
+        image = session.query(Image).filter_by(product_id=item.payload['product_id']).one()
+        assert image.url == 'pic.jpg'
+    finally:
+        session.close()
+        _delete_products('IMG-GONE-1')
@@ -1,4 +1,8 @@
+import threading
+import time
+
 import pytest
+from sqlalchemy import text
 from sqlalchemy.exc import IntegrityError
 from shared.db import (
     SessionLocal,
@@ -9,6 +13,15 @@ from shared.db import (
     create_document,
     create_image,
     create_video,
+    bulk_get_or_create_products,
+    bulk_persist_products,
+    delete_duplicate_images,
+    get_or_create_product_id,
+    product_id_cache,
+    ProductIdCache,
+    Product,
+    Image,
+    Document,
 )
 
 @pytest.fixture(scope="function")
@@ -119,4 +132,118 @@ def test_create_video_duplicate_youtube_id(db):
     create_video(db, product_id=product.id, youtube_id="abc123")
     
     with pytest.raises(IntegrityError):
-        create_video(db, product_id=product.id, youtube_id="abc123") 
\ No newline at end of file
+        create_video(db, product_id=product.id, youtube_id="abc123") 
+
+def test_bulk_get_or_create_products(db):
+    """Test bulk lookup returns ids for new and existing models without renaming."""
+    existing = create_product(db, model="GXP2170", name="Old Name")
+    ids = bulk_get_or_create_products(db, {"GXP2170": "New Name", "GXP2160": "Phone"})
+
+    assert ids["GXP2170"] == existing.id
+    assert ids["GXP2160"] != existing.id
+    assert db.get(Product, existing.id).name == "Old Name"
+
+def test_bulk_persist_products_skips_existing_assets(db):
+    """Test batched persistence writes each product/image/document once."""
+    rows = dict(
+        products={"GXP2170": "Phone", "HT801": "ATA"},
+        images=[("GXP2170", "https://example.com/a.jpg"), ("GXP2170", "https://example.com/a.jpg")],
+        documents=[("HT801", "https://example.com/ht801.pdf")],
+    )
+    ids = bulk_persist_products(db, **rows)
+    assert bulk_persist_products(db, **rows) == ids
+
+    assert db.query(Product).count() == 2
+    assert [(i.product_id, i.url) for i in db.query(Image)] == [(ids["GXP2170"], "https://example.com/a.jpg")]
+    assert [(d.product_id, d.url) for d in db.query(Document)] == [(ids["HT801"], "https://example.com/ht801.pdf")]
+    assert db.query(Image).one().created_at is not None
+
+
+
+def test_bulk_persist_products_tolerates_concurrent_inserts():
+    """Test an asset inserted by another transaction mid-batch is skipped instead of failing the batch."""
+    model, url = "CONCURRENT-TEST", "https://example.com/concurrent.jpg"
+    Base.metadata.create_all(bind=engine)
+    setup = SessionLocal()
+    product = create_product(setup, model=model, name="Concurrent")
+    other = SessionLocal()
+    try:
+        # The other transaction holds the row uncommitted, so NOT EXISTS cannot see it yet
+        other.execute(Image.__table__.insert().values(product_id=product.id, url=url))
+        errors = []
+
+        def persist():
+            session = SessionLocal()
+            try:
+                bulk_persist_products(session, {model: "Concurrent"}, images=[(model, url)])
+            except Exception as e:
+                errors.append(e)
+            finally:
+                session.close()
+
+        writer = threading.Thread(target=persist)
+        writer.start()
+        time.sleep(0.3)  # let the writer block on the uncommitted row
+        other.commit()
+        writer.join(timeout=10)
+
+        assert not errors
+        assert setup.query(Image).filter_by(product_id=product.id).count() == 1
+    finally:
+        other.close()
+        setup.execute(text("DELETE FROM images WHERE product_id = :id"), {"id": product.id})
+        setup.execute(text("DELETE FROM products WHERE id = :id"), {"id": product.id})
+        setup.commit()
+        setup.close()
+
+
+def test_create_image_returns_existing_row(db):
+    """Test that creating the same (product_id, url) twice returns the first image."""
+    product = create_product(db, model="GXP2170", name="Enterprise HD IP Phone")
+    first = create_image(db, product_id=product.id, url="https://example.com/phone.jpg")
+    second = create_image(db, product_id=product.id, url="https://example.com/phone.jpg")
+
+    assert second.id == first.id
+    assert db.query(Image).count() == 1
+
+def test_delete_duplicate_images_in_batches(db):
+    """Test set-based cleanup keeps the oldest image per (product_id, url) and reports progress."""
+    # Simulate a database from before the unique constraint existed
+    db.execute(text("ALTER TABLE images DROP CONSTRAINT IF EXISTS uq_images_product_id_url"))
+    product = create_product(db, model="GXP2170", name="Enterprise HD IP Phone")
+    db.add_all([Image(product_id=product.id, url=f"{n % 2}.jpg") for n in range(7)])
+    db.flush()
+    keep = {url: min(i.id for i in db.query(Image).filter_by(url=url)) for url in ("0.jpg", "1.jpg")}
+
+    progress = []
+    removed = delete_duplicate_images(db, batch_size=2, on_batch=lambda count, total: progress.append(total))
+
+    assert removed == 5
+    assert progress == [2, 4, 5]
+    assert {i.url: i.id for i in db.query(Image)} == keep
+
+
+def test_product_id_cache_lru_and_ttl(monkeypatch):
+    """Test the cache evicts least recently used models and expires old entries."""
+    cache = ProductIdCache(maxsize=2, ttl=60)
+    cache.put("A", 1)
+    cache.put("B", 2)
+    assert cache.get("A") == 1
+    cache.put("C", 3)
+    assert cache.get("B") is None
+    assert (cache.get("A"), cache.get("C")) == (1, 3)
+    assert cache.stats() == {"size": 2, "hits": 3, "misses": 1, "hit_rate": 0.75}
+
+    clock = iter([1000.0, 2000.0])
+    monkeypatch.setattr("shared.db.time.monotonic", lambda: next(clock))
+    cache.put("D", 4)
+    assert cache.get("D") is None
+
+def test_get_or_create_product_id_skips_repeat_lookups(db, monkeypatch):
+    """Test repeated lookups for a model are served without touching the database."""
+    first = get_or_create_product_id(db, model="GXP2170", name="Phone")
+    assert db.get(Product, first).model == "GXP2170"
+    hits = product_id_cache.hits
+    monkeypatch.setattr("shared.db.get_or_create_product", None)  # any lookup would now fail
+    assert get_or_create_product_id(db, model="GXP2170", name="Phone") == first
+    assert product_id_cache.hits == hits + 1
@@ -0,0 +1,57 @@
+import asyncio
+
+from sqlalchemy import text
+
+from shared import db
+from shared.db import async_database_url, make_async_engine, make_engine, pool_options
+
+
+def test_pool_options_from_env(monkeypatch):
+    monkeypatch.setenv("DB_POOL_SIZE", "12")
+    monkeypatch.setenv("DB_MAX_OVERFLOW", "3")
+    monkeypatch.setenv("DB_POOL_RECYCLE", "300")
+    monkeypatch.setenv("DB_POOL_PRE_PING", "0")
+    options = pool_options()
+    assert (options["pool_size"], options["max_overflow"], options["pool_recycle"]) == (12, 3, 300)
+    assert options["pool_pre_ping"] is False
+
+    engine = make_engine("postgresql://u:p@localhost/db")
+    assert engine.pool.size() == 12
+    assert engine.pool._max_overflow == 3
+
+
+def test_async_database_url(monkeypatch):
+    monkeypatch.delenv("ASYNC_DATABASE_URL", raising=False)
+    url = async_database_url("postgresql://u:p@host:5432/db")
+    assert url.split("://")[0] in ("postgresql+asyncpg", "postgresql+psycopg")
+    assert url.endswith("://u:p@host:5432/db")
+    assert async_database_url("postgresql+psycopg2://u:p@host/db").endswith("://u:p@host/db")
+
+    monkeypatch.setenv("ASYNC_DATABASE_URL", "postgresql+asyncpg://x@y/z")
+    assert async_database_url() == "postgresql+asyncpg://x@y/z"
+
+
+def test_async_database_url_translates_libpq_ssl_options(monkeypatch):
+    monkeypatch.delenv("ASYNC_DATABASE_URL", raising=False)
+    neon = "postgresql://u:p@ep-x.neon.tech/db?sslmode=require&channel_binding=require"
+    monkeypatch.setattr(db, "_async_driver", lambda: "postgresql+asyncpg")
+    assert async_database_url(neon) == "postgresql+asyncpg://u:p@ep-x.neon.tech/db?ssl=require"
+    assert async_database_url("postgresql://u:p@host/db?channel_binding=prefer") == "postgresql+asyncpg://u:p@host/db"
+    # psycopg understands the libpq options as they are
+    monkeypatch.setattr(db, "_async_driver", lambda: "postgresql+psycopg")
+    assert async_database_url(neon) == "postgresql+psycopg://u:p@ep-x.neon.tech/db?sslmode=require&channel_binding=require"
+
+
+def test_async_engine_runs_queries_concurrently():
+    async def run():
+        engine = make_async_engine(pool_size=2, max_overflow=0)
+        try:
+            async def query(n):
+                async with engine.connect() as conn:
+                    return (await conn.execute(text("SELECT :n FROM pg_sleep(0.05)"), {"n": n})).scalar()
+
+            return await asyncio.gather(*(query(n) for n in range(4)))
+        finally:
+            await engine.dispose()
+
+    assert asyncio.run(run()) == [0, 1, 2, 3]
@@ -0,0 +1,59 @@
+"""EXPLAIN checks that the hot lookup paths are served by indexes."""
+import os
+import importlib.util
+
+import pytest
+from sqlalchemy import text
+
+from shared.db import Base, engine
+
+
+def _plan(sql, **params):
+    with engine.connect() as conn:
+        # Test tables are tiny; without this the planner would rightly prefer a sequential scan
+        conn.execute(text("SET LOCAL enable_seqscan = off"))
+        rows = conn.execute(text(f"EXPLAIN {sql}"), params).scalars().all()
+        conn.rollback()
+    return "\n".join(rows)
+
+
+@pytest.fixture(scope="module", autouse=True)
+def tables():
+    Base.metadata.create_all(bind=engine)
+
+
+@pytest.fixture(scope="module")
+def trigram_indexes():
+    """Create the trigram indexes the way migration d8f3b6a1e5c9 does; create_all has no pg_trgm."""
+    path = os.path.join(
+        os.path.dirname(__file__), os.pardir, os.pardir, "migrations", "versions", "d8f3b6a1e5c9_lookup_indexes.py"
+    )
+    spec = importlib.util.spec_from_file_location("lookup_indexes", path)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+    with engine.begin() as conn:
+        available = conn.execute(text("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")).first()
+        if not available:
+            pytest.skip("the pg_trgm extension is not installed on this PostgreSQL server")
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        for name, column in migration.TRIGRAM_INDEXES.items():
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON products USING gin ({column} gin_trgm_ops)"))
+
+
+@pytest.mark.parametrize(
+    "sql, index",
+    [
+        ("SELECT id FROM products WHERE model = :v", "ix_products_model"),
+        ("SELECT id FROM images WHERE product_id = 1 AND url = :v", "uq_images_product_id_url"),
+        ("SELECT id FROM images WHERE product_id = 1", "uq_images_product_id_url"),
+        ("SELECT id FROM documents WHERE product_id = 1 AND url = :v", "uq_documents_product_id_url"),
+        ("SELECT id FROM documents WHERE product_id = 1", "uq_documents_product_id_url"),
+        ("SELECT id FROM videos WHERE product_id = 1", "ix_videos_product_id"),
+    ],
+)
+def test_lookup_uses_index(sql, index):
+    assert index in _plan(sql, v="x")
+
+
+def test_name_search_uses_trigram_index(trigram_indexes):
+    assert "ix_products_name_trgm" in _plan("SELECT id FROM products WHERE name ILIKE :v", v="%phone%")
@@ -0,0 +1,102 @@
+import json
+import logging
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from shared import db as shared_db
+from shared.db import engine
+from shared.querylog import QueryLog, StatementStats, normalize_statement
+
+
+@pytest.fixture
+def query_log():
+    log = QueryLog(sample_rate=0, slow_ms=10_000).attach(engine)
+    yield log
+    log.detach()
+
+
+def test_normalize_collapses_in_lists_and_values():
+    a = normalize_statement("SELECT id FROM products\n WHERE model IN (%(m_1)s, %(m_2)s)")
+    b = normalize_statement("SELECT id FROM products WHERE model IN (%(m_1)s)")
+    assert a == b == "SELECT id FROM products WHERE model IN (...)"
+    assert normalize_statement("INSERT INTO t (a, b) VALUES (%s, %s), (%s, %s)") == "INSERT INTO t (a, b) VALUES (...), ..."
+
+
+def test_counts_and_times_statements(query_log):
+    with engine.connect() as conn:
+        for _ in range(3):
+            conn.execute(text("SELECT 1"))
+        conn.execute(text("SELECT generate_series(1, 5)"))
+
+    stats = {s["statement"]: s for s in query_log.snapshot()}
+    assert stats["SELECT 1"]["calls"] == 3
+    assert stats["SELECT generate_series(1, 5)"]["rows"] == 5
+    assert stats["SELECT 1"]["p95_ms"] >= stats["SELECT 1"]["p50_ms"] > 0
+    assert query_log.total_calls == 4
+
+    query_log.reset()
+    assert query_log.snapshot() == []
+
+
+def test_failed_statements_do_not_leak_start_times(query_log):
+    with engine.connect() as conn:
+        for _ in range(3):
+            with pytest.raises(Exception):
+                conn.execute(text("SELECT * FROM no_such_table"))
+            conn.rollback()
+        assert conn.info.get("query_log_start") == []
+        conn.execute(text("SELECT 1"))
+        assert conn.info["query_log_start"] == []
+
+
+def test_logs_slow_statements(caplog, monkeypatch):
+    # alembic's fileConfig (test_migrations) disables loggers that already exist
+    monkeypatch.setattr(logging.getLogger("gsg.sql"), "disabled", False)
+    log = QueryLog(sample_rate=0, slow_ms=0).attach(engine)
+    try:
+        with caplog.at_level(logging.INFO, logger="gsg.sql"), engine.connect() as conn:
+            conn.execute(text("SELECT 2"))
+    finally:
+        log.detach()
+    record = json.loads(caplog.records[-1].getMessage())
+    assert record["statement"] == "SELECT 2" and record["slow"] is True
+    assert caplog.records[-1].levelno == logging.WARNING
+
+
+def test_untracked_statements_share_a_bucket():
+    log = QueryLog(max_statements=1)
+    for statement in ("SELECT 1", "SELECT 2", "SELECT 3"):
+        conn = type("Conn", (), {"info": {"query_log_start": [0.0]}})()
+        log._after(conn, None, statement, {}, None, False)
+    calls = {s["statement"]: s["calls"] for s in log.snapshot()}
+    assert calls == {"SELECT 1": 1, "<other statements>": 2}
+
+
+def test_reservoir_is_bounded():
+    stats = StatementStats()
+    for ms in range(10_000):
+        stats.record(float(ms), 1, reservoir=100)
+    assert len(stats.samples) == 100
+    assert stats.calls == 10_000
+    assert 2_000 < stats.percentile(50) < 8_000
+
+
+def test_admin_export(monkeypatch, query_log):
+    from api.main import app
+
+    monkeypatch.setattr(shared_db, "query_log", query_log)
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 3"))
+    client = TestClient(app)
+    data = client.get("/api/admin/query-stats").json()
+    assert data["enabled"] is True
+    assert any(s["statement"] == "SELECT 3" for s in data["statements"])
+    # Reading never clears the counters; resetting is a POST
+    assert client.get("/api/admin/query-stats", params={"reset": True}).json()["statements"]
+    assert client.post("/api/admin/query-stats/reset").json()["statements"]
+    assert query_log.snapshot() == []
+
+    monkeypatch.setattr(shared_db, "query_log", None)
+    assert client.get("/api/admin/query-stats").json() == {"enabled": False, "statements": []}
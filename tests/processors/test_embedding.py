@@ -0,0 +1,109 @@
+import threading
+import time
+
+import pytest
+from unittest.mock import MagicMock
+
+from processors.embedding import BatchEmbedder
+
+
+def make_embedder():
+    embedder = MagicMock()
+    embedder.embed_documents.side_effect = lambda texts: [[float(len(t))] for t in texts]
+    return embedder
+
+
+def test_batches_span_items_and_respect_size():
+    embedder = make_embedder()
+    upserted = []
+    batcher = BatchEmbedder(embedder, sink=upserted.append, max_batch_size=3, flush_interval=60)
+
+    batcher.add_chunks("https://a", ["one", "two"], {"url": "https://a"})
+    batcher.add_chunks("https://b", ["three", "four"], {"url": "https://b"})
+    # First batch of 3 is flushed automatically, the remainder waits for flush()
+    assert embedder.embed_documents.call_count == 1
+    assert [v[0] for v in upserted[0]] == ["https://a::0", "https://a::1", "https://b::0"]
+
+    assert batcher.flush() == 1
+    assert [v[0] for v in upserted[1]] == ["https://b::1"]
+    assert upserted[1][0][1] == [4.0]
+    assert batcher.stats.batches == 2
+    assert batcher.stats.chunks == 4
+    assert batcher.flush() == 0
+
+
+def test_token_budget_splits_batches():
+    embedder = make_embedder()
+    upserted = []
+    batcher = BatchEmbedder(
+        embedder,
+        sink=upserted.append,
+        max_batch_size=100,
+        max_batch_tokens=10,
+        flush_interval=60,
+        token_counter=len,
+    )
+    batcher.add("x::0", "a" * 6, {})
+    batcher.add("x::1", "b" * 6, {})
+    batcher.flush()
+    assert [len(batch) for batch in upserted] == [1, 1]
+
+
+def test_flush_interval_zero_flushes_every_chunk():
+    embedder = make_embedder()
+    upserted = []
+    batcher = BatchEmbedder(embedder, sink=upserted.append, max_batch_size=100, flush_interval=0)
+    batcher.add_chunks("u", ["a", "b"], {})
+    assert len(upserted) == 2
+
+
+def test_flush_interval_fires_without_new_chunks():
+    embedder = make_embedder()
+    flushed = threading.Event()
+    upserted = []
+
+    def sink(vectors):
+        upserted.append(vectors)
+        flushed.set()
+
+    batcher = BatchEmbedder(embedder, sink=sink, max_batch_size=100, flush_interval=0.05)
+    batcher.add("u::0", "a", {})
+    # Nothing else is added: the timer embeds the lone chunk
+    assert flushed.wait(2)
+    assert [v[0] for v in upserted[0]] == ["u::0"]
+    assert batcher.flush() == 0
+
+
+def test_interval_flush_error_is_raised_by_next_call():
+    embedder = MagicMock()
+    embedder.embed_documents.side_effect = RuntimeError("embedding service down")
+    batcher = BatchEmbedder(embedder, sink=lambda vectors: None, max_batch_size=100, flush_interval=0.01)
+    batcher.add("u::0", "a", {})
+    time.sleep(0.2)
+    with pytest.raises(RuntimeError, match="embedding service down"):
+        batcher.flush()
+
+
+def test_concurrent_adds_embed_every_chunk_once():
+    embedder = make_embedder()
+    upserted = []
+    batcher = BatchEmbedder(embedder, sink=upserted.extend, max_batch_size=7, flush_interval=60)
+
+    def add(worker):
+        for i in range(200):
+            batcher.add(f"w{worker}::{i}", "text", {})
+
+    threads = [threading.Thread(target=add, args=(w,)) for w in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    batcher.flush()
+    ids = [v[0] for v in upserted]
+    assert len(ids) == len(set(ids)) == 800
+
+
+def test_zero_limits_are_not_replaced_by_defaults(monkeypatch):
+    monkeypatch.setenv("EMBED_BATCH_SIZE", "128")
+    batcher = BatchEmbedder(make_embedder(), sink=lambda vectors: None, max_batch_size=0, max_batch_tokens=0)
+    assert (batcher.max_batch_size, batcher.max_batch_tokens) == (0, 0)
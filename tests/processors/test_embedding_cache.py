@@ -0,0 +1,62 @@
+from unittest.mock import MagicMock
+
+from processors.embedding import BatchEmbedder
+from processors.embedding_cache import EmbeddingCache
+
+
+def test_cache_roundtrip_and_counts(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "emb.sqlite3"), model="m")
+    assert cache.get_many(["hello"]) == {}
+    cache.put_many(["hello"], [[0.5, 0.25]])
+    found = cache.get_many(["hello", "other"])
+    assert list(found.values()) == [[0.5, 0.25]]
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_cache_is_keyed_by_model(tmp_path):
+    path = str(tmp_path / "emb.sqlite3")
+    EmbeddingCache(path, model="a").put_many(["x"], [[1.0]])
+    assert EmbeddingCache(path, model="b").get_many(["x"]) == {}
+    assert EmbeddingCache(path, model="a").get_many(["x"]) != {}
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "emb.sqlite3"), model="m", max_entries=2)
+    cache.put_many(["a"], [[1.0]])
+    cache.put_many(["b"], [[2.0]])
+    cache.get_many(["a"])  # touch "a" so "b" is the oldest
+    cache.put_many(["c"], [[3.0]])
+    assert len(cache) == 2
+    assert cache.get_many(["b"]) == {}
+
+
+def test_batch_embedder_only_embeds_misses(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "emb.sqlite3"), model="m")
+    embedder = MagicMock()
+    embedder.embed_documents.side_effect = lambda texts: [[float(len(t))] for t in texts]
+    upserted = []
+    batcher = BatchEmbedder(embedder, sink=upserted.extend, max_batch_size=100, flush_interval=60, cache=cache)
+
+    batcher.add_chunks("u", ["aa", "bbb"], {})
+    batcher.flush()
+    batcher.add_chunks("u", ["aa", "bbb", "cccc", "cccc"], {})
+    batcher.flush()
+
+    calls = [c.args[0] for c in embedder.embed_documents.call_args_list]
+    assert calls == [["aa", "bbb"], ["cccc"]]
+    assert [v[1] for v in upserted[2:]] == [[2.0], [3.0], [4.0], [4.0]]
+
+
+def test_cache_evicts_rows_written_by_other_processes(tmp_path):
+    path = str(tmp_path / "emb.sqlite3")
+    first = EmbeddingCache(path, model="m", max_entries=3)
+    second = EmbeddingCache(path, model="m", max_entries=3)
+    first.put_many(["a", "b"], [[1.0], [2.0]])
+    second.put_many(["b", "c"], [[2.0], [3.0]])  # "b" is refreshed, not counted twice
+    assert len(first) == len(second) == 3
+    first.put_many(["d"], [[4.0]])
+    assert len(second) == 3
+    assert second.get_many(["a"]) == {}
+    assert (second.hits, second.misses) == (0, 1)
+    first.close()
+    second.close()
@@ -0,0 +1,152 @@
+import json
+import asyncio
+from unittest.mock import patch, MagicMock
+
+import pytest
+
+from crawler.items import DataItem, ItemType
+from processors.engine import IngestEngine
+from processors.ingest_worker import IngestWorker
+
+
+@pytest.fixture
+def worker(monkeypatch):
+    monkeypatch.setenv("PARSE_WORKERS", "0")
+    with patch("processors.ingest_worker.pinecone") as mock_pinecone, \
+            patch("processors.ingest_worker.OpenAIEmbeddings") as mock_embeddings:
+        mock_pinecone.Index.return_value = MagicMock()
+        mock_embeddings.return_value.embed_documents.side_effect = lambda texts: [[0.1] for _ in texts]
+        w = IngestWorker(index_name="test-index", pinecone_api_key="key", pinecone_env="env")
+        w.splitter = MagicMock()
+        w.splitter.split_text.side_effect = lambda text: text.split("|")
+        yield w
+
+
+def test_ingest_file_pipelined_upserts_every_chunk(worker, tmp_path):
+    path = tmp_path / "out.jl"
+    with open(path, "w", encoding="utf-8") as f:
+        for n in range(10):
+            f.write(json.dumps({
+                "url": f"https://example.com/p{n}",
+                "item_type": "page",
+                "payload": {"content": f"a{n}|b{n}|c{n}"},
+            }) + "\n")
+
+    worker.ingest_file(str(path), pipelined=True)
+
+    upserted = [v[0] for c in worker.index.upsert.call_args_list for v in c.kwargs["vectors"]]
+    assert sorted(upserted) == sorted(f"https://example.com/p{n}::{i}" for n in range(10) for i in range(3))
+
+
+def test_engine_reports_results_and_isolates_failures(worker, tmp_path):
+    results = []
+    engine = IngestEngine(worker, load_remote=True, persist=False, queue_size=2, on_result=results.append)
+    good = tmp_path / "doc.html"
+    good.write_text("x|y")
+    worker.parser.target = lambda path, kind: open(path).read()
+    items = [
+        DataItem(url=str(good), item_type=ItemType.PAGE, payload={}),
+        DataItem(url=str(tmp_path / "missing.html"), item_type=ItemType.PAGE, payload={}),
+    ]
+
+    stats = asyncio.run(engine.run(items))
+
+    assert stats.ingested == 1 and stats.failed == 1
+    assert stats.vectors == 2
+    failed = [r for r in results if r.error is not None]
+    assert failed[0].item.url.endswith("missing.html")
+
+
+def _content_items(n, chunks=2):
+    return [
+        DataItem(
+            url=f"https://example.com/p{i}",
+            item_type=ItemType.PAGE,
+            payload={"content": "|".join(f"{c}{i}" for c in "abc"[:chunks])},
+        )
+        for i in range(n)
+    ]
+
+
+def test_failed_embedding_batch_fails_its_items(worker, tmp_path, monkeypatch):
+    monkeypatch.setenv("INGEST_LEDGER_PATH", str(tmp_path / "ledger.sqlite3"))
+    from processors.ledger import ledger_from_env
+    worker.ledger = ledger_from_env()
+    worker.embedder.embed_documents.side_effect = RuntimeError("embedding service down")
+    results = []
+    engine = IngestEngine(worker, load_remote=False, persist=False, on_result=results.append)
+
+    with pytest.raises(RuntimeError, match="embedding service down"):
+        asyncio.run(engine.run(_content_items(3)))
+
+    assert engine.stats.ingested == 0 and engine.stats.failed == 3
+    assert all(isinstance(r.error, RuntimeError) for r in results)
+    assert worker.ledger.get("https://example.com/p0") is None
+    assert not worker._pending_entries
+
+
+def test_failed_upsert_batch_fails_its_items(worker):
+    worker.index.upsert.side_effect = ValueError("bad request")
+    results = []
+    engine = IngestEngine(worker, load_remote=False, persist=False, on_result=results.append)
+    engine.upserter.max_retries = 0
+
+    with pytest.raises(ValueError):
+        asyncio.run(engine.run(_content_items(2)))
+
+    assert engine.stats.failed == 2 and engine.stats.ingested == 0
+    assert engine.stats.vectors == 0
+    assert sorted(r.item.url for r in results) == ["https://example.com/p0", "https://example.com/p1"]
+
+
+def test_upsert_failures_stay_with_the_engine_that_queued_them(worker):
+    def upsert(vectors, namespace):
+        if vectors[0][0].startswith("https://example.com/bad"):
+            raise ValueError("bad request")
+
+    worker.index.upsert.side_effect = upsert
+    good_results, bad_results = [], []
+    good = IngestEngine(worker, load_remote=False, persist=False, upsert_concurrency=2, on_result=good_results.append)
+    bad = IngestEngine(worker, load_remote=False, persist=False, on_result=bad_results.append)
+    assert good.upserter.workers == 2
+    bad_item = DataItem(url="https://example.com/bad", item_type=ItemType.PAGE, payload={"content": "a|b"})
+
+    async def run():
+        await good.start()
+        await bad.start()
+        for item in _content_items(2):
+            await good.submit(item)
+        await bad.submit(bad_item)
+        with pytest.raises(ValueError):
+            await bad.close()
+        return await good.close()
+
+    stats = asyncio.run(run())
+
+    assert stats.ingested == 2 and stats.failed == 0
+    assert [r.error for r in good_results] == [None, None]
+    assert [r.item.url for r in bad_results if r.error is not None] == ["https://example.com/bad"]
+
+
+def test_items_are_reported_once_their_vectors_are_upserted(worker):
+    results = []
+    engine = IngestEngine(worker, load_remote=False, persist=False, on_result=results.append)
+
+    stats = asyncio.run(engine.run(_content_items(4, chunks=3)))
+
+    assert stats.ingested == 4 and stats.vectors == 12
+    assert [r.chunks for r in results] == [3] * 4
+    assert not worker.upsert_listeners
+
+
+def test_embed_batches_stay_within_token_budget(worker):
+    worker.batcher.max_batch_tokens = 10
+    worker.batcher.token_counter = lambda text: 4
+    sizes = []
+    worker.embedder.embed_documents.side_effect = lambda texts: sizes.append(len(texts)) or [[0.1] for _ in texts]
+    engine = IngestEngine(worker, load_remote=False, persist=False, embed_concurrency=1)
+
+    asyncio.run(engine.run(_content_items(3, chunks=3)))
+
+    assert sum(sizes) == 9
+    assert max(sizes) == 2
@@ -0,0 +1,103 @@
+import os
+import time
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from processors.fetch import Fetcher
+
+BODY = b"%PDF-1.4 " + b"x" * 200_000
+
+
+class Handler(BaseHTTPRequestHandler):
+    # Requests to /slow/ currently being served, and the most seen at once
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        if self.path.startswith("/slow/"):
+            with Handler.lock:
+                Handler.active += 1
+                Handler.peak = max(Handler.peak, Handler.active)
+            try:
+                time.sleep(0.1)
+                self._serve()
+            finally:
+                with Handler.lock:
+                    Handler.active -= 1
+            return
+        self._serve()
+
+    def _serve(self):
+        if self.headers.get("If-None-Match") == '"v1"':
+            self.send_response(304)
+            self.end_headers()
+            return
+        body = BODY if self.path.endswith(".pdf") else "<p>caf\xe9</p>".encode("latin-1")
+        self.send_response(200)
+        self.send_header("ETag", '"v1"')
+        self.send_header("Content-Length", str(len(body)))
+        if not self.path.endswith(".pdf"):
+            self.send_header("Content-Type", "text/html; charset=latin-1")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+
+
+def test_streams_body_to_disk(server):
+    fetcher = Fetcher(chunk_size=4096)
+    result = fetcher.fetch_to_file(f"{server}/manual.pdf", suffix=".pdf")
+    try:
+        assert result.status == 200
+        assert result.etag == '"v1"'
+        assert result.bytes == len(BODY)
+        with open(result.path, "rb") as f:
+            assert f.read() == BODY
+    finally:
+        os.remove(result.path)
+
+
+def test_text_is_reencoded_as_utf8(server):
+    result = Fetcher().fetch_to_file(f"{server}/page.html", text=True)
+    try:
+        with open(result.path, "rb") as f:
+            assert f.read() == "<p>caf\xe9</p>".encode("utf-8")
+    finally:
+        os.remove(result.path)
+
+
+def test_conditional_request_returns_not_modified(server):
+    result = Fetcher().fetch_to_file(f"{server}/manual.pdf", etag='"v1"')
+    assert result.not_modified
+    assert result.path is None
+
+
+def test_async_fetch_shares_host_limit(server):
+    fetcher = Fetcher(per_host=2)
+    Handler.peak = 0
+
+    async def run():
+        return await asyncio.gather(
+            *(fetcher.afetch_to_file(f"{server}/slow/manual{i}.pdf") for i in range(6))
+        )
+
+    results = asyncio.run(run())
+    for r in results:
+        os.remove(r.path)
+    assert {r.bytes for r in results} == {len(BODY)}
+    # Concurrent, but never more than per_host requests in flight against the slow host
+    assert 1 < Handler.peak <= fetcher.per_host
@@ -4,6 +4,7 @@ import pytest
 from unittest.mock import patch, MagicMock
 
 from processors.ingest_worker import IngestWorker
+from processors.embedding_cache import text_digest
 from crawler.items import DataItem, ItemType
 
 SAMPLE_ITEM = DataItem(
@@ -55,3 +56,212 @@ def test_ingest_file(mock_pdf_loader, mock_html_loader, mock_embeddings, mock_pi
     assert isinstance(vectors, list)
     assert vectors[0][0].startswith(SAMPLE_ITEM.url)
 
+
+
+def _write_jsonl(path, content):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(json.dumps({
+            "url": SAMPLE_ITEM.url,
+            "item_type": SAMPLE_ITEM.item_type.value,
+            "payload": {"content": content},
+        }) + "\n")
+    return str(path)
+
+
+@patch("processors.ingest_worker.pinecone")
+@patch("processors.ingest_worker.OpenAIEmbeddings")
+def test_ingest_file_is_incremental_with_ledger(mock_embeddings, mock_pinecone, tmp_path, monkeypatch):
+    monkeypatch.setenv("INGEST_LEDGER_PATH", str(tmp_path / "ledger.sqlite3"))
+    mock_index = MagicMock()
+    mock_pinecone.Index.return_value = mock_index
+    mock_embeddings.return_value.embed_documents.side_effect = lambda texts: [[0.1] for _ in texts]
+
+    worker = IngestWorker(index_name="test-index", pinecone_api_key="key", pinecone_env="env")
+    worker.splitter = MagicMock()
+    worker.splitter.split_text.side_effect = lambda text: text.split("|")
+    jsonl = tmp_path / "out.jl"
+
+    worker.ingest_file(_write_jsonl(jsonl, "a|b|c"))
+    assert mock_index.upsert.call_count == 1
+    assert len(mock_index.upsert.call_args.kwargs["vectors"]) == 3
+
+    # Unchanged content is skipped entirely
+    worker.ingest_file(_write_jsonl(jsonl, "a|b|c"))
+    assert mock_index.upsert.call_count == 1
+    assert worker.skipped == 1
+
+    # Only the changed chunk is re-embedded and the stale tail is deleted
+    worker.ingest_file(_write_jsonl(jsonl, "a|B"))
+    assert mock_index.upsert.call_count == 2
+    assert [v[0] for v in mock_index.upsert.call_args.kwargs["vectors"]] == [f"{SAMPLE_ITEM.url}::1"]
+    mock_index.delete.assert_called_once_with(ids=[f"{SAMPLE_ITEM.url}::2"], namespace=worker.namespace)
+    assert worker.ledger.get(SAMPLE_ITEM.url).chunk_count == 2
+
+
+@patch("processors.ingest_worker.pinecone")
+@patch("processors.ingest_worker.OpenAIEmbeddings")
+def test_ledger_records_encoding_and_resplits_when_it_changes(mock_embeddings, mock_pinecone, tmp_path, monkeypatch):
+    monkeypatch.setenv("INGEST_LEDGER_PATH", str(tmp_path / "ledger.sqlite3"))
+    mock_pinecone.Index.return_value = MagicMock()
+    mock_embeddings.return_value.embed_documents.side_effect = lambda texts: [[0.1] for _ in texts]
+    worker = IngestWorker(index_name="test-index", pinecone_api_key="key", pinecone_env="env")
+    worker.splitter = MagicMock(encoding_name="pseudo")
+    worker.splitter.split_text.side_effect = lambda text: text.split("|")
+
+    worker.index_text(SAMPLE_ITEM, "a|b")
+    worker.flush()
+    assert worker.ledger.get(SAMPLE_ITEM.url).encoding == "pseudo"
+    assert worker.plan_chunks(SAMPLE_ITEM, "a|b") == []
+
+    # Same content, but the real tokenizer is available now: the text is split again
+    worker.splitter.encoding_name = "cl100k_base"
+    worker.splitter.split_text.side_effect = lambda text: [text]
+    assert worker.plan_chunks(SAMPLE_ITEM, "a|b") == [(f"{SAMPLE_ITEM.url}::0", "a|b")]
+
+
+@patch("processors.ingest_worker.pinecone")
+@patch("processors.ingest_worker.OpenAIEmbeddings")
+def test_changed_chunk_dropped_as_duplicate_deletes_old_vector(mock_embeddings, mock_pinecone, tmp_path, monkeypatch):
+    monkeypatch.setenv("INGEST_LEDGER_PATH", str(tmp_path / "ledger.sqlite3"))
+    mock_index = MagicMock()
+    mock_pinecone.Index.return_value = mock_index
+    mock_embeddings.return_value.embed_documents.side_effect = lambda texts: [[0.1] for _ in texts]
+    worker = IngestWorker(index_name="test-index", pinecone_api_key="key", pinecone_env="env")
+    worker.splitter = MagicMock()
+    worker.splitter.split_text.side_effect = lambda text: text.split("|")
+    other = DataItem(url="https://example.com/other", item_type=ItemType.PAGE, payload={})
+
+    worker.index_text(other, "footer")
+    worker.index_text(SAMPLE_ITEM, "a|b")
+    worker.flush()
+    # Chunk 1 now repeats another page's chunk: it is not re-embedded, and its old text goes
+    assert worker.index_text(SAMPLE_ITEM, "a|footer") == 0
+    mock_index.delete.assert_called_once_with(ids=[f"{SAMPLE_ITEM.url}::1"], namespace=worker.namespace)
+
+
+@patch("processors.ingest_worker.pinecone")
+@patch("processors.ingest_worker.OpenAIEmbeddings")
+def test_overlapping_ingests_of_one_url_keep_separate_ledger_entries(mock_embeddings, mock_pinecone, tmp_path, monkeypatch):
+    monkeypatch.setenv("INGEST_LEDGER_PATH", str(tmp_path / "ledger.sqlite3"))
+    mock_pinecone.Index.return_value = MagicMock()
+    worker = IngestWorker(index_name="test-index", pinecone_api_key="key", pinecone_env="env")
+    worker.deduper = None
+    worker.splitter = MagicMock()
+    worker.splitter.split_text.side_effect = lambda text: text.split("|")
+
+    first = worker.plan_chunks(SAMPLE_ITEM, "a|b")
+    second = worker.plan_chunks(SAMPLE_ITEM, "a|B")
+    assert len(worker._pending_entries) == 2
+
+    # The older ingest's vectors land first: nothing is recorded until the newer one is written
+    worker._on_upserted([(vid, [0.1], {}) for vid, _ in first])
+    assert worker.ledger.get(SAMPLE_ITEM.url) is None
+    worker._on_upserted([(vid, [0.1], {}) for vid, _ in second])
+    assert worker.ledger.get(SAMPLE_ITEM.url).content_hash == text_digest("a|B")
+    assert not worker._pending_entries and not worker._waiting
+
+
+@patch("processors.ingest_worker.pinecone")
+@patch("processors.ingest_worker.OpenAIEmbeddings")
+def test_ingest_file_into_local_vector_store(mock_embeddings, mock_pinecone, tmp_path, monkeypatch):
+    monkeypatch.setenv("VECTOR_STORE", "local")
+    monkeypatch.setenv("LOCAL_VECTOR_STORE_PATH", str(tmp_path / "vectors"))
+    mock_embeddings.return_value.embed_documents.side_effect = lambda texts: [[float(len(t)), 1.0] for t in texts]
+
+    worker = IngestWorker(index_name="test-index", pinecone_api_key="key", pinecone_env="env")
+    worker.ingest_file(_write_jsonl(tmp_path / "out.jl", "Hello world"))
+
+    assert not mock_pinecone.Index.called
+    result = worker.index.query(vector=[11.0, 1.0], top_k=1, namespace=worker.namespace, include_metadata=True)
+    assert result["matches"][0]["id"] == f"{SAMPLE_ITEM.url}::0"
+    assert result["matches"][0]["metadata"]["text"] == "Hello world"
+
+
+@patch("processors.ingest_worker.SessionLocal")
+@patch("processors.ingest_worker.bulk_persist_products")
+@patch("processors.ingest_worker.pinecone")
+@patch("processors.ingest_worker.OpenAIEmbeddings")
+def test_persist_item_writes_in_batches(mock_embeddings, mock_pinecone, mock_bulk, mock_session, monkeypatch):
+    monkeypatch.setenv("PERSIST_BATCH_SIZE", "3")
+    mock_bulk.side_effect = lambda session, products, images, documents: {
+        model: n for n, model in enumerate(products, start=1)
+    }
+    worker = IngestWorker(index_name="test-index", pinecone_api_key="key", pinecone_env="env")
+    items = [
+        DataItem(url=f"https://example.com/p{n}", item_type=ItemType.PRODUCT, payload={"title": f"P{n}"})
+        for n in range(4)
+    ]
+    items[0].payload["image_url"] = "https://example.com/p0.jpg"
+    items[3].payload["pdf_url"] = "https://example.com/p3.pdf"
+
+    for item in items:
+        worker.persist_item(item)
+    assert mock_bulk.call_count == 1
+    assert list(mock_bulk.call_args.args[1]) == [i.url for i in items[:3]]
+    assert mock_bulk.call_args.kwargs["images"] == [(items[0].url, "https://example.com/p0.jpg")]
+    assert items[1].payload["product_id"] == 2
+
+    worker.flush_persisted()
+    assert mock_bulk.call_count == 2
+    assert mock_bulk.call_args.kwargs["documents"] == [(items[3].url, "https://example.com/p3.pdf")]
+
+    # A product already written is resolved from memory
+    again = DataItem(url=items[1].url, item_type=ItemType.PRODUCT, payload={})
+    worker.persist_item(again)
+    assert again.payload["product_id"] == 2
+    assert worker.flush_persisted() == 0
+
+
+@patch("processors.ingest_worker.SessionLocal")
+@patch("processors.ingest_worker.bulk_persist_products")
+@patch("processors.ingest_worker.pinecone")
+@patch("processors.ingest_worker.OpenAIEmbeddings")
+def test_failed_persist_batch_is_kept_for_retry(mock_embeddings, mock_pinecone, mock_bulk, mock_session, monkeypatch):
+    monkeypatch.setenv("PERSIST_BATCH_SIZE", "2")
+    mock_bulk.side_effect = [RuntimeError("database is down"), {"https://example.com/p0": 1, "https://example.com/p1": 2}]
+    worker = IngestWorker(index_name="test-index", pinecone_api_key="key", pinecone_env="env")
+    items = [
+        DataItem(url=f"https://example.com/p{n}", item_type=ItemType.PRODUCT, payload={"title": f"P{n}"})
+        for n in range(2)
+    ]
+
+    # The item that fills the batch is not blamed for the failed write
+    for item in items:
+        worker.persist_item(item)
+    assert mock_bulk.call_count == 1
+    assert "product_id" not in items[1].payload
+
+    assert worker.flush_persisted() == 2
+    assert list(mock_bulk.call_args.args[1]) == [i.url for i in items]
+    assert [i.payload["product_id"] for i in items] == [1, 2]
+
+
+@patch("processors.ingest_worker.pinecone")
+@patch("processors.ingest_worker.OpenAIEmbeddings")
+def test_close_flushes_and_releases_resources(mock_embeddings, mock_pinecone, tmp_path, monkeypatch):
+    monkeypatch.setenv("INGEST_LEDGER_PATH", str(tmp_path / "ledger.sqlite3"))
+    mock_index = MagicMock()
+    mock_pinecone.Index.return_value = mock_index
+    mock_embeddings.return_value.embed_documents.side_effect = lambda texts: [[0.1] for _ in texts]
+    worker = IngestWorker(index_name="test-index", pinecone_api_key="key", pinecone_env="env")
+    worker.index_text(SAMPLE_ITEM, "Hello world")
+
+    worker.close()
+
+    assert mock_index.upsert.call_count == 1
+    assert worker.parser._executor is None
+    with pytest.raises(RuntimeError):
+        worker.upserter._executor.submit(print)
+
+
+@patch("processors.ingest_worker.IngestWorker")
+def test_shared_worker_is_created_once_and_closed(mock_worker):
+    from processors import ingest_worker
+
+    ingest_worker.close_ingest_worker()
+    first = ingest_worker.get_ingest_worker()
+    assert ingest_worker.get_ingest_worker() is first
+    assert mock_worker.call_count == 1
+    ingest_worker.close_ingest_worker()
+    first.close.assert_called_once()
+    assert ingest_worker._worker is None
@@ -0,0 +1,130 @@
+import json
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from crawler.items import DataItem, ItemType
+from processors import ingest_worker
+from processors.jobs import DONE, FAILED, PENDING, DeadLetterQueue, JobLedger
+
+
+def _item(n):
+    return DataItem(url=f"https://example.com/p{n}", item_type=ItemType.PAGE, payload={"content": f"text {n}"})
+
+
+def test_ledger_tracks_attempts_and_backoff(tmp_path):
+    jobs = JobLedger(str(tmp_path / "jobs.sqlite3"), max_attempts=3, backoff=10)
+    item = _item(1)
+    jobs.start("job", item)
+    assert jobs.get("job", item.url).state == PENDING
+
+    jobs.mark_failed("job", item, ValueError("boom"))
+    entry = jobs.get("job", item.url)
+    assert (entry.state, entry.attempts, entry.error) == (FAILED, 1, "ValueError: boom")
+    assert not jobs.is_due(entry, now=entry.next_attempt_at - 1)
+    assert jobs.is_due(entry, now=entry.next_attempt_at)
+
+    jobs.start("job", item)
+    jobs.mark_failed("job", item, ValueError("again"))
+    second = jobs.get("job", item.url)
+    assert second.next_attempt_at - entry.next_attempt_at >= 10  # backoff doubled
+    jobs.start("job", item)
+    jobs.mark_failed("job", item, ValueError("last"))
+    assert not jobs.is_due(jobs.get("job", item.url), now=float("inf"))
+
+    jobs.start("job", item)
+    jobs.mark_done("job", [item.url])
+    assert jobs.done_keys("job") == {item.url}
+    assert jobs.summary("job") == {DONE: 1}
+
+
+def test_dead_letter_roundtrip(tmp_path):
+    jobs = JobLedger(str(tmp_path / "jobs.sqlite3"))
+    queue = DeadLetterQueue(str(tmp_path / "out.jl.dead.jl"))
+    jobs.start("job", _item(1))
+    jobs.mark_failed("job", _item(1), RuntimeError("timeout"))
+    queue.write(jobs.failed("job"))
+
+    record = json.loads(open(queue.path, encoding="utf-8").readline())
+    assert record["error"] == "RuntimeError: timeout"
+    assert [i.url for i in queue] == [_item(1).url]
+    queue.write([])
+    assert list(queue) == []
+
+
+@pytest.fixture
+def run_main(tmp_path, monkeypatch):
+    monkeypatch.setenv("INGEST_JOBS_PATH", str(tmp_path / "jobs.sqlite3"))
+    monkeypatch.setenv("INGEST_RETRY_BACKOFF", "0")
+    monkeypatch.delenv("VECTOR_STORE", raising=False)
+    index = MagicMock()
+    broken = {"https://example.com/p1"}
+
+    def load(item):
+        if item.url in broken:
+            raise RuntimeError("fetch failed")
+        return item.payload["content"]
+
+    path = tmp_path / "out.jl"
+    with open(path, "w", encoding="utf-8") as f:
+        for n in range(3):
+            item = _item(n)
+            f.write(json.dumps({"url": item.url, "item_type": "page", "payload": item.payload}) + "\n")
+
+    def run(**kwargs):
+        with patch.object(ingest_worker, "init_pinecone", return_value=index), \
+                patch.object(ingest_worker, "OpenAIEmbeddings") as embeddings, \
+                patch.object(ingest_worker, "load_content", side_effect=load):
+            embeddings.return_value.embed_documents.side_effect = lambda texts: [[0.1] for _ in texts]
+            ingest_worker.main(str(path), **kwargs)
+        return index
+
+    run.path, run.broken = str(path), broken
+    return run
+
+
+def _upserted(index):
+    return {v[0].rsplit("::", 1)[0] for c in index.upsert.call_args_list for v in c.kwargs["vectors"]}
+
+
+def test_main_dead_letters_failures_and_replays_them(run_main, tmp_path):
+    index = run_main()
+    assert _upserted(index) == {"https://example.com/p0", "https://example.com/p2"}
+    dead = DeadLetterQueue(run_main.path + ".dead.jl")
+    assert [i.url for i in dead] == ["https://example.com/p1"]
+
+    # A resumed run skips everything already done
+    index.upsert.reset_mock()
+    run_main(resume=True)
+    assert not index.upsert.called
+
+    # Once the source recovers, replay ingests only the dead-lettered item and clears the file
+    run_main.broken.clear()
+    run_main(replay=True)
+    assert _upserted(index) == {"https://example.com/p1"}
+    assert list(dead) == []
+    jobs = JobLedger(str(tmp_path / "jobs.sqlite3"))
+    assert jobs.summary(str(tmp_path / "out.jl")) == {DONE: 3}
+
+
+def test_main_commits_progress_only_once_vectors_land(run_main, tmp_path, monkeypatch):
+    monkeypatch.setenv("UPSERT_BATCH_SIZE", "1")
+    monkeypatch.setenv("UPSERT_MAX_RETRIES", "0")
+    index = MagicMock()
+
+    def upsert(vectors, namespace):
+        if any(v[0].startswith("https://example.com/p2") for v in vectors):
+            raise ValueError("bad request")
+
+    index.upsert.side_effect = upsert
+    with patch.object(ingest_worker, "vector_store_from_env", return_value=index), pytest.raises(ValueError):
+        run_main()
+    jobs = JobLedger(str(tmp_path / "jobs.sqlite3"))
+    assert jobs.done_keys(str(tmp_path / "out.jl")) == {"https://example.com/p0"}
+
+    # The checkpoint stopped before p2, so a resumed run picks it up again
+    index.upsert.side_effect = None
+    index.upsert.reset_mock()
+    with patch.object(ingest_worker, "vector_store_from_env", return_value=index):
+        run_main(resume=True)
+    assert _upserted(index) == {"https://example.com/p2"}
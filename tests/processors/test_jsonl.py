@@ -0,0 +1,52 @@
+import gzip
+import json
+
+import pytest
+
+from processors.jsonl import JsonlCheckpoint, iter_jsonl
+from processors.ingest_worker import ingest_from_jsonl
+
+RECORDS = [
+    {"url": f"https://example.com/{n}", "item_type": "page", "payload": {"title": f"T{n}"}}
+    for n in range(5)
+]
+
+
+def _payload() -> bytes:
+    return b"".join(json.dumps(r).encode("utf-8") + b"\n" for r in RECORDS)
+
+
+@pytest.fixture(params=["out.jl", "out.jl.gz", "out.jl.zst"])
+def export(request, tmp_path):
+    path = tmp_path / request.param
+    data = _payload()
+    if request.param.endswith(".gz"):
+        data = gzip.compress(data)
+    elif request.param.endswith(".zst"):
+        zstandard = pytest.importorskip("zstandard")
+        data = zstandard.ZstdCompressor().compress(data)
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_streams_all_formats(export):
+    assert [i.url for i in ingest_from_jsonl(export)] == [r["url"] for r in RECORDS]
+
+
+def test_resume_from_offset(export):
+    offsets = [offset for offset, _ in iter_jsonl(export)]
+    resumed = [item.url for _, item in iter_jsonl(export, offsets[1])]
+    assert resumed == [r["url"] for r in RECORDS[2:]]
+    assert offsets[-1] == len(_payload())
+
+
+def test_checkpoint_roundtrip_and_invalidation(tmp_path):
+    path = tmp_path / "out.jl"
+    path.write_bytes(_payload())
+    checkpoint = JsonlCheckpoint(str(path))
+    assert checkpoint.load() == 0
+    checkpoint.save(42)
+    assert checkpoint.load() == 42
+    # A re-exported file must not be resumed at a stale offset
+    path.write_bytes(_payload() + _payload())
+    assert checkpoint.load() == 0
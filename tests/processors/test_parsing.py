@@ -0,0 +1,131 @@
+import os
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from processors.parsing import ParseError, ParsePool
+
+
+def echo_target(path, kind):
+    with open(path, encoding="utf-8") as f:
+        return f"{kind}:{f.read()}"
+
+
+def slow_target(path, kind):
+    if "slow" in path:
+        time.sleep(30)
+    return echo_target(path, kind)
+
+
+def crash_target(path, kind):
+    if "bad" in path:
+        os._exit(1)
+    return echo_target(path, kind)
+
+
+def bystander_target(path, kind):
+    # "bad" crashes its worker and "slow" always hangs; the other documents are still being
+    # parsed on their first attempt (and would succeed on a second one)
+    if "bad" in path:
+        os._exit(1)
+    if "slow" in path:
+        time.sleep(30)
+    marker = f"{path}.seen"
+    if not os.path.exists(marker):
+        open(marker, "w").close()
+        time.sleep(30)
+    return echo_target(path, kind)
+
+
+@pytest.fixture
+def doc(tmp_path):
+    def _make(name, text="hello"):
+        path = tmp_path / name
+        path.write_text(text, encoding="utf-8")
+        return str(path)
+    return _make
+
+
+def test_inline_parsing(doc):
+    pool = ParsePool(max_workers=0, target=echo_target)
+    assert pool.parse(doc("a.html"), "html") == "html:hello"
+
+
+def test_process_pool_parsing_sync_and_async(doc):
+    pool = ParsePool(max_workers=2, target=echo_target)
+    try:
+        assert pool.parse(doc("a.pdf"), "pdf") == "pdf:hello"
+        assert asyncio.run(pool.aparse(doc("b.html", "hi"), "html")) == "html:hi"
+    finally:
+        pool.close()
+
+
+def test_timeout_fails_only_that_document(doc):
+    pool = ParsePool(max_workers=1, timeout=1, target=slow_target)
+    try:
+        with pytest.raises(ParseError):
+            pool.parse(doc("slow.pdf"), "pdf")
+        assert pool.parse(doc("ok.pdf"), "pdf") == "pdf:hello"
+    finally:
+        pool.close()
+
+
+def test_crashed_worker_is_isolated(doc):
+    pool = ParsePool(max_workers=1, target=crash_target)
+    try:
+        with pytest.raises(ParseError):
+            pool.parse(doc("bad.pdf"), "pdf")
+        assert pool.parse(doc("good.pdf"), "pdf") == "pdf:hello"
+    finally:
+        pool.close()
+
+
+def _parse_concurrently(pool, first, second):
+    """Start parsing ``first``, then ``second`` a second later; return their futures in order."""
+    with ThreadPoolExecutor(max_workers=len(first) + len(second)) as threads:
+        # Start every worker up front: Python 3.11 only notices a crash in a worker spawned
+        # while the pool was busy at the next submit or result
+        warm = [os.path.join(os.path.dirname(first[0]), f"warm{n}.pdf") for n in range(pool.max_workers)]
+        for path in warm:
+            open(path, "w").close()
+            open(f"{path}.seen", "w").close()
+        list(threads.map(lambda path: pool.parse(path, "pdf"), warm))
+        futures = [threads.submit(pool.parse, path, "pdf") for path in first]
+        time.sleep(1)
+        futures += [threads.submit(pool.parse, path, "pdf") for path in second]
+        for future in futures:
+            try:
+                future.result()
+            except ParseError:
+                pass
+    return futures
+
+
+def test_hung_document_does_not_fail_documents_in_flight(doc):
+    pool = ParsePool(max_workers=3, timeout=3, target=bystander_target)
+    try:
+        # The hung document's deadline passes first, while the others are mid-parse
+        slow, *others = _parse_concurrently(pool, [doc("slow.pdf")], [doc("a.pdf", "a"), doc("b.pdf", "b")])
+        assert isinstance(slow.exception(), ParseError)
+        assert [f.result() for f in others] == ["pdf:a", "pdf:b"]
+    finally:
+        pool.close()
+
+
+def test_crashing_document_does_not_fail_documents_in_flight(doc):
+    pool = ParsePool(max_workers=3, timeout=3, target=bystander_target)
+    try:
+        *others, bad = _parse_concurrently(pool, [doc("a.pdf", "a"), doc("b.pdf", "b")], [doc("bad.pdf")])
+        assert isinstance(bad.exception(), ParseError)
+        assert [f.result() for f in others] == ["pdf:a", "pdf:b"]
+    finally:
+        pool.close()
+
+
+def test_pool_size_comes_from_config(monkeypatch):
+    monkeypatch.setenv("PARSE_WORKERS", "3")
+    assert ParsePool().max_workers == 3
+    monkeypatch.delenv("PARSE_WORKERS")
+    assert ParsePool().max_workers == 2
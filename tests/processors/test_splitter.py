@@ -0,0 +1,127 @@
+import pytest
+
+from processors.splitter import ChunkDeduper, TokenSplitter, simhash
+
+
+class FakeEncoding:
+    """Whitespace 'tokenizer' with the tiktoken encode/decode_with_offsets interface."""
+
+    def encode(self, text, disallowed_special=()):
+        import re
+        self._spans = [m.start() for m in re.finditer(r"\S+\s*", text)]
+        return list(range(len(self._spans)))
+
+    def decode_with_offsets(self, tokens):
+        return "", [self._spans[t] for t in tokens]
+
+
+def _words(n, prefix="w"):
+    return " ".join(f"{prefix}{i}" for i in range(n))
+
+
+@pytest.fixture
+def splitter():
+    s = TokenSplitter(chunk_tokens=20, overlap_tokens=5)
+    s.encoding = FakeEncoding()
+    return s
+
+
+def test_chunks_respect_token_budget_and_overlap(splitter):
+    chunks = splitter.split_text(_words(100))
+    assert all(len(c.split()) <= 20 for c in chunks)
+    assert chunks[0].split()[-5:] == chunks[1].split()[:5]
+    covered = set(w for c in chunks for w in c.split())
+    assert covered == set(_words(100).split())
+
+
+def test_prefers_sentence_breaks(splitter):
+    text = _words(15, "a") + ". " + _words(15, "b") + ". " + _words(15, "c") + "."
+    chunks = splitter.split_text(text)
+    assert chunks[0].endswith("a14.")
+
+
+def test_fallback_counts_pseudo_tokens():
+    s = TokenSplitter(chunk_tokens=8, overlap_tokens=2)
+    s.encoding = None
+    assert s.count_tokens("Hello, world!") == 4
+    assert all(s.count_tokens(c) <= 8 for c in s.split_text(_words(50)))
+
+
+def test_overlap_must_be_smaller_than_chunk():
+    with pytest.raises(ValueError):
+        TokenSplitter(chunk_tokens=10, overlap_tokens=10)
+
+
+LEGAL = (
+    "Grandstream Networks, Inc. All rights reserved. Information in this document is subject to change without "
+    "notice. Reproduction or transmittal of the entire or any part, in any form or by any means, electronic or print, "
+    "for any purpose without the express written permission of Grandstream Networks, Inc. is not permitted. The latest "
+    "electronic versions of this guide are available for download here. Grandstream is a registered trademark and "
+    "Grandstream logo is trademark of Grandstream Networks, Inc. in the United States, Europe and other countries. Page 12"
+)
+SPECS = (
+    "The GXP2170 is a 12-line enterprise IP phone with a 4.3 inch color LCD, 48 BLF keys, dual Gigabit ports, PoE and "
+    "Bluetooth for headsets. It supports HD audio and up to 6-way conferencing, and integrates with UCM for provisioning."
+)
+
+
+def test_simhash_is_close_for_near_duplicates():
+    assert bin(simhash(LEGAL) ^ simhash(LEGAL.replace("Page 12", "Page 13"))).count("1") <= 3
+    assert bin(simhash(LEGAL) ^ simhash(SPECS)).count("1") > 10
+    assert simhash("") is None
+
+
+def test_deduper_drops_exact_and_near_duplicates():
+    d = ChunkDeduper(max_distance=3)
+    kept = d.filter([("a::0", SPECS), ("a::1", LEGAL)])
+    kept += d.filter([("b::0", "intro to product B"), ("b::1", "  " + LEGAL + "\n")])
+    kept += d.filter([("c::1", LEGAL.replace("Page 12", "Page 13"))])
+    assert [vid for vid, _ in kept] == ["a::0", "a::1", "b::0"]
+    assert (d.stats.exact, d.stats.near, d.stats.saved, d.stats.chunks) == (1, 1, 2, 5)
+
+
+def test_deduper_treats_same_id_as_update():
+    d = ChunkDeduper()
+    assert not d.is_duplicate("a::0", "same text")
+    assert not d.is_duplicate("a::0", "same text")
+    assert d.is_duplicate("b::0", "same text")
+
+
+def test_deduper_forgets_oldest_chunks_beyond_cap():
+    d = ChunkDeduper(max_entries=2)
+    assert d.filter([("a::0", "alpha"), ("b::0", "beta"), ("c::0", LEGAL)]) == [
+        ("a::0", "alpha"), ("b::0", "beta"), ("c::0", LEGAL)
+    ]
+    assert len(d) == 2
+    assert sum(len(bucket) for table in d._tables for bucket in table.values()) == len(d._tables)
+    # "alpha" was forgotten, "beta" is still remembered
+    assert not d.is_duplicate("x::0", "alpha")
+    assert d.is_duplicate("y::0", LEGAL)
+
+
+def test_deduper_update_replaces_the_old_text():
+    d = ChunkDeduper()
+    assert not d.is_duplicate("a::0", "old text")
+    assert not d.is_duplicate("a::0", "new text")
+    assert not d.is_duplicate("b::0", "old text")
+    assert len(d) == 2
+
+
+def test_missing_encoding_is_logged(monkeypatch):
+    from unittest.mock import MagicMock
+    from processors import splitter as module
+
+    class Broken:
+        @staticmethod
+        def get_encoding(name):
+            raise OSError("offline")
+
+    monkeypatch.setattr(module, "tiktoken", Broken)
+    monkeypatch.setattr(module, "logger", MagicMock())
+    module.load_encoding.cache_clear()
+    try:
+        s = TokenSplitter(encoding_name="cl100k_base")
+    finally:
+        module.load_encoding.cache_clear()
+    assert s.encoding_name == module.PSEUDO_ENCODING
+    assert "pseudo-tokens" in module.logger.warning.call_args.args[0]
@@ -0,0 +1,131 @@
+import threading
+import time
+
+import pytest
+from unittest.mock import MagicMock
+
+from processors.upsert import UpsertBuffer, is_retryable
+
+
+def _vectors(n, dims=4, prefix="doc"):
+    return [(f"{prefix}::{i}", [0.1] * dims, {"url": prefix}) for i in range(n)]
+
+
+class ThrottledError(Exception):
+    def __init__(self, status):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+
+
+def test_batches_by_count_and_flushes_remainder():
+    index = MagicMock()
+    buf = UpsertBuffer(index, "ns", batch_size=100, workers=2)
+    buf.add(_vectors(250))
+    buf.flush()
+    sizes = sorted(len(c.kwargs["vectors"]) for c in index.upsert.call_args_list)
+    assert sizes == [50, 100, 100]
+    assert all(c.kwargs["namespace"] == "ns" for c in index.upsert.call_args_list)
+    assert buf.stats.vectors == 250
+    assert buf.stats.batches == 3
+
+
+def test_batches_by_payload_bytes():
+    index = MagicMock()
+    buf = UpsertBuffer(index, "ns", batch_size=1000, max_bytes=2000, workers=1)
+    buf.add(_vectors(20, dims=50))
+    buf.flush()
+    assert index.upsert.call_count > 1
+    sent = [v[0] for c in index.upsert.call_args_list for v in c.kwargs["vectors"]]
+    assert sorted(sent) == sorted(v[0] for v in _vectors(20))
+
+
+def test_sends_batches_in_parallel():
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def slow_upsert(vectors, namespace):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.05)
+        with lock:
+            active[0] -= 1
+
+    index = MagicMock()
+    index.upsert.side_effect = slow_upsert
+    buf = UpsertBuffer(index, "ns", batch_size=10, workers=4)
+    buf.add(_vectors(80))
+    buf.flush()
+    assert peak[0] > 1
+    assert buf.stats.vectors == 80
+
+
+def test_retries_throttled_requests():
+    index = MagicMock()
+    index.upsert.side_effect = [ThrottledError(429), ThrottledError(503), None]
+    done = []
+    buf = UpsertBuffer(index, "ns", batch_size=5, workers=1, backoff=0, on_done=done.append)
+    buf.add(_vectors(5))
+    buf.flush()
+    assert index.upsert.call_count == 3
+    assert buf.stats.retries == 2
+    assert [v[0] for v in done[0]] == [v[0] for v in _vectors(5)]
+
+
+def test_non_retryable_error_surfaces_on_flush():
+    index = MagicMock()
+    index.upsert.side_effect = ThrottledError(400)
+    done = []
+    buf = UpsertBuffer(index, "ns", batch_size=5, workers=1, backoff=0, on_done=done.append)
+    buf.add(_vectors(5))
+    with pytest.raises(ThrottledError):
+        buf.flush()
+    assert index.upsert.call_count == 1
+    assert buf.stats.failures == 1
+    assert done == []
+
+
+def test_gives_up_after_max_retries():
+    index = MagicMock()
+    index.upsert.side_effect = ConnectionError("reset")
+    buf = UpsertBuffer(index, "ns", batch_size=5, workers=1, max_retries=2, backoff=0)
+    buf.add(_vectors(5))
+    with pytest.raises(ConnectionError):
+        buf.flush()
+    assert index.upsert.call_count == 3
+
+
+def test_flush_only_raises_the_callers_failures():
+    index = MagicMock()
+    index.upsert.side_effect = ValueError("bad request")
+    buf = UpsertBuffer(index, "ns", batch_size=5, workers=1, max_retries=0)
+    buf.add(_vectors(5, prefix="job-b"))
+    # Job A's vectors all landed: another job's failure is not A's to raise
+    buf.flush(vector_ids={"job-a::0"})
+    with pytest.raises(ValueError):
+        buf.flush(vector_ids={"job-b::3"})
+    buf.flush()
+
+
+def test_is_retryable():
+    assert is_retryable(ThrottledError(429))
+    assert is_retryable(ThrottledError(502))
+    assert not is_retryable(ThrottledError(404))
+    assert is_retryable(TimeoutError())
+    assert not is_retryable(ValueError("bad vector"))
+
+
+def test_rate_is_measured_over_busy_time():
+    def slow_upsert(vectors, namespace):
+        time.sleep(0.05)
+
+    index = MagicMock()
+    index.upsert.side_effect = slow_upsert
+    buf = UpsertBuffer(index, "ns", batch_size=10, workers=1)
+    buf.add(_vectors(10))
+    buf.flush()
+    time.sleep(0.3)  # idle between batches is not upsert time
+    buf.add(_vectors(10, prefix="other"))
+    buf.flush()
+    assert 0.1 <= buf.stats.busy_seconds < 0.25
+    assert buf.stats.upserts_per_second > 20 / 0.25
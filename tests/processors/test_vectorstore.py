@@ -0,0 +1,107 @@
+import numpy as np
+import pytest
+from unittest.mock import MagicMock
+
+from processors.vectorstore import IndexRetriever, LocalVectorStore, vector_store_from_env
+
+
+@pytest.fixture
+def store(tmp_path):
+    s = LocalVectorStore(str(tmp_path / "vectors"))
+    yield s
+    s.close()
+
+
+def test_query_returns_nearest_first(store):
+    store.upsert(
+        vectors=[
+            ("a", [1.0, 0.0, 0.0], {"url": "u1"}),
+            ("b", [0.0, 1.0, 0.0], {"url": "u2"}),
+            ("c", [0.7, 0.7, 0.0], {"url": "u3"}),
+        ],
+        namespace="ns",
+    )
+    result = store.query(vector=[1.0, 0.1, 0.0], top_k=2, namespace="ns", include_metadata=True)
+    assert [m["id"] for m in result["matches"]] == ["a", "c"]
+    assert result["matches"][0]["metadata"] == {"url": "u1"}
+    assert result["matches"][0]["score"] == pytest.approx(0.995, abs=1e-3)
+
+
+def test_namespaces_are_isolated(store):
+    store.upsert(vectors=[("a", [1.0, 0.0], {})], namespace="one")
+    store.upsert(vectors=[("b", [1.0, 0.0], {})], namespace="two")
+    assert [m["id"] for m in store.query(vector=[1.0, 0.0], namespace="one")["matches"]] == ["a"]
+    stats = store.describe_index_stats()
+    assert stats["namespaces"] == {"one": {"vector_count": 1}, "two": {"vector_count": 1}}
+
+
+def test_overwrite_delete_and_row_reuse(store):
+    store.upsert(vectors=[("a", [1.0, 0.0], {"v": 1}), ("b", [0.0, 1.0], {})], namespace="ns")
+    store.upsert(vectors=[{"id": "a", "values": [0.0, 1.0], "metadata": {"v": 2}}], namespace="ns")
+    assert store.fetch(["a"], namespace="ns")["vectors"]["a"]["metadata"] == {"v": 2}
+
+    store.delete(ids=["b"], namespace="ns")
+    assert [m["id"] for m in store.query(vector=[0.0, 1.0], namespace="ns")["matches"]] == ["a"]
+    store.upsert(vectors=[("c", [1.0, 0.0], {})], namespace="ns")
+    assert store._namespaces["ns"].rows == 2  # "c" took over b's freed row
+
+
+def test_metadata_filter(store):
+    store.upsert(
+        vectors=[("a", [1.0, 0.0], {"type": "page"}), ("b", [0.9, 0.1], {"type": "manual"})],
+        namespace="ns",
+    )
+    result = store.query(vector=[1.0, 0.0], namespace="ns", filter={"type": {"$in": ["manual"]}})
+    assert [m["id"] for m in result["matches"]] == ["b"]
+
+
+def test_persists_across_reopen(tmp_path):
+    path = str(tmp_path / "vectors")
+    first = LocalVectorStore(path)
+    first.upsert(vectors=[(f"v{i}", [float(i), 1.0], {"i": i}) for i in range(100)], namespace="ns")
+    first.close()
+
+    reopened = LocalVectorStore(path)
+    assert reopened.describe_index_stats()["total_vector_count"] == 100
+    assert reopened.fetch(["v42"], namespace="ns")["vectors"]["v42"]["metadata"] == {"i": 42}
+
+
+def test_dimension_mismatch_is_rejected(store):
+    store.upsert(vectors=[("a", [1.0, 0.0], {})], namespace="ns")
+    with pytest.raises(ValueError):
+        store.upsert(vectors=[("b", [1.0, 0.0, 0.0], {})], namespace="ns")
+
+
+def test_ivf_matches_exact_search_on_clustered_data(tmp_path):
+    rng = np.random.default_rng(1)
+    centers = rng.normal(size=(16, 32))
+    data = np.repeat(centers, 128, axis=0) + 0.05 * rng.normal(size=(16 * 128, 32))
+    store = LocalVectorStore(str(tmp_path / "ivf"), index_type="ivf", nlist=16, nprobe=4, ivf_min_rows=100)
+    store.upsert(vectors=[(str(i), row.tolist(), {}) for i, row in enumerate(data)], namespace="ns")
+
+    hits = 0
+    for q in centers[:8] + 0.05 * rng.normal(size=(8, 32)):
+        exact = {m["id"] for m in store.query(vector=q.tolist(), top_k=10, namespace="ns", exact=True)["matches"]}
+        approx = {m["id"] for m in store.query(vector=q.tolist(), top_k=10, namespace="ns")["matches"]}
+        hits += len(exact & approx)
+    assert hits / 80 >= 0.9
+    assert store._namespaces["ns"].centroids is not None
+    store.close()
+
+
+def test_retriever_returns_documents(store):
+    store.upsert(vectors=[("u::0", [1.0, 0.0], {"url": "u", "text": "hello"})], namespace="ns")
+    embeddings = MagicMock()
+    embeddings.embed_query.return_value = [1.0, 0.0]
+    retriever = IndexRetriever(index=store, embeddings=embeddings, namespace="ns")
+    docs = retriever.invoke("hi")
+    assert docs[0].page_content == "hello"
+    assert docs[0].metadata["url"] == "u"
+
+
+def test_vector_store_from_env(tmp_path, monkeypatch):
+    monkeypatch.delenv("VECTOR_STORE", raising=False)
+    assert vector_store_from_env() is None
+    monkeypatch.setenv("VECTOR_STORE", "local")
+    monkeypatch.setenv("LOCAL_VECTOR_STORE_PATH", str(tmp_path / "v"))
+    assert isinstance(vector_store_from_env(), LocalVectorStore)